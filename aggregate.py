@@ -0,0 +1,102 @@
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from stats import dataset_version, register_cache
+
+
+MAX_CATEGORIES = 25
+Z_95 = 1.959963984540054
+
+
+def _format_value(value):
+    if not isinstance(value, (float, np.floating)):
+        return str(value)
+    if value.is_integer() or 100 <= abs(value) < 1e7:
+        return f"{value:.0f}" if abs(value) < 1e7 else f"{value:.3g}"
+    return f"{value:.3g}"
+
+
+def bucket(series, max_categories=MAX_CATEGORIES):
+    """Integer codes and labels grouping a column into at most max_categories buckets.
+
+    Low cardinality columns keep one bucket per value.  High cardinality numeric columns are
+    cut at quantiles, anything else keeps its most frequent values and folds the rest into
+    "Other".  Missing values get code -1.
+    """
+    codes, uniques = pd.factorize(series, sort=True)
+    if len(uniques) <= max_categories:
+        return codes, [_format_value(value) for value in uniques]
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        values = series.to_numpy(dtype="float64", na_value=np.nan)
+        edges = np.unique(np.nanquantile(values, np.linspace(0, 1, max_categories + 1)))
+        codes = np.searchsorted(edges, values, side="right") - 1
+        codes = np.clip(codes, 0, len(edges) - 2)
+        codes[np.isnan(values)] = -1
+        labels = [f"{_format_value(low)}–{_format_value(high)}" for low, high in zip(edges[:-1], edges[1:])]
+        return codes, labels
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    top = np.sort(np.argsort(counts, kind="stable")[::-1][:max_categories - 1])
+    remap = np.full(len(uniques), len(top))
+    remap[top] = np.arange(len(top))
+    folded = np.where(codes >= 0, remap[np.maximum(codes, 0)], -1)
+    return folded, [_format_value(uniques[index]) for index in top] + ["Other"]
+
+
+def aggregate(data, x, y, max_categories=MAX_CATEGORIES):
+    """Mean, sum, count, std and 95% confidence half-width of y for every x bucket."""
+    codes, labels = bucket(data[x], max_categories)
+    values = data[y].to_numpy(dtype="float64", na_value=np.nan)
+    valid = (codes >= 0) & ~np.isnan(values)
+    codes = codes[valid]
+    values = values[valid]
+    size = len(labels)
+    count = np.bincount(codes, minlength=size).astype("float64")
+    total = np.bincount(codes, weights=values, minlength=size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        # Sum of squared deviations from each group mean, in a second vectorized pass.
+        deviations = np.bincount(codes, weights=(values - mean[codes]) ** 2, minlength=size)
+        std = np.sqrt(deviations / (count - 1))
+        ci = Z_95 * std / np.sqrt(count)
+    frame = pd.DataFrame({"mean": mean, "sum": total, "count": count, "std": std, "ci": ci},
+                         index=pd.Index(labels, name=x))
+    return frame[frame["count"] > 0]
+
+
+class AggregationEngine:
+    """LRU cache of bar chart aggregates keyed by (dataset version, x, y)."""
+
+    def __init__(self, max_entries=256, max_categories=MAX_CATEGORIES):
+        """Aggregation engine constructor."""
+        self.max_entries = max_entries
+        self.max_categories = max_categories
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def bars(self, data, x, y):
+        """Aggregated y per x bucket for the frame."""
+        key = (dataset_version(data), x, y)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                return result
+        result = aggregate(data, x, y, self.max_categories)
+        with self._lock:
+            self._entries[key] = result
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def invalidate(self, version=None):
+        """Drop cached aggregates of one dataset version, or all of them."""
+        with self._lock:
+            if version is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == version]:
+                del self._entries[key]
+
+
+AGGREGATES = register_cache(AggregationEngine())
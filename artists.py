@@ -0,0 +1,156 @@
+import itertools
+import threading
+import numpy as np
+import pandas as pd
+from stats import dataset_version, register_cache
+
+
+# Audio features averaged per artist; bpm is on its own scale, the rest are percentages.
+ARTIST_FEATURES = ["bpm", "danceability", "valence", "energy", "acousticness", "instrumentalness", "liveness",
+                   "speechiness"]
+ARTIST_METRICS = ("streams", "tracks")
+
+
+def split_credits(credits):
+    """Artist names of a comma-joined credit string, in credit order, without blanks or repeats."""
+    names = []
+    for name in str(credits).split(","):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def _group_order(keys):
+    """Stable argsort of non-negative int32 keys, as one or two 16-bit radix passes."""
+    # numpy radix-sorts keys of 16 bits or less and falls back to timsort for wider ones.
+    if not len(keys) or keys.max() < 1 << 16:
+        return np.argsort(keys.astype(np.uint16), kind="stable")
+    order = np.argsort((keys & 0xFFFF).astype(np.uint16), kind="stable")
+    return order[np.argsort((keys[order] >> 16).astype(np.uint16), kind="stable")]
+
+
+class ArtistIndex:
+    """Interned artist names and the track-artist adjacency in both directions, in CSR form.
+
+    The artist ids of row r are track_artists[track_offsets[r]:track_offsets[r + 1]] and the
+    rows of artist a are tracks[offsets[a]:offsets[a + 1]], in row order, so looking up an
+    artist costs a slice and aggregating over one costs O(tracks of the artist).
+    """
+
+    def __init__(self, credits):
+        """Artist index constructor."""
+        if isinstance(credits.dtype, pd.CategoricalDtype):
+            codes, categories = credits.cat.codes.to_numpy(), credits.cat.categories
+        else:
+            codes, categories = pd.factorize(credits)
+        # Each distinct credit string is split once, however many rows share it.
+        self.ids = {}
+        credit_artists = [[self.ids.setdefault(name, len(self.ids)) for name in split_credits(credit)]
+                          for credit in categories.tolist()]
+        self.names = np.array(list(self.ids), dtype=object)
+        # A trailing empty credit serves the rows whose credit is missing (code -1).
+        lengths = np.array([len(artists) for artists in credit_artists] + [0], dtype=np.intp)
+        credit_offsets = np.concatenate([[0], np.cumsum(lengths)])
+        flat = np.fromiter(itertools.chain.from_iterable(credit_artists), dtype=np.int32, count=credit_offsets[-1])
+        row_lengths = lengths[codes]
+        self.track_offsets = np.concatenate([[0], np.cumsum(row_lengths)])
+        positions = np.repeat(credit_offsets[codes] - self.track_offsets[:-1], row_lengths)
+        positions += np.arange(self.track_offsets[-1])
+        self.track_artists = flat[positions]
+        rows = np.repeat(np.arange(len(codes), dtype=np.int32), row_lengths)
+        self.tracks = rows[_group_order(self.track_artists)]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(self.track_artists, minlength=len(self.names)))])
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def tracks_of(self, name):
+        """Row positions credited to the artist, empty for an artist the frame does not credit."""
+        artist = self.ids.get(name)
+        if artist is None:
+            return self.tracks[:0]
+        return self.tracks[self.offsets[artist]:self.offsets[artist + 1]]
+
+    def artists_of(self, row):
+        """Artist names credited on one row."""
+        return self.names[self.track_artists[self.track_offsets[row]:self.track_offsets[row + 1]]].tolist()
+
+    def track_counts(self):
+        """Number of tracks of every artist, by artist id."""
+        return np.diff(self.offsets)
+
+
+def _gather(data, column, positions):
+    """Values of a column at row positions as float64, touching only those rows."""
+    return data[column].to_numpy()[positions].astype("float64")
+
+
+class ArtistEngine:
+    """Per dataset version artist indexes and per-artist aggregations over them."""
+
+    def __init__(self):
+        """Artist engine constructor."""
+        self._indexes = {}
+        self._leaders = {}
+        self._lock = threading.RLock()
+
+    def index(self, data):
+        """Artist index of the frame, built on first use."""
+        version = dataset_version(data)
+        with self._lock:
+            index = self._indexes.get(version)
+        if index is None:
+            index = ArtistIndex(data["artistsname"])
+            with self._lock:
+                index = self._indexes.setdefault(version, index)
+        return index
+
+    def stats(self, data, name, features=ARTIST_FEATURES):
+        """Track count, total streams and mean audio features of one artist."""
+        positions = self.index(data).tracks_of(name)
+        streams = _gather(data, "streams", positions)
+        result = {"artist": name, "tracks": len(positions), "streams": float(np.nansum(streams))}
+        for feature in features:
+            values = _gather(data, feature, positions)
+            present = values[~np.isnan(values)]
+            result[feature] = float(present.mean()) if len(present) else np.nan
+        return result
+
+    def summary(self, data, names, features=ARTIST_FEATURES):
+        """Per-artist stats as a frame indexed by artist, in the order the names were given."""
+        rows = [self.stats(data, name, features) for name in names]
+        return pd.DataFrame(rows, columns=["artist", *ARTIST_METRICS, *features]).set_index("artist")
+
+    def leaders(self, data, n=None):
+        """Names of the n artists with the most streams, best first; every artist when n is None."""
+        version = dataset_version(data)
+        with self._lock:
+            order = self._leaders.get(version)
+        if order is None:
+            index = self.index(data)
+            streams = np.nan_to_num(_gather(data, "streams", index.tracks))
+            counts = index.track_counts()
+            totals = np.bincount(np.repeat(np.arange(len(index)), counts), weights=streams, minlength=len(index))
+            # A filtered frame keeps every artist category, so only artists credited on one of its
+            # rows are ranked.
+            present = np.flatnonzero(counts)
+            order = index.names[present[np.argsort(-totals[present], kind="stable")]].tolist()
+            with self._lock:
+                order = self._leaders.setdefault(version, order)
+        return order if n is None else order[:n]
+
+    def invalidate(self, version=None):
+        """Drop the artist indexes of one dataset version, or all of them."""
+        with self._lock:
+            for entries in (self._indexes, self._leaders):
+                if version is None:
+                    entries.clear()
+                else:
+                    entries.pop(version, None)
+
+
+ARTISTS = register_cache(ArtistEngine())
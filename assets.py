@@ -0,0 +1,53 @@
+import os
+import tkinter as tk
+
+
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
+
+
+class ImageRegistry:
+    """Application-wide cache of decoded images and their subsampled variants."""
+
+    def __init__(self, master, directory=IMAGE_DIR):
+        """Image registry constructor."""
+        self.master = master
+        self.directory = directory
+        self._images = {}
+        self._pending = []
+
+    def get(self, name, scale=1):
+        """Image from the images directory, shrunk by an integer scale factor."""
+        key = (name, scale)
+        image = self._images.get(key)
+        if image is None:
+            if scale == 1:
+                image = tk.PhotoImage(master=self.master, file=os.path.join(self.directory, name))
+            else:
+                image = self.get(name).subsample(scale)
+            self._images[key] = image
+        return image
+
+    def preload(self, assets):
+        """Decode (name, scale) pairs one per idle callback, so the UI keeps responding."""
+        self._pending.extend(assets)
+        if len(self._pending) == len(assets):
+            self.master.after_idle(self._preload_next)
+
+    def _preload_next(self):
+        if not self._pending:
+            return
+        name, scale = self._pending.pop(0)
+        try:
+            self.get(name, scale)
+        except tk.TclError:
+            pass
+        if self._pending:
+            self.master.after_idle(self._preload_next)
+
+    def clear(self):
+        """Forget every decoded image."""
+        self._pending.clear()
+        self._images.clear()
+
+    def __len__(self):
+        return len(self._images)
@@ -0,0 +1,683 @@
+import os
+import sys
+import time
+import json
+import argparse
+import subprocess
+import numpy as np
+import pandas as pd
+
+
+KEYS = ["A", "A sharp", "B", "C", "C sharp", "D", "D sharp", "E", "F", "F sharp", "G", "G sharp"]
+
+
+def make_synthetic(rows, path, seed=0, chunk_rows=1_000_000):
+    """Write a CSV with the same columns, value ranges and missing cells as spotify-data.csv.
+
+    Rows are generated and appended in chunks, so files far larger than memory can be made.
+    """
+    rng = np.random.default_rng(seed)
+    artists = np.array([f"Artist {i}" for i in range(max(rows // 20, 1))], dtype=object)
+    for start in range(0, rows, chunk_rows):
+        size = min(chunk_rows, rows - start)
+        keys = np.array(KEYS, dtype=object)[rng.integers(0, len(KEYS), size)]
+        # The export leaves the key of about one track in ten and a few Shazam counts blank.
+        keys[rng.random(size) < 0.1] = None
+        shazam = rng.integers(0, 1452, size).astype("float64")
+        shazam[rng.random(size) < 0.05] = np.nan
+        frame = pd.DataFrame({
+            "trackname": np.char.add("Track ", np.arange(start, start + size).astype(str)),
+            "artistsname": artists[rng.integers(0, len(artists), size)],
+            "artistcount": rng.integers(1, 9, size),
+            "releasedyear": rng.integers(1930, 2024, size),
+            "releasedmonth": rng.integers(1, 13, size),
+            "releasedday": rng.integers(1, 32, size),
+            "inspotifyplaylists": rng.integers(31, 52899, size),
+            "inspotifycharts": rng.integers(0, 148, size),
+            "streams": rng.lognormal(19, 1.2, size).astype(np.int64),
+            "inappleplaylists": rng.integers(0, 673, size),
+            "inapplecharts": rng.integers(0, 276, size),
+            "indeezerplaylists": rng.integers(0, 12368, size),
+            "indeezercharts": rng.integers(0, 59, size),
+            "inshazamcharts": pd.array(shazam, dtype="Int64"),
+            "bpm": rng.integers(65, 207, size),
+            "key": keys,
+            "mode": np.where(rng.random(size) < 0.55, "Major", "Minor"),
+            "danceability": rng.integers(23, 97, size),
+            "valence": rng.integers(4, 98, size),
+            "energy": rng.integers(9, 98, size),
+            "acousticness": rng.integers(0, 98, size),
+            "instrumentalness": rng.integers(0, 92, size),
+            "liveness": rng.integers(3, 98, size),
+            "speechiness": rng.integers(2, 65, size),
+        })
+        frame.to_csv(path, index=False, header=start == 0, mode="w" if start == 0 else "a")
+    return path
+
+
+LOAD_SCRIPT = """
+import sys, time, resource
+start = time.perf_counter()
+mode, path = sys.argv[1], sys.argv[2]
+if mode == "csv":
+    import pandas as pd
+    data = pd.read_csv(path)
+else:
+    from dataset import load_dataset
+    data = load_dataset(path)
+    data.select_dtypes("number").sum()
+elapsed = time.perf_counter() - start
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+try:
+    with open("/proc/self/status") as status:
+        peak = next(int(line.split()[1]) for line in status if line.startswith("VmHWM"))
+except (OSError, StopIteration):
+    pass
+print(elapsed, peak)
+"""
+
+
+def _run_load(mode, path):
+    """Time one load in a fresh interpreter and return (seconds, peak RSS in MiB)."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run([sys.executable, "-c", LOAD_SCRIPT, mode, path], cwd=here,
+                            capture_output=True, text=True, check=True).stdout.split()
+    return float(output[0]), int(output[1]) / 1024
+
+
+def synthetic_path(rows):
+    """Path of the cached synthetic CSV with the given number of rows, creating it if needed."""
+    path = os.path.abspath(f"synthetic-{rows}.csv")
+    if not os.path.exists(path):
+        make_synthetic(rows, path)
+    return path
+
+
+def _timed(function, *args, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(*args)
+    return (time.perf_counter() - start) / repeat
+
+
+def bench_load(rows):
+    """Compare the plain CSV path with the typed loader and its binary cache."""
+    path = synthetic_path(rows)
+    from dataset import cache_path
+    manifest = os.path.join(cache_path(path), "manifest.json")
+    if os.path.exists(manifest):
+        os.remove(manifest)
+    results = {
+        "read_csv": _run_load("csv", path),
+        "typed_first_load": _run_load("typed", path),
+        "typed_cached_load": _run_load("typed", path),
+    }
+    return {name: {"seconds": round(seconds, 4), "peak_rss_mib": round(rss, 1)}
+            for name, (seconds, rss) in results.items()}
+
+
+def bench_summary(rows):
+    """Per-plot summary table and histogram latency with the stats cache off and on."""
+    from matplotlib.figure import Figure
+    from dataset import load_dataset
+    from graph import HistogramPlot, summary
+    from stats import STATS
+    data = load_dataset(synthetic_path(rows))
+    columns = list(data.select_dtypes("number").columns)
+    # One simulated session: every attribute viewed as histogram, density and box plot.
+    session = [column for column in columns for _ in range(3)]
+
+    def table(attribute):
+        summary(data, attribute, Figure().add_subplot(111))
+
+    def run_session():
+        for attribute in session:
+            table(attribute)
+
+    results = {}
+    for label, enabled in (("before", False), ("after", True)):
+        STATS.enabled = enabled
+        STATS.invalidate()
+        session_seconds = _timed(run_session)
+        results[label] = {
+            "summary_ms_per_plot": round(session_seconds / len(session) * 1000, 3),
+            "histogram_ms": round(_timed(HistogramPlot().draw, data, Figure(), "streams") * 1000, 3),
+        }
+    STATS.enabled = True
+    return results
+
+
+def bench_query(rows, repeat=200):
+    """Filtered view latency with cold indexes, one changed clause and fully cached, against a mask scan."""
+    from dataset import load_dataset
+    from query import QUERIES
+    data = load_dataset(synthetic_path(rows))
+    conditions = {"releasedyear": (2000, 2020), "mode": ["Major"], "streams": (1e8, None), "bpm": (90, 130)}
+
+    def scan():
+        return data[data["releasedyear"].between(2000, 2020) & (data["mode"] == "Major")
+                    & (data["streams"] >= 1e8) & data["bpm"].between(90, 130)]
+
+    QUERIES.invalidate()
+    cold = _timed(QUERIES.filter, data, conditions)
+    QUERIES.index(data, "key")
+    changed = _timed(QUERIES.bitmap, data, dict(conditions, key=["B"]))
+    return {"rows": len(data), "matches": len(QUERIES.filter(data, conditions)),
+            "mask_scan_ms": round(_timed(scan, repeat=10) * 1000, 3),
+            "cold_ms": round(cold * 1000, 3),
+            "one_new_clause_ms": round(changed * 1000, 3),
+            "cached_bitmap_ms": round(_timed(QUERIES.bitmap, data, conditions, repeat=repeat) * 1000, 4),
+            "cached_view_ms": round(_timed(QUERIES.filter, data, conditions, repeat=repeat) * 1000, 4)}
+
+
+def bench_correlation(rows):
+    """Full correlation matrix of the numeric attributes, cold and cached, against DataFrame.corr."""
+    from dataset import load_dataset, NUMERICAL_VALUES
+    from correlation import CORRELATIONS
+    data = load_dataset(synthetic_path(rows))
+    results = {"rows": len(data)}
+    for method in ("pearson", "spearman"):
+        CORRELATIONS.invalidate()
+        results[method] = {
+            "pandas_ms": round(_timed(lambda: data[NUMERICAL_VALUES].corr(method)) * 1000, 1),
+            "engine_ms": round(_timed(CORRELATIONS.matrix, data, NUMERICAL_VALUES, method) * 1000, 1),
+            "cached_ms": round(_timed(CORRELATIONS.matrix, data, NUMERICAL_VALUES, method, repeat=100) * 1000, 3),
+        }
+    return results
+
+
+def bench_append(rows, appended=10_000, rounds=3):
+    """Cost of following rows appended to a loaded export, against rebuilding the same aggregates."""
+    import shutil
+    import tempfile
+    from dataset import cache_path
+    from watcher import LiveDataset
+    from stats import STATS
+    from distribution import DISTRIBUTIONS
+    from timeseries import TIMESERIES
+    from correlation import CORRELATIONS
+    source = synthetic_path(rows)
+
+    def aggregates(data):
+        STATS.describe(data, ["bpm", "energy"])
+        DISTRIBUTIONS.column(data, "bpm")
+        TIMESERIES.series(data, "streams")
+        CORRELATIONS.matrix(data, ["bpm", "energy", "danceability"])
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, os.path.basename(source))
+        # The copy keeps its modification time, so the binary cache stays valid for it.
+        shutil.copy2(source, path)
+        if os.path.isdir(cache_path(source)):
+            shutil.copytree(cache_path(source), cache_path(path))
+        make_synthetic(appended, os.path.join(directory, "tail.csv"), seed=1)
+        with open(os.path.join(directory, "tail.csv"), "rb") as file:
+            tail = file.read().split(b"\n", 1)[1]
+        live = LiveDataset(path)
+        cold = _timed(aggregates, live.frame)
+        polls, updates = [], []
+        for _ in range(rounds):
+            with open(path, "ab") as file:
+                file.write(tail)
+            polls.append(_timed(live.poll))
+            updates.append(_timed(aggregates, live.frame))
+        return {"rows": rows, "appended_rows": appended, "rebuild_aggregates_ms": round(cold * 1000, 1),
+                "append_ms": round(min(polls) * 1000, 1), "aggregates_after_append_ms": round(min(updates) * 1000, 1),
+                "final_rows": len(live.frame)}
+
+
+def bench_zoom(rows, x="danceability", y="streams", frames=120):
+    """Frame times of zooming into and panning over a scatter view, and of the full draw once it settles."""
+    from dataset import load_dataset
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from navigator import PyramidView, ZOOM_STEP
+    from pyramid import PYRAMIDS
+    data = load_dataset(synthetic_path(rows))
+    start = time.perf_counter()
+    pyramid = PYRAMIDS.pyramid(data, x, y)
+    build = time.perf_counter() - start
+    fig = Figure(figsize=(8, 6))
+    canvas = FigureCanvasAgg(fig)
+    view = PyramidView(fig.add_subplot(111), pyramid)
+    canvas.draw()
+    # Zoom into the densest cell of the overview a step at a time, pan across, then zoom back out.
+    counts, (left, right, bottom, top) = pyramid.overview()
+    row, column = np.unravel_index(np.argmax(counts), counts.shape)
+    focus_x = left + (column + 0.5) * (right - left) / counts.shape[1]
+    focus_y = bottom + (row + 0.5) * (top - bottom) / counts.shape[0]
+    steps = frames // 3
+    moves = [lambda: view.zoom(focus_x, focus_y, ZOOM_STEP)] * steps
+    moves += [lambda: view.pan((view.ax.get_xlim(), view.ax.get_ylim()), 15, 5)] * steps
+    moves += [lambda: view.zoom(focus_x, focus_y, 1 / ZOOM_STEP)] * steps
+    times, kinds = [], []
+    for move in moves:
+        start = time.perf_counter()
+        kinds.append(move())
+        view.blit(canvas)
+        times.append(time.perf_counter() - start)
+    times = np.array(times) * 1000
+    binned = times[np.array(kinds) == "counts"]
+    settled = _timed(canvas.draw, repeat=5)
+    return {"rows": len(pyramid), "build_ms": round(build * 1000, 1), "frames": len(times),
+            "point_frames": kinds.count("points"), "median_frame_ms": round(float(np.median(times)), 1),
+            "median_binned_frame_ms": round(float(np.median(binned)), 1) if len(binned) else None,
+            "p95_frame_ms": round(float(np.percentile(times, 95)), 1),
+            "fps": round(1000 / float(np.mean(times)), 1), "settled_draw_ms": round(settled * 1000, 1)}
+
+
+def bench_search(rows, query="track 12345", limit=20):
+    """Index build time, and latency of a query typed a key at a time and of misspelled queries."""
+    from dataset import load_dataset
+    from search import SEARCH
+    data = load_dataset(synthetic_path(rows))
+    tracks = _timed(SEARCH.tracks, data)
+    artists = _timed(SEARCH.artists, data)
+    keystrokes = []
+    for end in range(1, len(query) + 1):
+        keystrokes.append(_timed(SEARCH.search, data, query[:end], limit))
+    keystrokes = np.array(keystrokes) * 1000
+    fuzzy = [_timed(SEARCH.search, data, text, limit, repeat=5) for text in ("trakc 12345", "artst 1234", "track 1234 5")]
+    return {"rows": len(data), "track_index_ms": round(tracks * 1000, 1), "artist_index_ms": round(artists * 1000, 1),
+            "median_keystroke_ms": round(float(np.median(keystrokes)), 2),
+            "max_keystroke_ms": round(float(keystrokes.max()), 2),
+            "max_fuzzy_ms": round(max(fuzzy) * 1000, 2),
+            "top_match": SEARCH.search(data, query, limit)[0]["name"]}
+
+
+def bench_similar(rows, queries=500, sample_leaves=256, k=10):
+    """Feature tree build time, single query latency, and the all-tracks batch time estimated from a sample."""
+    from concurrent.futures import ThreadPoolExecutor
+    from dataset import load_dataset
+    from similar import SIMILAR
+    data = load_dataset(synthetic_path(rows))
+    build = _timed(SIMILAR.tree, data)
+    tree = SIMILAR.tree(data)
+    picks = np.random.default_rng(0).integers(0, len(data), queries)
+    times = np.array([_timed(SIMILAR.neighbours, data, int(row), k) for row in picks]) * 1000
+    exact = all(np.allclose(SIMILAR.neighbours(data, int(row), k)[1],
+                            tree.brute_force(tree.vector(int(row)), k + 1)[1][1:], atol=1e-4) for row in picks[:20])
+    leaves = np.linspace(0, tree.leaves - 1, min(sample_leaves, tree.leaves)).astype(int)
+    workers = os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        start = time.perf_counter()
+        tracks = sum(len(found[0]) for found in executor.map(lambda leaf: tree.leaf_neighbours(leaf, k), leaves))
+        sample = time.perf_counter() - start
+    return {"rows": len(data), "build_s": round(build, 2), "median_query_ms": round(float(np.median(times)), 3),
+            "p95_query_ms": round(float(np.percentile(times, 95)), 3), "matches_brute_force": exact,
+            "workers": workers, "batch_estimate_s": round(sample * len(data) / max(tracks, 1), 1)}
+
+
+def _attached_memory(attributes):
+    """Aggregate every attribute of the attached snapshots, then report this worker's memory in MiB."""
+    from catalog import attached
+    from graph import column_distribution, describe
+    for data in attached().values():
+        for attribute in attributes:
+            column_distribution(data, attribute)
+            describe(data, [attribute])
+    with open("/proc/self/smaps_rollup") as rollup:
+        fields = {line.split(":")[0]: int(line.split()[1]) for line in rollup if line.rstrip().endswith("kB")}
+    # Anonymous memory is this worker's own; the rest of its RSS is mapped files, shared with the others.
+    return os.getpid(), fields["Anonymous"] / 1024, (fields["Rss"] - fields["Anonymous"]) / 1024
+
+
+def bench_snapshots(rows, workers=(1, 2, 4)):
+    """Memory of worker processes attached to two snapshots, as the number of workers grows."""
+    from catalog import DatasetCatalog
+    from dataset import cache_path, NUMERICAL_VALUES
+    catalog = DatasetCatalog()
+    names = [catalog.add(synthetic_path(size)) for size in (rows, max(rows // 10, 1_000))]
+    paths = catalog.shared(names)
+    snapshot_mib = sum(os.path.getsize(os.path.join(cache_path(path), entry.name)) for path in paths.values()
+                       for entry in os.scandir(cache_path(path)) if entry.name.endswith(".npy")) / 1024 ** 2
+    results = {"rows": rows, "snapshots": names, "snapshot_cache_mib": round(snapshot_mib, 1)}
+    for count in workers:
+        with catalog.pool(names, workers=count) as executor:
+            start = time.perf_counter()
+            reports = {pid: (own, mapped) for pid, own, mapped in executor.map(_attached_memory,
+                                                                                 [NUMERICAL_VALUES] * count)}
+            seconds = time.perf_counter() - start
+        results[f"{count}_workers"] = {"processes": len(reports), "seconds": round(seconds, 2),
+                                       "max_private_mib": round(max(own for own, _ in reports.values()), 1),
+                                       "max_mapped_mib": round(max(mapped for _, mapped in reports.values()), 1)}
+    return results
+
+
+def current_rss_mib():
+    """Resident set size of this process in MiB."""
+    with open("/proc/self/status") as status:
+        return next(int(line.split()[1]) for line in status if line.startswith("VmRSS")) / 1024
+
+
+def bench_memory(rows, renders=500, warmup=50, tolerance_mib=20):
+    """Render repeatedly through the figure pool and check that RSS stays flat."""
+    import gc
+    from dataset import load_dataset
+    from graph import HistogramPlot, BoxplotPlot, ScatterPlot, BarPlot
+    from render import FigurePool, render_png
+    data = load_dataset(synthetic_path(min(rows, 10_000)))
+    pool = FigurePool()
+    plots = [(HistogramPlot(), "bpm", None), (BoxplotPlot(), "energy", None),
+             (ScatterPlot(), "bpm", "streams"), (BarPlot(), "mode", "danceability")]
+    baseline = None
+    for index in range(renders):
+        strategy, attribute1, attribute2 = plots[index % len(plots)]
+        with pool.figure("plot", strategy.figsize) as fig:
+            render_png(strategy, data, attribute1, attribute2, fig=fig)
+        if index + 1 == warmup:
+            gc.collect()
+            baseline = current_rss_mib()
+    gc.collect()
+    final = current_rss_mib()
+    pool.close_all()
+    growth = final - baseline
+    return {"renders": renders, "rss_after_warmup_mib": round(baseline, 1), "rss_final_mib": round(final, 1),
+            "growth_mib": round(growth, 1), "flat": growth < tolerance_mib}
+
+
+STARTUP_TARGETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "startup.json")
+
+FIRST_FRAME_SCRIPT = """
+import time
+start = time.perf_counter()
+import tkinter
+try:
+    from ui import AppUI
+    app = AppUI()
+    app.update()
+except tkinter.TclError:
+    print("nan")
+else:
+    print(time.perf_counter() - start)
+    app.on_destroy_window(None)
+"""
+
+
+NAVIGATION_SCRIPT = """
+import sys, time, tkinter
+try:
+    from ui import AppUI
+    app = AppUI()
+    app.update()
+except tkinter.TclError:
+    print("nan nan")
+    sys.exit()
+
+pages = [lambda: app.visualization_option_page(None), lambda: app.histogram_page(None),
+         lambda: app.density_plot_page(None), lambda: app.bar_chart_page(None),
+         lambda: app.scatter_plot_page(None), lambda: app.boxplot_page(None), app.welcome_page]
+
+def switches(rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for page in pages:
+            page()
+            app.update()
+    return (time.perf_counter() - start) / (rounds * len(pages))
+
+print(switches(1), switches(20))
+app.on_destroy_window(None)
+"""
+
+
+def bench_navigation(rows=None):
+    """Average page switch time on the first visit, which builds the page, and on later visits."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run([sys.executable, "-c", NAVIGATION_SCRIPT], cwd=here, capture_output=True,
+                            text=True, check=True).stdout.split()
+    first, again = (float(value) * 1000 for value in output)
+    return {"first_visit_ms": None if first != first else round(first, 2),
+            "revisit_ms": None if again != again else round(again, 2)}
+
+
+def _import_ms(module):
+    here = os.path.dirname(os.path.abspath(__file__))
+    lines = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=here,
+                           capture_output=True, text=True, check=True).stderr.splitlines()
+    entry = next(line for line in reversed(lines) if line.rstrip().endswith(f"| {module}"))
+    return int(entry.split("|")[1]) / 1000
+
+
+def bench_startup(rows=None, samples=5):
+    """Import time of ui and time to the first drawn frame, against the checked-in targets."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    import_ms = sorted(_import_ms("ui") for _ in range(samples))[samples // 2]
+    frames = [float(subprocess.run([sys.executable, "-c", FIRST_FRAME_SCRIPT], cwd=here, capture_output=True,
+                                   text=True, check=True).stdout) for _ in range(samples)]
+    first_frame_ms = sorted(frames)[samples // 2] * 1000
+    first_frame_ms = None if first_frame_ms != first_frame_ms else round(first_frame_ms, 1)
+    with open(STARTUP_TARGETS, encoding="utf-8") as file:
+        targets = json.load(file)["targets"]
+    result = {"import_ui_ms": round(import_ms, 1), "first_frame_ms": first_frame_ms}
+    # A missing measurement (no display to draw on) never counts as a regression.
+    result["within_targets"] = all(result[name] is None or result[name] <= limit for name, limit in targets.items())
+    return result
+
+
+SUITE_SIZES = (1_000, 100_000, 1_000_000, 10_000_000)
+# Suite cases as (case, attribute1, attribute2); cases are chart types, plus the storytelling
+# figure and the summary table drawn on its own.
+SUITE_CASES = [("histogram", "streams", None), ("density", "danceability", None), ("box", "valence", None),
+               ("bar", "releasedmonth", "danceability"), ("scatter", "danceability", "energy"),
+               ("line", "releasedyear", "streams"), ("heatmap", "pearson", None), ("artists", "streams", None),
+               ("similar", "streams", None), ("storytelling", "streams", None), ("summary", "bpm", None)]
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "results")
+# A change is a regression when it is this much slower or bigger and above the noise floor.
+REGRESSION_RATIO = 1.25
+NOISE_FLOOR = {"ms": 5.0, "mib": 5.0, "seconds": 0.05}
+
+CASE_SCRIPT = """
+import sys, json
+import matplotlib
+matplotlib.use("Agg")
+import benchmark
+print(json.dumps(benchmark.run_case(sys.argv[1], sys.argv[2], sys.argv[3], sys.argv[4] or None, int(sys.argv[5]))))
+"""
+
+
+def _reset_peak_rss():
+    """Restart the peak RSS high-water mark (Linux) and return the current RSS in MiB."""
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+    except OSError:
+        pass
+    return current_rss_mib()
+
+
+def peak_rss_mib():
+    """Peak resident set size of this process in MiB."""
+    with open("/proc/self/status") as status:
+        return next(int(line.split()[1]) for line in status if line.startswith("VmHWM")) / 1024
+
+
+def suite_strategy(case):
+    """Graph strategy drawn by a suite case."""
+    from graph import CHARTS, GraphStrategy, StorytellingPlot, summary
+
+    class SummaryTable(GraphStrategy):
+        """The summary table on its own figure."""
+
+        figsize = (8, 3)
+
+        def draw(self, data, fig, attribute, a2=None):
+            """Draw the summary table of the attribute."""
+            ax = fig.add_subplot(111)
+            summary(data, attribute, ax)
+            ax.axis("off")
+
+    return {"storytelling": StorytellingPlot, "summary": SummaryTable}.get(case, CHARTS.get(case))()
+
+
+def run_case(path, case, attribute1, attribute2=None, repeat=3):
+    """Render one suite case to PNG on Agg: a cold first render, then warm repeats.
+
+    Meant to run in a fresh interpreter, so the first render starts with empty engine
+    caches and the peak memory belongs to this case alone.
+    """
+    from dataset import load_dataset
+    from profiling import PROFILER
+    from render import FigurePool, render_image
+    data = load_dataset(path)
+    strategy = suite_strategy(case)
+    pool = FigurePool()
+    baseline = _reset_peak_rss()
+    PROFILER.enable()
+    seconds = []
+    for index in range(1 + repeat):
+        start = time.perf_counter()
+        with pool.figure("bench", strategy.figsize) as fig:
+            render_image(strategy, data, attribute1, attribute2, fig=fig)
+        seconds.append(time.perf_counter() - start)
+        if index == 0:
+            cold = PROFILER.summary()["spans"]
+            PROFILER.reset()
+    peak = peak_rss_mib()
+    phases = {}
+    for name, span in cold.items():
+        phase = name.partition(".")[0]
+        # Sub-spans of draw are already inside it; aggregations have no enclosing span of their own.
+        if name == phase or phase == "aggregate":
+            phases[phase] = round(phases.get(phase, 0) + span["total_ms"], 3)
+    warm = sorted(seconds[1:])
+    return {"cold_ms": round(seconds[0] * 1000, 2), "warm_ms": round(warm[len(warm) // 2] * 1000, 2) if warm else None,
+            "peak_rss_mib": round(peak, 1), "peak_delta_mib": round(peak - baseline, 1), "cold_phases_ms": phases}
+
+
+def bench_suite(sizes=SUITE_SIZES, cases=SUITE_CASES, repeat=3):
+    """Time the data load and every suite case at each size, each case in a fresh interpreter."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for rows in sizes:
+        entry = results[str(rows)] = {"load": bench_load(rows)}
+        print(f"{rows:>10} {'load':<13} {json.dumps(entry['load'])}", file=sys.stderr)
+        for case, attribute1, attribute2 in cases:
+            completed = subprocess.run([sys.executable, "-c", CASE_SCRIPT, synthetic_path(rows), case, attribute1,
+                                        attribute2 or "", str(repeat)], cwd=here, capture_output=True, text=True)
+            if completed.returncode:
+                error = (completed.stderr.strip().splitlines() or ["no output"])[-1]
+                entry[case] = {"error": error}
+            else:
+                entry[case] = json.loads(completed.stdout)
+            print(f"{rows:>10} {case:<13} {json.dumps(entry[case])}", file=sys.stderr)
+    return results
+
+
+def run_metadata():
+    """Commit and library versions a set of results was measured with."""
+    import platform
+    import matplotlib
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    def git(*args):
+        completed = subprocess.run(["git", *args], cwd=here, capture_output=True, text=True)
+        return completed.stdout.strip() if completed.returncode == 0 else None
+
+    return {"commit": git("rev-parse", "--short", "HEAD"), "dirty": bool(git("status", "--porcelain", "--", "*.py")),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "python": platform.python_version(),
+            "numpy": np.__version__, "pandas": pd.__version__, "matplotlib": matplotlib.__version__,
+            "machine": platform.machine(), "cpus": os.cpu_count()}
+
+
+def _metrics(entry):
+    """Flat {metric path: value} of one suite result, for comparisons."""
+    flat = {}
+    for name, value in entry.items():
+        if isinstance(value, dict):
+            flat.update({f"{name}.{key}": item for key, item in _metrics(value).items()})
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and not name.endswith("_phases_ms"):
+            flat[name] = value
+    return flat
+
+
+def compare_results(base, new, ratio=REGRESSION_RATIO):
+    """Rows of (size, metric, base, new, ratio, regressed) for every metric both result sets have."""
+    rows = []
+    for size, entry in new["results"].items():
+        before = _metrics(base["results"].get(size, {}))
+        for metric, value in _metrics(entry).items():
+            old = before.get(metric)
+            if old is None or "phases" in metric:
+                continue
+            unit = "ms" if metric.endswith("_ms") else "mib" if metric.endswith("_mib") else "seconds"
+            change = value / old if old else float("inf") if value else 1.0
+            regressed = change > ratio and value - old > NOISE_FLOOR[unit]
+            rows.append((size, metric, old, value, change, regressed))
+    return rows
+
+
+def print_comparison(rows, base_label, new_label):
+    """Print a comparison table and return the number of regressions."""
+    print(f"{'rows':>10}  {'metric':<34}{base_label[:12]:>12}{new_label[:12]:>12}  change", file=sys.stderr)
+    for size, metric, old, value, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{size:>10}  {metric:<34}{old:>12}{value:>12}  {change:5.2f}x{flag}", file=sys.stderr)
+    return sum(row[-1] for row in rows)
+
+
+def _load_results(path):
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def run_suite(args):
+    """Run or compare suite results for the command line; returns the exit status."""
+    if args.suite:
+        results = {"meta": run_metadata(), "sizes": args.sizes, "repeat": args.repeat,
+                   "results": bench_suite(args.sizes, repeat=args.repeat)}
+        meta = results["meta"]
+        path = args.save or os.path.join(RESULTS_DIR, f"{meta['commit'] or 'results'}"
+                                                      f"{'-dirty' if meta['dirty'] else ''}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+        print(f"wrote {path}", file=sys.stderr)
+        bases = args.compare or []
+    else:
+        bases, path = args.compare[:-1], args.compare[-1]
+        results = _load_results(path)
+    regressions = 0
+    for base_path in bases:
+        base = _load_results(base_path)
+        rows = compare_results(base, results, args.threshold)
+        regressions += print_comparison(rows, base["meta"].get("commit") or base_path,
+                                        results["meta"].get("commit") or path)
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Spotify Hot Hits benchmarks.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--only", choices=["load", "summary", "query", "correlation", "append", "memory", "startup",
+                                                "navigation", "zoom", "search", "similar", "snapshots"])
+    parser.add_argument("--suite", action="store_true",
+                        help="time loading and every chart at each of --sizes and save the results")
+    parser.add_argument("--sizes", type=lambda text: [int(size) for size in text.split(",")], default=list(SUITE_SIZES),
+                        help="comma separated row counts for --suite")
+    parser.add_argument("--repeat", type=int, default=3, help="warm renders per suite case")
+    parser.add_argument("--save", default=None, help="suite results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", nargs="+", metavar="RESULTS",
+                        help="with --suite, results to compare against; alone, compare the last file with the others")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_RATIO,
+                        help="slowdown ratio reported as a regression")
+    args = parser.parse_args(argv)
+    if args.suite or args.compare:
+        if not args.suite and len(args.compare) < 2:
+            parser.error("--compare needs two results files without --suite")
+        sys.exit(run_suite(args))
+    benches = {"load": bench_load, "summary": bench_summary, "query": bench_query, "correlation": bench_correlation,
+               "append": bench_append, "memory": bench_memory, "startup": bench_startup, "navigation": bench_navigation,
+               "zoom": bench_zoom, "search": bench_search, "similar": bench_similar,
+               "snapshots": bench_snapshots}
+    results = {name: bench(args.rows) for name, bench in benches.items() if args.only in (None, name)}
+    print(json.dumps(results, indent=2))
+    if "memory" in results and not results["memory"]["flat"]:
+        sys.exit("memory grew across repeated renders")
+    if "startup" in results and not results["startup"]["within_targets"]:
+        sys.exit(f"startup is slower than the targets in {STARTUP_TARGETS}")
+
+
+if __name__ == "__main__":
+    main()
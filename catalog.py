@@ -0,0 +1,127 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataset import SCHEMA, fingerprint, load_dataset
+
+
+# Columns a snapshot is loaded with: every column but the free text ones, which the binary cache
+# keeps as JSON and would be parsed into a private copy by every process.  The others are .npy
+# files that each process memory-maps, so the page cache holds one copy of a snapshot however
+# many processes read it.
+SNAPSHOT_COLUMNS = [column for column, kind in SCHEMA.items() if kind != "text"]
+
+# Snapshots attached by this worker process, by name.
+_attached = OrderedDict()
+
+
+def snapshot_name(path):
+    """Default name of a snapshot: its file name without extension."""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def attach(paths, columns=SNAPSHOT_COLUMNS):
+    """Map the cached columns of snapshots, given as name -> CSV path, into this process.
+
+    Meant as a process pool initializer: the paths are all that is pickled, and the columns are
+    read straight from the binary cache rather than copied from the parent.
+    """
+    for name, path in paths.items():
+        _attached[name] = load_dataset(path, columns=columns)
+
+
+def attached(names=None):
+    """Snapshots attached by this process, as name -> frame, all of them by default."""
+    return OrderedDict((name, _attached[name]) for name in (names or _attached))
+
+
+class DatasetCatalog:
+    """Named chart snapshots, each a CSV loaded once through its binary cache.
+
+    Frames are keyed by file fingerprint, so two names for one file share a frame and a file
+    rewritten since it was loaded is loaded again.  Memory grows with the number of distinct
+    snapshots: views in this process share the frames, and worker processes from pool() map
+    the same cache files.
+    """
+
+    def __init__(self, columns=SNAPSHOT_COLUMNS):
+        """Dataset catalog constructor."""
+        self.columns = list(columns)
+        self._paths = OrderedDict()
+        self._frames = {}
+        self._loading = {}
+        self._lock = threading.RLock()
+
+    def add(self, path, name=None):
+        """Register a snapshot under a name, snapshot_name(path) by default; returns the name."""
+        name = name or snapshot_name(path)
+        # Fails now, rather than on first use, when the file cannot be read.
+        fingerprint(path)
+        with self._lock:
+            self._paths[name] = os.path.abspath(path)
+        return name
+
+    def remove(self, name):
+        """Forget a snapshot, and its frame unless another name shares it."""
+        with self._lock:
+            self._paths.pop(name, None)
+            self._prune()
+
+    def names(self):
+        """Names of the snapshots, in the order they were added."""
+        with self._lock:
+            return list(self._paths)
+
+    def path(self, name):
+        """CSV path of a snapshot."""
+        with self._lock:
+            return self._paths[name]
+
+    def frame(self, name):
+        """Frame of a snapshot, loaded on first use; concurrent callers wait for one load."""
+        key = fingerprint(self.path(name))
+        with self._lock:
+            lock = self._loading.setdefault(key, threading.Lock())
+        with lock:
+            with self._lock:
+                frame = self._frames.get(key)
+            if frame is None:
+                frame = load_dataset(self.path(name), columns=self.columns)
+                with self._lock:
+                    self._frames[key] = frame
+                    self._prune()
+        return frame
+
+    def frames(self, names=None):
+        """Frames of some snapshots, all of them by default, as name -> frame."""
+        return OrderedDict((name, self.frame(name)) for name in (names or self.names()))
+
+    def shared(self, names=None):
+        """Paths of some snapshots, all of them by default, for attach() in other processes.
+
+        The snapshots are loaded here first, which writes any missing binary cache once, so
+        the other processes only map it.
+        """
+        names = list(names or self.names())
+        self.frames(names)
+        return OrderedDict((name, self.path(name)) for name in names)
+
+    def pool(self, names=None, workers=None):
+        """Process pool whose workers attach() to the snapshots instead of receiving pickled frames."""
+        return ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, initializer=attach,
+                                   initargs=(self.shared(names), self.columns))
+
+    def _prune(self):
+        # Frames of files no longer registered, or rewritten since, are dropped.
+        current = set()
+        for path in self._paths.values():
+            try:
+                current.add(fingerprint(path))
+            except OSError:
+                pass
+        for key in [key for key in self._frames if key not in current]:
+            del self._frames[key]
+            self._loading.pop(key, None)
+
+
+CATALOG = DatasetCatalog()
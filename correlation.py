@@ -0,0 +1,225 @@
+import threading
+import numpy as np
+import pandas as pd
+from stats import dataset_version, register_cache
+
+
+METHODS = ("pearson", "spearman")
+CHUNK_ROWS = 1_000_000
+
+
+def _shifted(values, low):
+    """Integral values minus low as table indexes; integers with a zero low are used as they are."""
+    if values.dtype.kind in "iub" and not low:
+        return values
+    return values.astype(np.intp) - low
+
+
+class ColumnRanks:
+    """Average ranks of one column across a list of arrays, with ties sharing their mean rank.
+
+    Integer columns with a modest range are ranked by counting values, without sorting, and
+    looked up from their values.  Anything else is ranked through np.unique and looked up by
+    row position.  Missing values rank as NaN.
+    """
+
+    def __init__(self, arrays):
+        """Column ranks constructor."""
+        present = [array[~np.isnan(array)] if array.dtype.kind == "f" else array for array in arrays]
+        total = sum(len(values) for values in present)
+        self.low = None
+        self.codes = None
+        if not total:
+            self.table = np.empty(0)
+            return
+        low = min(values.min() for values in present if len(values))
+        high = max(values.max() for values in present if len(values))
+        compact = float(high) - float(low) <= 4 * total
+        if compact and all(values.dtype.kind in "iub" or np.array_equal(values, np.floor(values))
+                           for values in present):
+            # Non-negative values index the counts directly, negative ones are offset by the minimum.
+            self.low = min(int(low), 0)
+            size = int(high) - self.low + 1
+            counts = sum(np.bincount(_shifted(values, self.low), minlength=size) for values in present)
+        else:
+            _, inverse, counts = np.unique(np.concatenate(present).astype("float64"), return_inverse=True,
+                                           return_counts=True)
+            self.codes = np.full(sum(len(array) for array in arrays), -1, dtype=np.intp)
+            self.codes[~np.isnan(np.concatenate(arrays).astype("float64"))] = inverse
+        # A missing value looks up the trailing NaN.
+        self.table = np.append(np.cumsum(counts) - (counts - 1) / 2, np.nan)
+
+    def lookup(self, values, start, out):
+        """Write the ranks of values, the rows start.. of the column, into out."""
+        if self.codes is not None:
+            np.take(self.table, self.codes[start:start + len(values)], out=out)
+            return
+        if values.dtype.kind == "f":
+            values = np.where(np.isnan(values), len(self.table) - 1 + self.low, values)
+        np.take(self.table, _shifted(values, self.low), out=out)
+
+
+class MomentMatrix:
+    """Pairwise-complete sums of a set of columns, from which Pearson correlations follow.
+
+    Each chunk costs one X'X product over all rows plus small corrections from the rows that
+    have a missing cell, so appended rows are folded in without revisiting the old ones.
+    Values are shifted by the means of the first chunk to keep the sums well conditioned.
+    """
+
+    def __init__(self, size):
+        """Moment matrix constructor."""
+        self.shift = None
+        self.pairs = np.zeros((size, size))
+        self.sums = np.zeros((size, size))
+        self.squares = np.zeros((size, size))
+        self.products = np.zeros((size, size))
+
+    def update(self, values):
+        """Fold a rows x columns float array, which is modified in place, into the sums."""
+        if not len(values):
+            return self
+        # A missing cell makes its row sum NaN, which finds incomplete rows in one BLAS pass.
+        incomplete = np.isnan(values @ np.ones(values.shape[1]))
+        if self.shift is None:
+            complete = values[~incomplete]
+            self.shift = complete.mean(axis=0) if len(complete) else np.zeros(values.shape[1])
+        values -= self.shift
+        partial = values[incomplete]
+        present = ~np.isnan(partial)
+        partial[~present] = 0.0
+        if len(partial):
+            values[incomplete] = partial
+        present = present.astype("float64")
+        products = values.T @ values
+        totals = np.ones(len(values)) @ values
+        squares = np.diag(products)
+        # Sums over the rows both columns have: everything, minus what incomplete rows contribute
+        # in full, plus what they contribute where the other column is present.
+        self.pairs += len(values) - len(partial) + present.T @ present
+        self.sums += (totals - partial.sum(axis=0))[:, None] + partial.T @ present
+        self.squares += (squares - (partial * partial).sum(axis=0))[:, None] + (partial * partial).T @ present
+        self.products += products
+        return self
+
+    def correlation(self):
+        """Pearson correlation matrix; pairs without variance are NaN."""
+        n, sums = self.pairs, self.sums
+        with np.errstate(invalid="ignore", divide="ignore"):
+            covariance = n * self.products - sums * sums.T
+            variance = (n * self.squares - sums * sums) * (n * self.squares.T - sums.T * sums.T)
+            matrix = covariance / np.sqrt(variance)
+        np.clip(matrix, -1, 1, out=matrix)
+        np.fill_diagonal(matrix, np.where(np.diag(self.pairs) > 1, 1.0, np.nan))
+        return matrix
+
+
+def _chunks(parts, columns, ranks=None, chunk_rows=CHUNK_ROWS):
+    """Column-major float64 blocks of the rows of every part, as values or as ranks."""
+    offset = 0
+    for part in parts:
+        arrays = [part[column].to_numpy() for column in columns]
+        for start in range(0, len(part), chunk_rows):
+            stop = min(start + chunk_rows, len(part))
+            block = np.empty((stop - start, len(columns)), order="F")
+            for index, array in enumerate(arrays):
+                if ranks is None:
+                    block[:, index] = array[start:stop]
+                else:
+                    ranks[index].lookup(array[start:stop], offset + start, block[:, index])
+            yield block
+        offset += len(part)
+
+
+class CorrelationState:
+    """Pearson moments and Spearman ranks of one column set of one frame.
+
+    Each column is ranked once over its present values and the ranks are shared by every
+    pair; pandas re-ranks each pair over the rows both have, so Spearman values involving a
+    column with missing cells differ slightly from DataFrame.corr.
+    """
+
+    def __init__(self, data, columns):
+        """Correlation state constructor."""
+        self.columns = list(columns)
+        self.parts = []
+        self.pearson = MomentMatrix(len(self.columns))
+        self.spearman = None
+        self.lock = threading.Lock()
+        self.extend(data)
+
+    def extend(self, rows):
+        """Fold appended rows in; Pearson is updated in place, Spearman is recomputed on demand."""
+        with self.lock:
+            for block in _chunks([rows], self.columns):
+                self.pearson.update(block)
+            self.parts.append(rows)
+            # Appended rows shift the ranks of every existing row, so the ranks are rebuilt lazily.
+            self.spearman = None
+
+    def matrix(self, method):
+        """Correlation matrix by method."""
+        with self.lock:
+            if method == "pearson":
+                return self.pearson.correlation()
+            if self.spearman is None:
+                ranks = [ColumnRanks([part[column].to_numpy() for part in self.parts]) for column in self.columns]
+                moments = MomentMatrix(len(self.columns))
+                for block in _chunks(self.parts, self.columns, ranks):
+                    moments.update(block)
+                self.spearman = moments.correlation()
+            return self.spearman
+
+
+class CorrelationEngine:
+    """Per dataset version cache of correlation matrices over a column set."""
+
+    def __init__(self):
+        """Correlation engine constructor."""
+        self._states = {}
+        self._lock = threading.RLock()
+
+    def state(self, data, columns):
+        """Moments and ranks of the columns of the frame, built on first use."""
+        key = (dataset_version(data), tuple(columns))
+        with self._lock:
+            state = self._states.get(key)
+        if state is None:
+            state = CorrelationState(data, columns)
+            with self._lock:
+                state = self._states.setdefault(key, state)
+        return state
+
+    def matrix(self, data, columns, method="pearson"):
+        """Correlation matrix of the columns as a frame, like data[columns].corr(method)."""
+        if method not in METHODS:
+            raise ValueError(f"unknown correlation method '{method}', expected one of {', '.join(METHODS)}")
+        columns = list(columns)
+        matrix = self.state(data, columns).matrix(method)
+        return pd.DataFrame(matrix, index=columns, columns=columns)
+
+    def extend(self, data, rows):
+        """Fold appended rows into every correlation state already built for the frame."""
+        version = dataset_version(data)
+        with self._lock:
+            states = [state for key, state in self._states.items() if key[0] == version]
+        for state in states:
+            state.extend(rows)
+
+    def rekey(self, version, new_version):
+        """Move the correlation states of one dataset version to another."""
+        with self._lock:
+            for key in [key for key in self._states if key[0] == version]:
+                self._states[(new_version, *key[1:])] = self._states.pop(key)
+
+    def invalidate(self, version=None):
+        """Drop the correlation states of one dataset version, or all of them."""
+        with self._lock:
+            if version is None:
+                self._states.clear()
+                return
+            for key in [key for key in self._states if key[0] == version]:
+                del self._states[key]
+
+
+CORRELATIONS = register_cache(CorrelationEngine())
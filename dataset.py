@@ -0,0 +1,189 @@
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from profiling import PROFILER
+
+
+DATA_FILE = "spotify-data.csv"
+# Files larger than this are streamed into online aggregates instead of loaded whole.
+STREAM_ABOVE_BYTES = 2 * 1024 ** 3
+NUMERICAL_VALUES = ["artistcount", "releasedyear", "releasedmonth", "releasedday", "inspotifyplaylists",
+                    "inspotifycharts", "streams", "inappleplaylists", "inapplecharts", "indeezercharts", "bpm",
+                    "danceability", "valence", "energy", "acousticness", "instrumentalness", "liveness",
+                    "speechiness"]
+CACHE_DIR = ".cache"
+CACHE_FORMAT = 1
+
+# Column name -> storage kind.  "int" columns are downcast to the smallest integer type
+# that holds their range (float32 when a cell is missing), "streams" is coerced to float64,
+# "category" columns are dictionary encoded and "text" columns stay plain strings.
+SCHEMA = {
+    "trackname": "text",
+    "artistsname": "category",
+    "artistcount": "int",
+    "releasedyear": "int",
+    "releasedmonth": "int",
+    "releasedday": "int",
+    "inspotifyplaylists": "int",
+    "inspotifycharts": "int",
+    "streams": "streams",
+    "inappleplaylists": "int",
+    "inapplecharts": "int",
+    "indeezerplaylists": "int",
+    "indeezercharts": "int",
+    "inshazamcharts": "int",
+    "bpm": "int",
+    "key": "category",
+    "mode": "category",
+    "danceability": "int",
+    "valence": "int",
+    "energy": "int",
+    "acousticness": "int",
+    "instrumentalness": "int",
+    "liveness": "int",
+    "speechiness": "int",
+}
+
+
+NUMERIC_COLUMNS = [column for column, kind in SCHEMA.items() if kind in ("int", "streams")]
+
+
+def apply_schema(frame):
+    """Convert a raw frame in place to the dtypes declared in SCHEMA."""
+    for column, kind in SCHEMA.items():
+        if column not in frame:
+            continue
+        if kind == "category":
+            frame[column] = frame[column].astype("category")
+        elif kind == "text":
+            frame[column] = frame[column].astype(object)
+        elif kind == "streams":
+            # Streams exceed float32 precision, so keep float64 and let bad cells become NaN.
+            frame[column] = pd.to_numeric(frame[column], errors="coerce").astype("float64")
+        else:
+            values = pd.to_numeric(frame[column], errors="coerce")
+            if values.isna().any():
+                frame[column] = values.astype("float32")
+            else:
+                frame[column] = pd.to_numeric(values, downcast="integer")
+    return frame
+
+
+def read_csv(path, **kwargs):
+    """Parse a chart export CSV and apply the typed schema."""
+    dtypes = {column: "category" for column, kind in SCHEMA.items() if kind == "category"}
+    frame = pd.read_csv(path, dtype=dtypes, thousands=",", **kwargs)
+    return apply_schema(frame)
+
+
+def iter_chunks(path, chunk_rows, columns=None):
+    """Parse the CSV in frames of at most chunk_rows rows, each with the typed schema applied."""
+    dtypes = {column: "category" for column, kind in SCHEMA.items()
+              if kind == "category" and (columns is None or column in columns)}
+    for chunk in pd.read_csv(path, dtype=dtypes, thousands=",", usecols=columns, chunksize=chunk_rows):
+        yield apply_schema(chunk)
+
+
+def cache_path(path):
+    """Directory holding the binary cache for the given CSV file."""
+    directory, name = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, CACHE_DIR, name)
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return {"format": CACHE_FORMAT, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def fingerprint(path):
+    """Short identifier of the CSV as last written, which changes whenever the file does."""
+    signature = dict(_signature(path), path=os.path.abspath(path))
+    return hashlib.sha256(json.dumps(signature, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def write_cache(frame, path):
+    """Write one .npy file per column plus a JSON manifest next to the CSV."""
+    directory = cache_path(path)
+    os.makedirs(directory, exist_ok=True)
+    columns = []
+    for index, column in enumerate(frame.columns):
+        series = frame[column]
+        entry = {"name": column, "file": f"{index}.npy"}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            entry["categories"] = series.cat.categories.tolist()
+            values = series.cat.codes.to_numpy()
+        elif series.dtype == object:
+            entry["text"] = True
+            values = None
+            with open(os.path.join(directory, f"{index}.json"), "w", encoding="utf-8") as file:
+                json.dump(series.where(series.notna(), None).tolist(), file)
+            entry["file"] = f"{index}.json"
+        else:
+            values = series.to_numpy()
+        if values is not None:
+            np.save(os.path.join(directory, entry["file"]), values)
+        columns.append(entry)
+    manifest = dict(_signature(path), rows=len(frame), columns=columns)
+    # The manifest is written last so a half-written cache is never picked up.
+    with open(os.path.join(directory, "manifest.json"), "w", encoding="utf-8") as file:
+        json.dump(manifest, file)
+
+
+def read_cache(path, columns=None):
+    """Return the cached frame for the CSV, or None when the cache is missing or stale.
+
+    columns, when given, limits the frame to those columns, so no other file is read.
+    """
+    directory = cache_path(path)
+    try:
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return None
+    signature = _signature(path)
+    if any(manifest.get(key) != value for key, value in signature.items()):
+        return None
+    loaded = {}
+    try:
+        for entry in manifest["columns"]:
+            if columns is not None and entry["name"] not in columns:
+                continue
+            file_name = os.path.join(directory, entry["file"])
+            if entry.get("text"):
+                with open(file_name, encoding="utf-8") as file:
+                    loaded[entry["name"]] = pd.Series(json.load(file), dtype=object)
+                continue
+            values = np.load(file_name, mmap_mode="r")
+            if "categories" in entry:
+                loaded[entry["name"]] = pd.Categorical.from_codes(values, entry["categories"])
+            else:
+                loaded[entry["name"]] = values
+    except (OSError, ValueError, KeyError):
+        return None
+    return pd.DataFrame(loaded, copy=False)
+
+
+def load_dataset(path=DATA_FILE, use_cache=True, columns=None):
+    """Load the dataset, preferring the binary cache and refreshing it when the CSV changed.
+
+    columns, when given, limits the frame to those columns; the cache still gets every column.
+    """
+    with PROFILER.span("load", path=path) as span:
+        if use_cache:
+            with PROFILER.span("load.cache_read"):
+                frame = read_cache(path, columns)
+            if frame is not None:
+                span.note(source="cache", rows=len(frame))
+                return frame
+        with PROFILER.span("load.parse"):
+            frame = read_csv(path)
+        span.note(source="csv", rows=len(frame))
+        if use_cache:
+            try:
+                with PROFILER.span("load.cache_write"):
+                    write_cache(frame, path)
+            except OSError:
+                pass
+        return frame if columns is None else frame[[column for column in frame.columns if column in columns]]
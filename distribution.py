@@ -0,0 +1,224 @@
+import threading
+import numpy as np
+from stats import MAX_COUNTED_SPAN, dataset_version, register_cache
+
+
+GRID_SIZE = 4096
+KDE_CUT = 3
+
+
+class ColumnDistribution:
+    """Fixed-grid bin counts and running moments of one numeric column.
+
+    The grid spans [low, high) in GRID_SIZE equal bins.  Values outside the grid double its
+    span, merging neighbouring bins pairwise, so counts stay exact under incremental updates.
+    """
+
+    def __init__(self, grid_size=GRID_SIZE):
+        """Column distribution constructor."""
+        self.grid_size = grid_size
+        self.counts = np.zeros(grid_size)
+        self.low = None
+        self.high = None
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    @property
+    def width(self):
+        """Width of one grid bin."""
+        return (self.high - self.low) / self.grid_size
+
+    @property
+    def std(self):
+        """Sample standard deviation of the values seen so far."""
+        return np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else float("nan")
+
+    def update(self, values):
+        """Add a batch of values; missing values are ignored."""
+        values = np.asarray(values, dtype="float64")
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return self
+        low, high = values.min(), values.max()
+        if self.low is None:
+            span = high - low if high > low else 1.0
+            self.low, self.high = low, low + span * (1 + 1 / self.grid_size)
+        while low < self.low or high >= self.high:
+            self._grow(upward=high >= self.high)
+        index = ((values - self.low) / self.width).astype(np.intp)
+        np.clip(index, 0, self.grid_size - 1, out=index)
+        self.counts += np.bincount(index, minlength=self.grid_size)
+        self._merge_moments(len(values), values.mean(), ((values - values.mean()) ** 2).sum())
+        self.minimum = min(self.minimum, low)
+        self.maximum = max(self.maximum, high)
+        return self
+
+    def _grow(self, upward):
+        merged = self.counts.reshape(-1, 2).sum(axis=1)
+        span = self.high - self.low
+        self.counts = np.zeros(self.grid_size)
+        if upward:
+            self.counts[:len(merged)] = merged
+            self.high = self.low + 2 * span
+        else:
+            self.counts[len(merged):] = merged
+            self.low = self.high - 2 * span
+
+    def _merge_moments(self, count, mean, m2):
+        total = self.count + count
+        delta = mean - self.mean
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.mean += delta * count / total
+        self.count = total
+
+    def histogram(self, bins=10, span=None):
+        """Counts and edges of an equal-width histogram between the column min and max.
+
+        span, a (low, high) pair, sets other ends, so several columns can share their bins.
+        """
+        if not self.count:
+            return np.zeros(bins), np.linspace(*(span or (0, 1)), bins + 1)
+        low, high = span if span is not None else (self.minimum, self.maximum)
+        high = high if high > low else low + 1
+        edges = np.linspace(low, high, bins + 1)
+        grid_edges = self.low + self.width * np.arange(self.grid_size + 1)
+        cumulative = np.concatenate([[0.0], np.cumsum(self.counts)])
+        # Interpolating the cumulative counts splits grid bins that straddle an edge.
+        counts = np.diff(np.interp(edges, grid_edges, cumulative))
+        counts[0] += np.interp(edges[0], grid_edges, cumulative)
+        counts[-1] += self.count - np.interp(edges[-1], grid_edges, cumulative)
+        return counts, edges
+
+    def bandwidth(self):
+        """Scott's rule bandwidth, as used by seaborn's kdeplot."""
+        return self.std * self.count ** (-1 / 5) if self.count > 1 else float("nan")
+
+    def kde(self, bandwidth=None, cut=KDE_CUT):
+        """Gaussian KDE from the binned counts by FFT convolution, as (x, density) arrays."""
+        bandwidth = self.bandwidth() if bandwidth is None else bandwidth
+        if not self.count or not np.isfinite(bandwidth) or bandwidth <= 0:
+            return np.array([]), np.array([])
+        sigma = bandwidth / self.width
+        radius = int(np.ceil(cut * sigma))
+        padded = np.pad(self.counts, radius)
+        offsets = np.arange(-radius, radius + 1)
+        kernel = np.exp(-0.5 * (offsets / sigma) ** 2)
+        kernel /= kernel.sum()
+        size = len(padded) + len(kernel) - 1
+        smoothed = np.fft.irfft(np.fft.rfft(padded, size) * np.fft.rfft(kernel, size), size)
+        smoothed = smoothed[radius:radius + len(padded)]
+        density = np.clip(smoothed, 0, None) / (self.count * self.width)
+        x = self.low + self.width * (np.arange(len(padded)) - radius + 0.5)
+        keep = (x >= self.minimum - cut * bandwidth) & (x <= self.maximum + cut * bandwidth)
+        return x[keep], density[keep]
+
+
+class ExactColumn(ColumnDistribution):
+    """Fixed-grid distribution of an in-memory column that also bins histograms exactly.
+
+    Integer-valued columns of modest span keep a count per value, as stats.ColumnSummary does;
+    other columns keep their value arrays, which for a cached frame are its memory-mapped columns.
+    """
+
+    def __init__(self, grid_size=GRID_SIZE):
+        """Exact column constructor."""
+        super().__init__(grid_size)
+        self.value_low = None
+        self.value_counts = np.zeros(0, dtype=np.int64)
+        self.parts = []
+
+    def update(self, values):
+        """Add a batch of values; missing values are ignored."""
+        values = np.asarray(values, dtype="float64")
+        super().update(values)
+        finite = values[np.isfinite(values)]
+        if self.value_counts is not None and not (np.array_equal(finite, np.floor(finite))
+                                                  and self.maximum - self.minimum < MAX_COUNTED_SPAN):
+            # From here on the values themselves are kept, those counted so far included.
+            if len(self.value_counts):
+                self.parts.append(np.repeat(self.value_low + np.arange(len(self.value_counts), dtype="float64"),
+                                            self.value_counts))
+            self.value_counts = None
+        if self.value_counts is None:
+            self.parts.append(values)
+        elif len(finite):
+            start, stop = int(self.minimum), int(self.maximum) + 1
+            if self.value_low != start or len(self.value_counts) != stop - start:
+                counts = np.zeros(stop - start, dtype=np.int64)
+                if self.value_low is not None:
+                    offset = self.value_low - start
+                    counts[offset:offset + len(self.value_counts)] = self.value_counts
+                self.value_low, self.value_counts = start, counts
+            self.value_counts += np.bincount((finite - start).astype(np.intp), minlength=len(self.value_counts))
+        return self
+
+    def histogram(self, bins=10, span=None):
+        """Counts and edges of an equal-width histogram between the column min and max.
+
+        span, a (low, high) pair, sets other ends, so several columns can share their bins;
+        values beyond them are counted in the end bins.
+        """
+        if not self.count:
+            return super().histogram(bins, span)
+        low, high = span if span is not None else (self.minimum, self.maximum)
+        high = high if high > low else low + 1
+        if self.value_counts is not None:
+            values = self.value_low + np.arange(len(self.value_counts), dtype="float64")
+            weights = self.value_counts
+        else:
+            values = np.concatenate(self.parts) if len(self.parts) > 1 else self.parts[0]
+            values, weights = values[np.isfinite(values)], None
+        counts, edges = np.histogram(np.clip(values, low, high), bins=bins, range=(low, high), weights=weights)
+        return counts.astype("float64"), edges
+
+
+class DistributionEngine:
+    """Per dataset version cache of column distributions, built on first use."""
+
+    def __init__(self, grid_size=GRID_SIZE):
+        """Distribution engine constructor."""
+        self.grid_size = grid_size
+        self._columns = {}
+        self._lock = threading.RLock()
+
+    def column(self, data, column):
+        """Distribution of one column of the frame."""
+        key = (dataset_version(data), column)
+        with self._lock:
+            distribution = self._columns.get(key)
+        if distribution is None:
+            distribution = ExactColumn(self.grid_size)
+            distribution.update(data[column].to_numpy(dtype="float64", na_value=np.nan))
+            with self._lock:
+                distribution = self._columns.setdefault(key, distribution)
+        return distribution
+
+    def extend(self, data, rows):
+        """Fold appended rows into every distribution already built for the frame."""
+        version = dataset_version(data)
+        with self._lock:
+            entries = [(column, distribution) for (key, column), distribution in self._columns.items()
+                       if key == version]
+        for column, distribution in entries:
+            distribution.update(rows[column].to_numpy(dtype="float64", na_value=np.nan))
+
+    def rekey(self, version, new_version):
+        """Move the distributions of one dataset version to another."""
+        with self._lock:
+            for key in [key for key in self._columns if key[0] == version]:
+                self._columns[(new_version, *key[1:])] = self._columns.pop(key)
+
+    def invalidate(self, version=None):
+        """Drop the distributions of one dataset version, or all of them."""
+        with self._lock:
+            if version is None:
+                self._columns.clear()
+                return
+            for key in [key for key in self._columns if key[0] == version]:
+                del self._columns[key]
+
+
+DISTRIBUTIONS = register_cache(DistributionEngine())
@@ -0,0 +1,37 @@
+import numpy as np
+
+
+def finite_pairs(x, y):
+    """Float arrays of the x/y pairs where both values are finite."""
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    mask = np.isfinite(x) & np.isfinite(y)
+    return x[mask], y[mask]
+
+
+def sort_by_x(x, y):
+    """Finite x/y pairs ordered by x, pairs with equal x in row order."""
+    x, y = finite_pairs(x, y)
+    order = np.argsort(x, kind="stable")
+    return x[order], y[order]
+
+
+def minmax_decimate(x, y, buckets=1000):
+    """Reduce an x-ordered series to the min and max y of each x bucket.
+
+    Every bucket contributes at most two points, so the drawn envelope matches the full
+    series at screen resolution while the point count stays bounded by 2 * buckets.
+    """
+    x, y = sort_by_x(x, y)
+    if len(x) <= 2 * buckets:
+        return x, y
+    edges = np.linspace(x[0], x[-1], buckets + 1)
+    starts = np.unique(np.searchsorted(x, edges[:-1], side="left"))
+    starts = starts[starts < len(x)]
+    lows = np.minimum.reduceat(y, starts)
+    highs = np.maximum.reduceat(y, starts)
+    out_x = np.repeat(x[starts], 2)
+    out_y = np.empty(2 * len(starts))
+    out_y[0::2] = lows
+    out_y[1::2] = highs
+    return out_x, out_y
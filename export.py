@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import argparse
+import matplotlib
+
+matplotlib.use("Agg")
+
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from dataset import load_dataset, DATA_FILE, NUMERICAL_VALUES
+from graph import CHARTS, COMPARISONS, LAYOUTS
+from catalog import CATALOG, attach, attached, snapshot_name
+from profiling import PROFILER
+
+
+FORMATS = ("png", "svg", "pdf")
+
+_worker = {}
+
+
+def chart_jobs(charts=tuple(CHARTS), attributes=NUMERICAL_VALUES):
+    """Every (chart, attribute1, attribute2) combination to render."""
+    jobs = []
+    for chart in charts:
+        if CHARTS[chart].pairwise:
+            jobs.extend((chart, x, y) for x in attributes for y in attributes if x != y)
+        else:
+            jobs.extend((chart, attribute, None) for attribute in CHARTS[chart].attributes or attributes)
+    return jobs
+
+
+def comparison_jobs(charts=tuple(COMPARISONS), attributes=NUMERICAL_VALUES, layouts=LAYOUTS):
+    """Every (chart, layout, attribute) snapshot comparison to render."""
+    return [(chart, layout, attribute) for chart in charts for layout in layouts for attribute in attributes]
+
+
+def chart_name(chart, attribute1, attribute2=None):
+    """File stem of an exported chart."""
+    return f"{chart}-{attribute1}" if attribute2 is None else f"{chart}-{attribute2}-vs-{attribute1}"
+
+
+def _init_worker(data_path, out_dir, formats, snapshots=None):
+    _worker["data"] = load_dataset(data_path)
+    if snapshots:
+        attach(snapshots)
+    _worker["out_dir"] = out_dir
+    _worker["formats"] = formats
+    _worker["figures"] = {}
+
+
+def _figure(figsize):
+    # One figure per size is reused for every chart the worker renders.
+    fig = _worker["figures"].get(figsize)
+    if fig is None:
+        fig = _worker["figures"][figsize] = Figure(figsize=figsize)
+        FigureCanvasAgg(fig)
+    fig.clear()
+    return fig
+
+
+def export_chart(job):
+    """Render one chart in every requested format and return its manifest entry."""
+    chart, attribute1, attribute2 = job
+    return _export(CHARTS[chart](), _worker["data"], chart, chart_name(*job), attribute1, attribute2)
+
+
+def export_comparison(job):
+    """Render one snapshot comparison, drawn from the attached snapshots, and return its manifest entry."""
+    chart, layout, attribute = job
+    name = f"compare-{chart}-{layout}"
+    return _export(COMPARISONS[chart](layout), attached(), name, chart_name(name, attribute), attribute, None)
+
+
+def _export(strategy, data, chart, stem, attribute1, attribute2):
+    entry = {"chart": chart, "attributes": [a for a in (attribute1, attribute2) if a is not None], "files": []}
+    start = time.perf_counter()
+    fig = _figure(strategy.figsize)
+    try:
+        with PROFILER.span("draw", chart=stem):
+            strategy.draw(data, fig, attribute1, attribute2)
+        entry["draw_seconds"] = round(time.perf_counter() - start, 4)
+        for fmt in _worker["formats"]:
+            path = os.path.join(_worker["out_dir"], f"{stem}.{fmt}")
+            with PROFILER.span("rasterize", format=fmt):
+                fig.savefig(path, format=fmt)
+            entry["files"].append(os.path.basename(path))
+    except Exception as error:
+        entry["error"] = f"{type(error).__name__}: {error}"
+    finally:
+        entry["seconds"] = round(time.perf_counter() - start, 4)
+        fig.clear()
+    return entry
+
+
+def export_all(out_dir, data_path=DATA_FILE, charts=tuple(CHARTS), formats=("png",), jobs=None, snapshots=None):
+    """Render the chart matrix into out_dir, write manifest.json and return the manifest.
+
+    snapshots, as name -> CSV path, adds the overlay and side by side comparisons of those
+    snapshots for the charts that have them.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    work = chart_jobs(charts)
+    comparisons = comparison_jobs([chart for chart in charts if chart in COMPARISONS]) if snapshots else []
+    jobs = jobs or os.cpu_count() or 1
+    # Build the binary caches once up front so the workers only memory-map them.
+    load_dataset(data_path)
+    paths = CATALOG.shared([CATALOG.add(path, name) for name, path in snapshots.items()]) if snapshots else None
+    start = time.perf_counter()
+    if jobs == 1:
+        _init_worker(data_path, out_dir, formats, paths)
+        entries = [export_chart(job) for job in work] + [export_comparison(job) for job in comparisons]
+    else:
+        chunksize = max(1, (len(work) + len(comparisons)) // (jobs * 8))
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(data_path, out_dir, formats, paths)) as executor:
+            entries = list(executor.map(export_chart, work, chunksize=chunksize))
+            entries += executor.map(export_comparison, comparisons, chunksize=chunksize)
+    manifest = {
+        "data": os.path.abspath(data_path),
+        "snapshots": dict(paths or {}),
+        "formats": list(formats),
+        "jobs": jobs,
+        "wall_seconds": round(time.perf_counter() - start, 3),
+        "chart_seconds": round(sum(entry["seconds"] for entry in entries), 3),
+        "errors": sum("error" in entry for entry in entries),
+        "charts": entries,
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+    return manifest
+
+
+def main(argv=None):
+    """Command line entry point for headless chart export."""
+    parser = argparse.ArgumentParser(prog="main.py export", description="Render every chart to files.")
+    parser.add_argument("--data", default=DATA_FILE, help="CSV file to plot")
+    parser.add_argument("--out", default="charts", help="output directory")
+    parser.add_argument("--charts", default=",".join(CHARTS), help="comma separated chart types")
+    parser.add_argument("--formats", default="png", help="comma separated subset of png,svg,pdf")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--snapshot", action="append", default=[], metavar="[NAME=]CSV",
+                        help="chart snapshot to compare, repeated for each; adds the snapshot comparisons")
+    parser.add_argument("--trace", default=None,
+                        help="profile the export in one process and write a Chrome trace to this file")
+    args = parser.parse_args(argv)
+    charts = [chart for chart in args.charts.split(",") if chart]
+    formats = [fmt for fmt in args.formats.split(",") if fmt]
+    unknown = [chart for chart in charts if chart not in CHARTS] + [fmt for fmt in formats if fmt not in FORMATS]
+    if unknown:
+        parser.error(f"unknown chart type or format: {', '.join(unknown)}")
+    snapshots = {}
+    for value in args.snapshot:
+        name, _, path = value.rpartition("=")
+        snapshots[name or snapshot_name(path)] = path
+    if args.trace:
+        # Spans are recorded per process, so a traced export renders in this one.
+        PROFILER.enable()
+        args.jobs = 1
+    manifest = export_all(args.out, args.data, charts, formats, args.jobs, snapshots)
+    if args.trace:
+        PROFILER.write_trace(args.trace)
+    for entry in manifest["charts"]:
+        status = entry.get("error", "ok")
+        print(f"{entry['seconds']:8.3f}s  {chart_name(entry['chart'], *entry['attributes'])}  {status}")
+    print(f"{len(manifest['charts'])} charts, {manifest['errors']} errors, {manifest['wall_seconds']}s wall "
+          f"({manifest['chart_seconds']}s of chart time on {manifest['jobs']} workers)")
+    return 1 if manifest["errors"] else 0
@@ -1,55 +1,169 @@
-import seaborn as sns
-import matplotlib.pyplot as plt
+from stats import STATS
+from distribution import DISTRIBUTIONS
+from aggregate import AGGREGATES
+from correlation import CORRELATIONS
+from artists import ARTISTS, ARTIST_FEATURES
+from timeseries import TIMESERIES, DATE_FIELDS, FINEST
+from pyramid import PYRAMIDS
+from similar import SIMILAR, NEIGHBOURS
+from dataset import NUMERICAL_VALUES
+from profiling import PROFILER
 from abc import ABC, abstractmethod
+from matplotlib.colors import LogNorm
+from matplotlib.ticker import FuncFormatter
 from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from downsample import minmax_decimate, sort_by_x
+from streaming import StreamingDataset
 
 
 
-def summary(data, attribute, ax):
+def describe(data, attributes):
+    """Summary statistics of the attributes, from the stats cache or from streamed aggregates."""
+    with PROFILER.span("aggregate.describe", attributes=attributes):
+        if isinstance(data, StreamingDataset):
+            return data.describe(attributes)
+        return STATS.describe(data, attributes)
+
+
+def column_distribution(data, attribute):
+    """Binned distribution of an attribute, from the distribution engine or from streamed aggregates."""
+    with PROFILER.span("aggregate.distribution", attribute=attribute):
+        if isinstance(data, StreamingDataset):
+            return data.distribution(attribute)
+        return DISTRIBUTIONS.column(data, attribute)
+
+
+def summary(data, attributes, ax):
     """Summary statistic of the data."""
-    summary_stats = data[attribute].describe().to_frame().T
-    summary_table = ax.table(cellText=summary_stats.values, colLabels=summary_stats.columns,
-                             cellLoc='center', loc='center')
-    summary_table.auto_set_font_size(False)
-    summary_table.set_fontsize(10)
-    summary_table.scale(1.2, 1.2)
+    summary_stats = describe(data, attributes)
+    with PROFILER.span("draw.table"):
+        summary_table = ax.table(cellText=summary_stats.values, colLabels=summary_stats.columns,
+                                 cellLoc='center', loc='center')
+        summary_table.auto_set_font_size(False)
+        summary_table.set_fontsize(10)
+        summary_table.scale(1.2, 1.2)
+
+
+# Above this many rows scatter plots become binned density images and line plots are decimated.
+MAX_POINTS = 100_000
+
+
+def pyramid_ticks(ax, pyramid):
+    """Label axes binned on log10(1 + value) with the attribute values rather than the logs."""
+    for axis, scale in ((ax.xaxis, pyramid.x_axis), (ax.yaxis, pyramid.y_axis)):
+        if scale.log:
+            axis.set_major_formatter(FuncFormatter(lambda coordinate, position, scale=scale:
+                                                   f"{scale.inverse(coordinate):.3g}"))
+
+
+def density_scatter(ax, data, x_attribute, y_attribute, **kwargs):
+    """Draw an attribute pair as the overview of its density pyramid instead of one marker per row.
+
+    The pyramid is shared with the zoom and pan view, and bins attributes spanning several
+    orders of magnitude, like streams, on a log scale.
+    """
+    with PROFILER.span("aggregate.pyramid", x=x_attribute, y=y_attribute):
+        pyramid = PYRAMIDS.pyramid(data, x_attribute, y_attribute)
+    counts, extent = pyramid.overview(ax.bbox.width, ax.bbox.height)
+    pyramid_ticks(ax, pyramid)
+    counts = counts.astype('float64')
+    counts[counts == 0] = float('nan')
+    return ax.imshow(counts, extent=extent, origin='lower', aspect='auto', cmap='Blues',
+                     norm=LogNorm(vmin=1), interpolation='nearest', **kwargs)
+
+
+# Highlighted tracks are named on the plot when there are at most this many of them.
+MAX_LABELS = 10
+
+
+def highlighted_rows(data, labels):
+    """Positions in the frame of the highlighted rows it holds, given by index label."""
+    if not len(labels):
+        return []
+    positions = data.index.get_indexer(labels)
+    return positions[positions >= 0]
+
+
+def mark_tracks(ax, data, positions, x, y):
+    """Mark highlighted tracks at plot coordinates, naming them when there are only a few."""
+    ax.scatter(x, y, color='red', edgecolor='black', s=40, zorder=3, clip_on=False)
+    if len(positions) <= MAX_LABELS:
+        for name, x_value, y_value in zip(data['trackname'].iloc[positions], x, y):
+            ax.annotate(str(name), (x_value, y_value), xytext=(4, 4), textcoords='offset points', fontsize=8,
+                        color='red')
+
+
+def plot_axes(fig):
+    """Split the figure into a plot area and a summary table area."""
+    return fig.subplots(nrows=2, gridspec_kw={'height_ratios': [3, 1]})
 
 
 class GraphStrategy(ABC):
     """Abstract class for different types of graph strategies."""
 
+    figsize = (8, 10)
+    max_points = MAX_POINTS
+    pairwise = False
+    # Values attribute1 takes when every chart is exported; None means every numeric column.
+    attributes = None
+    # Index labels of rows marked on the plot, such as the tracks picked in a search.
+    highlight = ()
+
     @abstractmethod
-    def visualize(self, data, master, attribute1, attribute2):
-        """Visualize the graph based on the given data, master window, and attribute."""
+    def draw(self, data, fig, attribute1, attribute2):
+        """Draw the graph for the given data and attribute onto a matplotlib figure."""
         pass
 
+    def make_figure(self):
+        """Create a standalone figure that is not tracked by pyplot."""
+        return Figure(figsize=self.figsize)
+
+    def visualize(self, data, master, attribute1, attribute2=None):
+        """Visualize the graph based on the given data, master window, and attribute."""
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        fig = self.make_figure()
+        with PROFILER.span("draw", chart=type(self).__name__, rows=len(data)):
+            self.draw(data, fig, attribute1, attribute2)
+        canvas = FigureCanvasTkAgg(fig, master=master)
+        with PROFILER.span("rasterize"):
+            canvas.draw()
+        with PROFILER.span("blit"):
+            canvas.get_tk_widget().pack(fill='both', expand=True)
+
 
 class HistogramPlot(GraphStrategy):
     """Class for plotting histogram graphs."""
 
-    def visualize(self, data, master, attribute, a2=None):
-        """Visualize a histogram graph based on the given data, master window, and attribute."""
-        fig, (ax1, ax2) = plt.subplots(nrows=2, figsize=(8, 10), gridspec_kw={'height_ratios': [3, 1]})
-        ax1.hist(data[attribute], bins=10, color='blue', edgecolor='black')
+    def __init__(self, highlight=()):
+        """Histogram constructor; highlighted rows are marked along the x axis."""
+        self.highlight = highlight
+
+    def draw(self, data, fig, attribute, a2=None):
+        """Draw a histogram graph based on the given data and attribute."""
+        ax1, ax2 = plot_axes(fig)
+        counts, edges = column_distribution(data, attribute).histogram(bins=10)
+        ax1.bar(edges[:-1], counts, width=edges[1:] - edges[:-1], align='edge', color='blue', edgecolor='black')
+        positions = highlighted_rows(data, self.highlight)
+        if len(positions):
+            values = data[attribute].iloc[positions].to_numpy(dtype='float64', na_value=float('nan'))
+            mark_tracks(ax1, data, positions, values, [0] * len(values))
         ax1.set_xlabel(attribute.capitalize())
         ax1.set_ylabel('Frequency')
         ax1.set_title(f'Histogram of {attribute.capitalize()}')
         ax1.ticklabel_format(useOffset=False, axis='x', style='plain')
         summary(data, attribute, ax2)
         ax2.axis('off')
-        canvas = FigureCanvasTkAgg(fig, master=master)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill='both', expand=True)
 
 
 class DensityPlot(GraphStrategy):
     """Class for plotting density plot graphs."""
 
-    def visualize(self, data, master, attribute, a2=None):
-        """Visualize a density plot graph based on the given data, master window, and attribute."""
-        fig, (ax1, ax2) = plt.subplots(nrows=2, figsize=(8, 10), gridspec_kw={'height_ratios': [3, 1]})
-        sns.kdeplot(data[attribute], color="blue", shade=True, ax=ax1)
+    def draw(self, data, fig, attribute, a2=None):
+        """Draw a density plot graph based on the given data and attribute."""
+        ax1, ax2 = plot_axes(fig)
+        x, density = column_distribution(data, attribute).kde()
+        ax1.fill_between(x, density, color="blue", alpha=0.25, linewidth=0)
+        ax1.plot(x, density, color="blue")
         ax1.set_title(f'Density Plot of {attribute.capitalize()}')
         ax1.set_xlabel(attribute.capitalize())
         ax1.set_ylabel('Density')
@@ -57,90 +171,391 @@ class DensityPlot(GraphStrategy):
         ax1.set_ylim(bottom=0)
         summary(data, attribute, ax2)
         ax2.axis('off')
-        canvas = FigureCanvasTkAgg(fig, master=master)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill='both', expand=True)
 
 
 class LinePlot(GraphStrategy):
-    """Class for plotting line plot graphs."""
+    """Class for plotting line plot graphs.
+
+    A release date field on the x axis draws the y attribute over the release timeline, from
+    the rollup whose periods fit the visible range, instead of one vertex per track.
+    """
 
-    def visualize(self, data, master, x_attribute, y_attribute):
-        """Visualize a line plot graph based on the given data, master window, x attribute, and y attribute."""
-        fig, (ax1, ax2) = plt.subplots(nrows=2, figsize=(8, 10), gridspec_kw={'height_ratios': [3, 1]})
-        ax1.plot(data[x_attribute], data[y_attribute], color='blue')
+    pairwise = True
+
+    def __init__(self, statistic='mean', start=None, end=None):
+        """Line plot constructor; the statistic and date range apply to release date timelines."""
+        self.statistic = statistic
+        self.start = start
+        self.end = end
+
+    def draw(self, data, fig, x_attribute, y_attribute):
+        """Draw a line plot graph based on the given data, x attribute, and y attribute."""
+        if x_attribute in DATE_FIELDS:
+            return self.draw_timeline(data, fig, x_attribute, y_attribute)
+        ax1, ax2 = plot_axes(fig)
+        # Both branches draw the series in x order, so the line reads the same at any row count.
+        if len(data) > self.max_points:
+            ax1.plot(*minmax_decimate(data[x_attribute], data[y_attribute]), color='blue')
+        else:
+            ax1.plot(*sort_by_x(data[x_attribute], data[y_attribute]), color='blue')
         ax1.set_xlabel(x_attribute.capitalize())
         ax1.set_ylabel(y_attribute.capitalize())
         ax1.set_title(f'Line Plot of {y_attribute.capitalize()} vs. {x_attribute.capitalize()}')
         ax1.ticklabel_format(useOffset=False, axis='both', style='plain')
-        summary_stats = data[[x_attribute, y_attribute]].describe().T
-        summary_table = ax2.table(cellText=summary_stats.values, colLabels=summary_stats.columns,
-                                  cellLoc='center', loc='center')
-        summary_table.auto_set_font_size(False)
-        summary_table.set_fontsize(10)
-        summary_table.scale(1.2, 1.2)
+        summary(data, [x_attribute, y_attribute], ax2)
+        ax2.axis('off')
+
+    def draw_timeline(self, data, fig, date_field, attribute):
+        """Draw the statistic of the attribute per release period, no finer than the date field."""
+        ax1, ax2 = plot_axes(fig)
+        with PROFILER.span("aggregate.timeseries", attribute=attribute, statistic=self.statistic):
+            frequency, periods, values = TIMESERIES.series(data, attribute, self.statistic, self.start, self.end,
+                                                           finest=FINEST[date_field])
+        ax1.plot(periods, values, color='blue', marker='.' if len(periods) <= 60 else None)
+        label = f'{self.statistic.capitalize()} {attribute}' if self.statistic != 'count' else 'Tracks'
+        ax1.set_xlabel(f'Release {frequency}')
+        ax1.set_ylabel(label)
+        ax1.set_title(f'{label} by release {frequency}')
+        if self.statistic != 'count':
+            ax1.ticklabel_format(useOffset=False, axis='y', style='plain')
+        summary(data, attribute, ax2)
         ax2.axis('off')
-        canvas = FigureCanvasTkAgg(fig, master=master)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill='both', expand=True)
 
 
 class BarPlot(GraphStrategy):
     """Class for plotting bar plot graphs."""
 
-    def visualize(self, data, master, x_attribute, y_attribute):
-        """Visualize a bar plot graph based on the given data, master window, x attribute, and y attribute."""
-        fig, (ax1, ax2) = plt.subplots(nrows=2, figsize=(8, 10), gridspec_kw={'height_ratios': [3, 1]})
-        sns.barplot(x=x_attribute, y=y_attribute, data=data, ax=ax1)
+    pairwise = True
+
+    def draw(self, data, fig, x_attribute, y_attribute):
+        """Draw a bar plot graph based on the given data, x attribute, and y attribute."""
+        ax1, ax2 = plot_axes(fig)
+        bars = AGGREGATES.bars(data, x_attribute, y_attribute)
+        positions = range(len(bars))
+        ax1.bar(positions, bars['mean'], yerr=bars['ci'], color='C0', ecolor='0.26')
+        ax1.set_xticks(positions, bars.index, rotation=90 if len(bars) > 12 else 0, fontsize='small')
         ax1.set_xlabel(x_attribute.capitalize())
         ax1.set_ylabel(y_attribute.capitalize())
         ax1.set_title(f'Bar Plot of {y_attribute.capitalize()} by {x_attribute.capitalize()}')
-        summary_stats = data[y_attribute].describe().to_frame().T
-        summary_table = ax2.table(cellText=summary_stats.values, colLabels=summary_stats.columns,
-                                  cellLoc='center', loc='center')
-        summary_table.auto_set_font_size(False)
-        summary_table.set_fontsize(10)
-        summary_table.scale(1.2, 1.2)
+        summary(data, y_attribute, ax2)
         ax2.axis('off')
-        canvas = FigureCanvasTkAgg(fig, master=master)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill='both', expand=True)
 
 
 class ScatterPlot(GraphStrategy):
     """Class for plotting scatter plot graphs."""
 
-    def visualize(self, data, master, x_attribute, y_attribute):
-        """Visualize a scatter plot graph based on the given data, master window, x attribute, and y attribute."""
-        fig, (ax1, ax2) = plt.subplots(nrows=2, figsize=(8, 10), gridspec_kw={'height_ratios': [3, 1]})
-        ax1.scatter(data[x_attribute], data[y_attribute], color='blue')
+    pairwise = True
+
+    def __init__(self, highlight=()):
+        """Scatter plot constructor; highlighted rows are marked over the other tracks."""
+        self.highlight = highlight
+
+    def draw(self, data, fig, x_attribute, y_attribute):
+        """Draw a scatter plot graph based on the given data, x attribute, and y attribute."""
+        ax1, ax2 = plot_axes(fig)
+        positions = highlighted_rows(data, self.highlight)
+        x = data[x_attribute].iloc[positions].to_numpy(dtype='float64', na_value=float('nan'))
+        y = data[y_attribute].iloc[positions].to_numpy(dtype='float64', na_value=float('nan'))
+        if len(data) > self.max_points:
+            image = density_scatter(ax1, data, x_attribute, y_attribute)
+            fig.colorbar(image, ax=ax1, label='Tracks')
+            # The density image is drawn on the pyramid's coordinates, which may be log scaled.
+            pyramid = PYRAMIDS.pyramid(data, x_attribute, y_attribute)
+            x, y = pyramid.x_axis.transform(x), pyramid.y_axis.transform(y)
+        else:
+            ax1.scatter(data[x_attribute], data[y_attribute], color='blue')
+        if len(positions):
+            mark_tracks(ax1, data, positions, x, y)
         ax1.set_xlabel(x_attribute.capitalize())
         ax1.set_ylabel(y_attribute.capitalize())
         ax1.set_title(f'Scatter Plot of {y_attribute.capitalize()} vs. {x_attribute.capitalize()}')
-        summary_stats = data[[x_attribute, y_attribute]].describe().T
-        summary_table = ax2.table(cellText=summary_stats.values, colLabels=summary_stats.columns,
-                                  cellLoc='center', loc='center')
-        summary_table.auto_set_font_size(False)
-        summary_table.set_fontsize(10)
-        summary_table.scale(1.2, 1.2)
+        summary(data, [x_attribute, y_attribute], ax2)
         ax2.axis('off')
-        canvas = FigureCanvasTkAgg(fig, master=master)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill='both', expand=True)
 
 
 class BoxplotPlot(GraphStrategy):
     """Boxplot visualization strategy."""
 
-    def visualize(self, data, master, attribute, a2=None):
+    figsize = (8, 6)
+
+    def __init__(self, highlight=()):
+        """Boxplot constructor; highlighted rows are marked along the box."""
+        self.highlight = highlight
+
+    def draw(self, data, fig, attribute, a2=None):
         """Generate boxplot visualization."""
-        fig = Figure(figsize=(8, 6))
         ax = fig.add_subplot(111)
-        sns.boxplot(x=attribute, data=data, ax=ax)
+        if isinstance(data, StreamingDataset):
+            ax.bxp([data.box_stats(attribute)], orientation='horizontal', showfliers=False, patch_artist=True)
+            ax.set_yticks([])
+        else:
+            # seaborn pulls in scipy, so it is only imported once a boxplot is drawn.
+            import seaborn as sns
+            sns.boxplot(x=attribute, data=data, ax=ax)
+            positions = highlighted_rows(data, self.highlight)
+            if len(positions):
+                values = data[attribute].iloc[positions].to_numpy(dtype='float64', na_value=float('nan'))
+                mark_tracks(ax, data, positions, values, [0] * len(values))
         ax.set_title(f'Boxplot of {attribute.capitalize()}')
         ax.set_xlabel(attribute.capitalize())
         ax.set_ylabel('Value')
 
-        canvas = FigureCanvasTkAgg(fig, master=master)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill='both', expand=True)
+
+class StorytellingPlot(GraphStrategy):
+    """Four-panel scatter of streams against the storytelling variables."""
+
+    figsize = (12, 10)
+    variables = ['releasedyear', 'bpm', 'valence', 'energy']
+
+    def draw(self, data, fig, attribute='streams', a2=None):
+        """Scatter the attribute against each storytelling variable."""
+        axs = fig.subplots(2, 2).flatten()
+        for i, variable in enumerate(self.variables):
+            if len(data) > self.max_points:
+                density_scatter(axs[i], data, variable, attribute)
+            else:
+                axs[i].scatter(data[variable], data[attribute], alpha=0.5)
+            axs[i].set_xlabel(variable.capitalize())
+            axs[i].set_ylabel(attribute.capitalize())
+            axs[i].set_title(attribute.capitalize() + ' vs ' + variable.capitalize())
+
+
+class HeatmapPlot(GraphStrategy):
+    """Correlation matrix of every numeric attribute as a heatmap."""
+
+    figsize = (11, 10)
+    attributes = ('pearson', 'spearman')
+
+    def draw(self, data, fig, method='pearson', a2=None):
+        """Draw the Pearson or Spearman correlation of every pair of numeric attributes."""
+        with PROFILER.span("aggregate.correlation", method=method):
+            matrix = CORRELATIONS.matrix(data, NUMERICAL_VALUES, method)
+        ax = fig.add_subplot(111)
+        image = ax.imshow(matrix.values, cmap='coolwarm', vmin=-1, vmax=1)
+        positions = range(len(matrix))
+        ax.set_xticks(positions, matrix.columns, rotation=90, fontsize='small')
+        ax.set_yticks(positions, matrix.index, fontsize='small')
+        for row in positions:
+            for column in positions:
+                value = matrix.iat[row, column]
+                if value == value:
+                    ax.text(column, row, f"{value:.2f}", ha='center', va='center', fontsize=6,
+                            color='white' if abs(value) > 0.6 else 'black')
+        fig.colorbar(image, ax=ax, label=method.capitalize())
+        ax.set_title(method.capitalize() + ' correlation')
+        fig.subplots_adjust(bottom=0.2)
+
+
+class ArtistComparisonPlot(GraphStrategy):
+    """Reach and average audio features of a few artists side by side."""
+
+    figsize = (10, 10)
+    attributes = ('streams', 'tracks')
+    # Artists compared when none are chosen.
+    default_artists = 5
+
+    def draw(self, data, fig, metric='streams', artists=None):
+        """Draw the metric per artist above their mean audio features, leading artists by default."""
+        with PROFILER.span("aggregate.artists"):
+            artists = list(artists) if artists else ARTISTS.leaders(data, self.default_artists)
+            table = ARTISTS.summary(data, artists)
+        ax1, ax2 = fig.subplots(nrows=2, gridspec_kw={'height_ratios': [1, 2]})
+        positions = range(len(table))
+        ax1.barh(positions, table[metric], color=[f'C{i}' for i in positions])
+        ax1.set_yticks(positions, table.index, fontsize='small')
+        ax1.invert_yaxis()
+        ax1.set_xlabel('Total streams' if metric == 'streams' else 'Tracks')
+        ax1.set_title(f'Artist comparison by {metric}')
+        features = [feature for feature in ARTIST_FEATURES if feature != 'bpm']
+        width = 0.8 / max(len(table), 1)
+        for i, (artist, row) in enumerate(table.iterrows()):
+            offsets = [x + (i - (len(table) - 1) / 2) * width for x in range(len(features))]
+            ax2.bar(offsets, row[features], width=width, color=f'C{i}',
+                    label=f'{artist} ({row["bpm"]:.0f} bpm)' if row['tracks'] else f'{artist} (no tracks)')
+        ax2.set_xticks(range(len(features)), [feature.capitalize() for feature in features], rotation=30)
+        ax2.set_ylabel('Mean (%)')
+        ax2.set_ylim(0, 100)
+        ax2.set_title('Average audio features')
+        ax2.legend(fontsize='small', loc='upper right')
+        fig.tight_layout()
+
+
+class SimilarSongsPlot(GraphStrategy):
+    """Streams of a track beside those of the tracks nearest it in audio features."""
+
+    figsize = (10, 10)
+    attributes = ('streams',)
+
+    def __init__(self, neighbours=NEIGHBOURS):
+        """Similar songs constructor; neighbours is how many similar tracks are drawn."""
+        self.neighbours = neighbours
+
+    def draw(self, data, fig, metric='streams', track=None):
+        """Draw the metric of a track, given by index label, and of its neighbours; the most streamed by default."""
+        with PROFILER.span("aggregate.similar"):
+            positions = highlighted_rows(data, [data[metric].idxmax() if track is None else track])
+            if not len(positions):
+                raise KeyError(f"track {track} is not in the data")
+            rows, distances = SIMILAR.neighbours(data, int(positions[0]), self.neighbours)
+            table = data.iloc[[positions[0], *rows]]
+        ax1, ax2 = fig.subplots(nrows=2, gridspec_kw={'height_ratios': [3, 2]})
+        names = [f'{name} - {credit}' for name, credit in zip(table['trackname'], table['artistsname'])]
+        names = [name if len(name) <= 40 else name[:39] + '…' for name in names]
+        labels = [f'{names[0]} (chosen)'] + [f'{name} ({distance:.2f})' for name, distance in zip(names[1:], distances)]
+        positions = range(len(table))
+        ax1.barh(positions, table[metric], color=['red'] + ['C0'] * len(rows))
+        ax1.set_yticks(positions, labels, fontsize='small')
+        ax1.invert_yaxis()
+        ax1.set_xlabel('Total streams')
+        ax1.set_title('Most similar tracks and their distance in standardized audio features')
+        features = [feature for feature in ARTIST_FEATURES if feature != 'bpm']
+        ax2.plot(features, table[features].iloc[1:].T, color='C0', alpha=0.4, marker='.')
+        ax2.plot(features, table[features].iloc[0], color='red', marker='o', label=labels[0])
+        ax2.set_xticks(range(len(features)), [feature.capitalize() for feature in features], rotation=30)
+        ax2.set_ylabel('%')
+        ax2.set_ylim(0, 100)
+        ax2.set_title(f'Audio features ({table["bpm"].iloc[0]:.0f} bpm chosen, '
+                      f'{table["bpm"].iloc[1:].mean():.0f} bpm similar on average)')
+        ax2.legend(fontsize='small', loc='upper right')
+        fig.tight_layout()
+
+
+# Layouts of a snapshot comparison: every snapshot on one axes, or an axes per snapshot.
+LAYOUTS = ('overlay', 'side-by-side')
+
+
+def box_stats(data, attribute, label):
+    """Box statistics of an attribute for Axes.bxp, with whiskers at 1.5 IQR inside its range."""
+    stats = describe(data, [attribute]).iloc[0]
+    iqr = stats['75%'] - stats['25%']
+    return {"label": label, "med": stats['50%'], "q1": stats['25%'], "q3": stats['75%'], "fliers": [],
+            "whislo": max(stats['min'], stats['25%'] - 1.5 * iqr), "whishi": min(stats['max'], stats['75%'] + 1.5 * iqr)}
+
+
+class SnapshotComparison(GraphStrategy):
+    """One attribute across several snapshots of the dataset, above a summary table per snapshot.
+
+    data maps each snapshot's name to its frame or streamed dataset.  Snapshots are drawn in one
+    colour each, either overlaid on one axes or side by side on axes sharing their scales.
+    """
+
+    figsize = (12, 8)
+    title = None
+    ylabel = None
+
+    def __init__(self, layout='overlay'):
+        """Snapshot comparison constructor; layout is one of LAYOUTS."""
+        if layout not in LAYOUTS:
+            raise ValueError(f"layout must be one of {', '.join(LAYOUTS)}, not '{layout}'")
+        self.layout = layout
+
+    def draw(self, data, fig, attribute, a2=None):
+        """Draw the attribute of every snapshot."""
+        snapshots = list(data.items())
+        if not snapshots:
+            raise ValueError("no snapshots to compare")
+        columns = 1 if self.layout == 'overlay' else len(snapshots)
+        grid = fig.add_gridspec(2, columns, height_ratios=[3, 1])
+        axes = [fig.add_subplot(grid[0, 0])]
+        axes += [fig.add_subplot(grid[0, i], sharex=axes[0], sharey=axes[0]) for i in range(1, columns)]
+        self.draw_snapshots(snapshots, axes * len(snapshots) if self.layout == 'overlay' else axes, attribute)
+        for ax, (name, frame) in zip(axes, snapshots):
+            ax.set_xlabel(attribute.capitalize())
+            ax.set_title(name if self.layout == 'side-by-side' else f'{self.title} of {attribute.capitalize()}')
+        axes[0].set_ylabel(self.ylabel)
+        if self.layout == 'overlay':
+            axes[0].legend(fontsize='small')
+        else:
+            fig.suptitle(f'{self.title} of {attribute.capitalize()}')
+        table_ax = fig.add_subplot(grid[1, :])
+        tables = [describe(frame, [attribute]) for name, frame in snapshots]
+        with PROFILER.span("draw.table"):
+            table = table_ax.table(cellText=[[f'{value:.6g}' for value in table.values[0]] for table in tables],
+                                   colLabels=tables[0].columns,
+                                   rowLabels=[name for name, frame in snapshots], cellLoc='center', loc='center')
+            table.auto_set_font_size(False)
+            table.set_fontsize(10)
+        table_ax.axis('off')
+
+    @abstractmethod
+    def draw_snapshots(self, snapshots, axes, attribute):
+        """Draw each (name, data) snapshot on the axes at the same position, in colour Ci for the i-th."""
+        pass
+
+
+class HistogramComparison(SnapshotComparison):
+    """Histograms of an attribute per snapshot, over the same bins."""
+
+    title = 'Histogram'
+    ylabel = 'Frequency'
+
+    def draw_snapshots(self, snapshots, axes, attribute):
+        """Draw step outlines when overlaid, so every snapshot stays visible, and bars side by side."""
+        distributions = [column_distribution(data, attribute) for name, data in snapshots]
+        counted = [distribution for distribution in distributions if distribution.count]
+        span = (min(d.minimum for d in counted), max(d.maximum for d in counted)) if counted else None
+        for i, ((name, data), distribution, ax) in enumerate(zip(snapshots, distributions, axes)):
+            counts, edges = distribution.histogram(bins=10, span=span)
+            if self.layout == 'overlay':
+                ax.stairs(counts, edges, color=f'C{i}', linewidth=2, label=name)
+            else:
+                ax.bar(edges[:-1], counts, width=edges[1:] - edges[:-1], align='edge', color=f'C{i}',
+                       edgecolor='black')
+            ax.ticklabel_format(useOffset=False, axis='x', style='plain')
+
+
+class DensityComparison(SnapshotComparison):
+    """Density estimates of an attribute per snapshot."""
+
+    title = 'Density Plot'
+    ylabel = 'Density'
+
+    def draw_snapshots(self, snapshots, axes, attribute):
+        """Draw each snapshot's density as a shaded curve."""
+        for i, ((name, data), ax) in enumerate(zip(snapshots, axes)):
+            x, density = column_distribution(data, attribute).kde()
+            ax.fill_between(x, density, color=f'C{i}', alpha=0.25, linewidth=0)
+            ax.plot(x, density, color=f'C{i}', label=name)
+            ax.ticklabel_format(useOffset=False, axis='x', style='plain')
+            ax.set_ylim(bottom=0)
+
+
+class BoxplotComparison(SnapshotComparison):
+    """Boxplots of an attribute per snapshot, from their quartiles."""
+
+    title = 'Boxplot'
+
+    def draw_snapshots(self, snapshots, axes, attribute):
+        """Stack the boxes on one axes when overlaid, or give each its own."""
+        stats = [box_stats(data, attribute, name) for name, data in snapshots]
+        if self.layout == 'overlay':
+            groups = [(axes[0], stats, range(len(stats)))]
+        else:
+            groups = [(ax, [box], [i]) for i, (ax, box) in enumerate(zip(axes, stats))]
+        for ax, boxes, colours in groups:
+            artists = ax.bxp(boxes, orientation='horizontal', showfliers=False, patch_artist=True,
+                             medianprops={'color': 'black'})
+            for patch, box, i in zip(artists['boxes'], boxes, colours):
+                patch.set_facecolor(f'C{i}')
+                patch.set_label(box['label'])
+            ax.set_yticks([])
+
+
+CHARTS = {
+    'histogram': HistogramPlot,
+    'density': DensityPlot,
+    'box': BoxplotPlot,
+    'scatter': ScatterPlot,
+    'bar': BarPlot,
+    'line': LinePlot,
+    'heatmap': HeatmapPlot,
+    'artists': ArtistComparisonPlot,
+    'similar': SimilarSongsPlot,
+}
+
+# Strategies drawing several snapshots at once, which take a mapping of name -> data.
+COMPARISONS = {
+    'histogram': HistogramComparison,
+    'density': DensityComparison,
+    'box': BoxplotComparison,
+}
@@ -0,0 +1,89 @@
+import sys
+import time
+import argparse
+import threading
+import http.client
+from collections import Counter
+from urllib.parse import urlsplit
+
+
+DEFAULT_PATHS = [
+    "/chart/histogram.png?attribute1=bpm",
+    "/chart/scatter.png?attribute1=danceability&attribute2=energy",
+    "/chart/box.svg?attribute1=valence",
+    "/chart/histogram.png?attribute1=streams&range.releasedyear=2020..2023",
+]
+
+
+def percentile(ordered, fraction):
+    """Value at a fraction of an ascending list, by nearest rank."""
+    if not ordered:
+        return float("nan")
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def client(host, port, paths, count, revalidate, latencies, statuses, lock):
+    """Issue count requests over one keep-alive connection, cycling through the paths."""
+    connection = http.client.HTTPConnection(host, port, timeout=300)
+    etags = {}
+    local_latencies, local_statuses = [], Counter()
+    for index in range(count):
+        path = paths[index % len(paths)]
+        headers = {"If-None-Match": etags[path]} if revalidate and path in etags else {}
+        started = time.perf_counter()
+        try:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException) as error:
+            local_statuses[type(error).__name__] += 1
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=300)
+            continue
+        local_latencies.append(time.perf_counter() - started)
+        local_statuses[response.status] += 1
+        if response.getheader("ETag"):
+            etags[path] = response.getheader("ETag")
+    connection.close()
+    with lock:
+        latencies.extend(local_latencies)
+        statuses.update(local_statuses)
+
+
+def main(argv=None):
+    """Hammer a running chart service and report throughput and latency percentiles."""
+    parser = argparse.ArgumentParser(description="Load test the local chart service (python main.py serve).")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="base URL of the service")
+    parser.add_argument("--concurrency", type=int, default=8, help="parallel keep-alive clients")
+    parser.add_argument("--requests", type=int, default=400, help="total requests across all clients")
+    parser.add_argument("--path", action="append", dest="paths",
+                        help="request path, repeatable (default: a mix of chart types)")
+    parser.add_argument("--revalidate", action="store_true",
+                        help="send If-None-Match with the last ETag, as a browser would")
+    args = parser.parse_args(argv)
+    url = urlsplit(args.url)
+    paths = args.paths or DEFAULT_PATHS
+    latencies, statuses, lock = [], Counter(), threading.Lock()
+    shares = [args.requests // args.concurrency + (index < args.requests % args.concurrency)
+              for index in range(args.concurrency)]
+    threads = [threading.Thread(target=client, args=(url.hostname, url.port or 80, paths, share, args.revalidate,
+                                                    latencies, statuses, lock))
+               for share in shares]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(f"{sum(statuses.values())} requests, {args.concurrency} clients, {elapsed:.2f} s: "
+          f"{len(latencies) / elapsed:.1f} req/s")
+    print("latency ms: " + ", ".join(f"p{int(fraction * 100)} {percentile(latencies, fraction) * 1000:.1f}"
+                                     for fraction in (0.5, 0.95, 0.99)) +
+          f", max {latencies[-1] * 1000 if latencies else float('nan'):.1f}")
+    print("statuses: " + ", ".join(f"{status} x{count}" for status, count in sorted(statuses.items(), key=str)))
+    return 0 if all(status in (200, 304) for status in statuses) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,27 @@
-from ui import AppUI
+import sys
 
 
 if __name__ == "__main__":
-    app = AppUI()
+    if sys.argv[1:2] == ["export"]:
+        from export import main
+        sys.exit(main(sys.argv[2:]))
+    if sys.argv[1:2] == ["rank"]:
+        from ranking import main
+        sys.exit(main(sys.argv[2:]))
+    if sys.argv[1:2] == ["serve"]:
+        from server import main
+        sys.exit(main(sys.argv[2:]))
+    from ui import AppUI
+    from catalog import CATALOG
+    # Each --snapshot [NAME=]CSV adds a chart snapshot to the Compare Snapshots page.
+    for flag, value in zip(sys.argv[1:], sys.argv[2:]):
+        if flag == "--snapshot":
+            name, _, path = value.rpartition("=")
+            CATALOG.add(path, name or None)
+    trace_path = None
+    if "--profile" in sys.argv[1:]:
+        # An optional path after --profile names the trace written on exit.
+        following = sys.argv[sys.argv.index("--profile") + 1:][:1]
+        trace_path = following[0] if following and not following[0].startswith("--") else "profile.trace.json"
+    app = AppUI(streaming=True if "--stream" in sys.argv[1:] else None, trace_path=trace_path)
     app.run()
@@ -0,0 +1,215 @@
+import numpy as np
+import tkinter as tk
+from tkinter import ttk
+from concurrent.futures import CancelledError
+from matplotlib import colormaps
+from matplotlib.figure import Figure
+from graph import pyramid_ticks
+from profiling import PROFILER
+from pyramid import PYRAMIDS
+
+
+# Scale of the visible range per step of the mouse wheel.
+ZOOM_STEP = 0.8
+# Milliseconds without a zoom or pan before the axes are drawn again with new ticks.
+SETTLE_MS = 150
+
+
+class PyramidView:
+    """Axes showing one view of a density pyramid, updated in place as the view moves.
+
+    Every view reuses the same image and marker artists, so a frame costs the tiles that came
+    into view plus one Agg draw of at most a screen of cells or RAW_POINTS markers.  Counts are
+    coloured here through a lookup table, which is several times cheaper than a norm and
+    colormap applied by matplotlib on every draw.
+    """
+
+    def __init__(self, ax, pyramid):
+        """Pyramid view constructor."""
+        self.ax = ax
+        self.pyramid = pyramid
+        # Shade 0 is an empty cell and stays transparent; the palette starts past the near-white end.
+        self.shades = colormaps['Blues'](np.linspace(0.15, 1, 256), bytes=True)
+        self.shades[0] = 0
+        counts, extent = pyramid.overview()
+        self.image = ax.imshow(self.colour(counts), extent=extent, origin='lower', aspect='auto',
+                               interpolation='nearest')
+        self.points, = ax.plot([], [], linestyle='none', marker='.', markersize=3, color='blue')
+        pyramid_ticks(ax, pyramid)
+        self.kind = None
+        self.shown = 0
+        self.show(*pyramid.extent)
+
+    def show(self, x0, x1, y0, y1):
+        """Move the view to a plot-coordinate range and update the artists; returns what is drawn."""
+        self.ax.set_xlim(x0, x1)
+        self.ax.set_ylim(y0, y1)
+        bbox = self.ax.bbox
+        with PROFILER.span("aggregate.pyramid_view"):
+            self.kind, first, second = self.pyramid.view(x0, x1, y0, y1, width=max(bbox.width, 1),
+                                                         height=max(bbox.height, 1))
+        if self.kind == "points":
+            self.points.set_data(first, second)
+            self.shown = len(first)
+        else:
+            self.image.set_data(self.colour(first))
+            self.image.set_extent(second)
+            self.shown = int(first.sum())
+        self.image.set_visible(self.kind == "counts")
+        self.points.set_visible(self.kind == "points")
+        return self.kind
+
+    def colour(self, counts):
+        """RGBA image of counts on a log scale stretched over the counts in view.
+
+        Stretching per view keeps sparse regions readable when zoomed into them.
+        """
+        scale = (len(self.shades) - 2) / np.log(max(int(counts.max()), 2))
+        shades = np.zeros(counts.shape, dtype=np.uint8)
+        filled = counts > 0
+        shades[filled] = 1 + (np.log(counts[filled]) * scale).astype(np.uint8)
+        return self.shades[shades]
+
+    def blit(self, canvas):
+        """Repaint only the plot area; the ticks stay as they were until the next full draw."""
+        self.ax.draw_artist(self.ax.patch)
+        self.ax.draw_artist(self.image if self.kind == "counts" else self.points)
+        canvas.blit(self.ax.bbox)
+
+    def reset(self):
+        """Show the whole plot."""
+        return self.show(*self.pyramid.extent)
+
+    def zoom(self, x, y, scale):
+        """Scale the visible range by a factor around a point, keeping it inside the whole plot."""
+        (x0, x1), (y0, y1) = self.ax.get_xlim(), self.ax.get_ylim()
+        left, right, bottom, top = self.pyramid.extent
+        if scale > 1 and (x1 - x0) * scale >= right - left and (y1 - y0) * scale >= top - bottom:
+            return self.reset()
+        return self.show(x - (x - x0) * scale, x + (x1 - x) * scale, y - (y - y0) * scale, y + (y1 - y) * scale)
+
+    def pan(self, limits, dx, dy):
+        """Shift the view from earlier limits by a distance in pixels."""
+        (x0, x1), (y0, y1) = limits
+        shift_x = dx * (x1 - x0) / max(self.ax.bbox.width, 1)
+        shift_y = dy * (y1 - y0) / max(self.ax.bbox.height, 1)
+        return self.show(x0 - shift_x, x1 - shift_x, y0 - shift_y, y1 - shift_y)
+
+
+class ScatterNavigator(tk.Toplevel):
+    """Window that zooms with the mouse wheel and pans by dragging over an attribute pair.
+
+    The density pyramid is built on a worker thread; double-click or Home shows the whole
+    plot again.  While the view moves only the plot area is repainted, and the whole figure
+    is drawn once it settles.
+    """
+
+    def __init__(self, master, x_attribute, y_attribute, poll_interval=50):
+        """Scatter navigator constructor."""
+        super().__init__(master)
+        self.title(f"{y_attribute.capitalize()} vs. {x_attribute.capitalize()}")
+        self.x_attribute = x_attribute
+        self.y_attribute = y_attribute
+        self.poll_interval = poll_interval
+        self.view = None
+        self.drag = None
+        self.settle = None
+        self.status = tk.Label(self, text="", anchor="w")
+        self.status.pack(fill="x", side="bottom")
+
+    def index(self, executor, data):
+        """Build the density pyramid of the data on the executor, and show it when it is ready."""
+        self.status.configure(text="Indexing...")
+        self.progress = ttk.Progressbar(self, mode="indeterminate", length=300)
+        self.progress.pack(pady=20)
+        self.progress.start(10)
+        future = executor.submit(PYRAMIDS.pyramid, data, self.x_attribute, self.y_attribute)
+        self.after(self.poll_interval, self._poll, future)
+
+    def _poll(self, future):
+        if not self.winfo_exists():
+            future.cancel()
+            return
+        if not future.done():
+            self.after(self.poll_interval, self._poll, future)
+            return
+        self.progress.destroy()
+        try:
+            pyramid = future.result()
+        except CancelledError:
+            return
+        except Exception as error:
+            self.status.configure(text=f"Could not index the data: {error}", fg="red")
+            return
+        self.build(pyramid)
+
+    def build(self, pyramid):
+        """Place the figure and hook the mouse and keyboard to the view."""
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        fig = Figure(figsize=(8, 6))
+        ax = fig.add_subplot(111)
+        ax.set_xlabel(self.x_attribute.capitalize())
+        ax.set_ylabel(self.y_attribute.capitalize())
+        self.canvas = FigureCanvasTkAgg(fig, master=self)
+        self.canvas.get_tk_widget().pack(fill="both", expand=True)
+        self.view = PyramidView(ax, pyramid)
+        self.canvas.mpl_connect("scroll_event", self.on_scroll)
+        self.canvas.mpl_connect("button_press_event", self.on_press)
+        self.canvas.mpl_connect("motion_notify_event", self.on_motion)
+        self.canvas.mpl_connect("button_release_event", self.on_release)
+        self.canvas.mpl_connect("key_press_event", self.on_key)
+        self.canvas.mpl_connect("resize_event",
+                                lambda event: self.refresh(self.view.show(*self.limits()), moving=False))
+        self.canvas.draw()
+        self.refresh(self.view.kind, moving=False)
+
+    def limits(self):
+        """Current (left, right, bottom, top) of the view."""
+        return (*self.view.ax.get_xlim(), *self.view.ax.get_ylim())
+
+    def refresh(self, kind, moving=True):
+        """Repaint the plot area now and the whole figure when the view settles, and report what is shown."""
+        if self.settle is not None:
+            self.after_cancel(self.settle)
+            self.settle = None
+        if moving:
+            self.view.blit(self.canvas)
+            self.settle = self.after(SETTLE_MS, self.draw_settled)
+        else:
+            self.canvas.draw_idle()
+        what = "tracks" if kind == "points" else "tracks, binned"
+        self.status.configure(text=f"{self.view.shown:,} {what} in view")
+
+    def draw_settled(self):
+        """Draw the whole figure, ticks included, once the view stopped moving."""
+        self.settle = None
+        self.canvas.draw_idle()
+
+    def on_scroll(self, event):
+        """Zoom in or out around the pointer."""
+        if event.inaxes is self.view.ax:
+            self.refresh(self.view.zoom(event.xdata, event.ydata, ZOOM_STEP ** event.step))
+
+    def on_press(self, event):
+        """Start a drag, or show the whole plot on a double-click."""
+        if event.inaxes is not self.view.ax:
+            return
+        if event.dblclick:
+            self.refresh(self.view.reset(), moving=False)
+            return
+        self.drag = (event.x, event.y, (self.view.ax.get_xlim(), self.view.ax.get_ylim()))
+
+    def on_motion(self, event):
+        """Pan with the drag."""
+        if self.drag is not None:
+            x, y, limits = self.drag
+            self.refresh(self.view.pan(limits, event.x - x, event.y - y))
+
+    def on_release(self, event):
+        """End the drag."""
+        self.drag = None
+
+    def on_key(self, event):
+        """Home shows the whole plot."""
+        if event.key in ("home", "r"):
+            self.refresh(self.view.reset(), moving=False)
@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+
+
+# Phases shown by the on-screen overlay, in pipeline order.
+PHASES = ["load", "aggregate", "draw", "rasterize", "blit"]
+
+
+class _NullSpan:
+    """Span handed out while profiling is off; entering and leaving it does nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def note(self, **args):
+        """Ignore span arguments."""
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """One timed region; arguments noted while it runs are attached to its trace event."""
+
+    __slots__ = ("profiler", "name", "args", "start")
+
+    def __init__(self, profiler, name, args):
+        """Span constructor."""
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._record(self.name, self.start, time.perf_counter_ns(), self.args)
+        return False
+
+    def note(self, **args):
+        """Attach arguments, such as row counts, to the span."""
+        self.args.update(args)
+
+
+class Profiler:
+    """Named timing spans and counters, exported as a JSON summary or a Chrome trace.
+
+    Span names are dotted, and the part before the first dot is the phase ("draw.table" is
+    part of "draw").  While disabled, span() returns a shared no-op span and count() returns
+    at once, so instrumented code pays one attribute check.
+    """
+
+    def __init__(self, max_events=200_000):
+        """Profiler constructor."""
+        self.enabled = False
+        self.events = deque(maxlen=max_events)
+        self.counters = {}
+        self.totals = {}
+        self.last = {}
+        self.threads = {}
+        self.origin = time.perf_counter_ns()
+        self._lock = threading.Lock()
+
+    def enable(self, enabled=True):
+        """Turn recording on or off; recorded data is kept."""
+        self.enabled = enabled
+        return self
+
+    def reset(self):
+        """Forget every recorded span and counter."""
+        with self._lock:
+            self.events.clear()
+            self.counters.clear()
+            self.totals.clear()
+            self.last.clear()
+            self.threads.clear()
+            self.origin = time.perf_counter_ns()
+
+    def span(self, name, **args):
+        """Context manager timing the enclosed block under name."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, args)
+
+    def count(self, name, value=1):
+        """Add value to a counter."""
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        with self._lock:
+            total = self.counters[name] = self.counters.get(name, 0) + value
+            self.events.append(("C", name, now, 0, threading.get_ident(), {name: total}))
+
+    def _record(self, name, start, end, args):
+        thread = threading.current_thread()
+        with self._lock:
+            self.threads[thread.ident] = thread.name
+            self.events.append(("X", name, start, end - start, thread.ident, args))
+            totals = self.totals.get(name)
+            if totals is None:
+                totals = self.totals[name] = [0, 0, 0]
+            totals[0] += 1
+            totals[1] += end - start
+            totals[2] = max(totals[2], end - start)
+            # An enclosing span ends after its sub-spans, so it has the last word on its phase.
+            self.last[name.partition(".")[0]] = end - start
+
+    def summary(self):
+        """Per-span count, total, mean and max milliseconds, plus the counters."""
+        with self._lock:
+            spans = {name: {"count": count, "total_ms": round(total / 1e6, 3), "mean_ms": round(total / count / 1e6, 3),
+                            "max_ms": round(longest / 1e6, 3)}
+                     for name, (count, total, longest) in sorted(self.totals.items())}
+            return {"spans": spans, "counters": dict(sorted(self.counters.items()))}
+
+    def overlay_text(self):
+        """Latest time of each pipeline phase and the busiest counters, for the on-screen overlay."""
+        with self._lock:
+            lines = [f"{phase:<10}{self.last[phase] / 1e6:>9.1f} ms" for phase in PHASES if phase in self.last]
+            counters = sorted(self.counters.items(), key=lambda item: -item[1])[:4]
+        lines += [f"{name:<18}{value:>7}" for name, value in counters]
+        return "\n".join(lines) or "profiling: no spans yet"
+
+    def trace_events(self):
+        """Recorded spans and counters as Chrome trace events, in microseconds since the origin."""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+            threads = dict(self.threads)
+            origin = self.origin
+        trace = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                 for tid, name in threads.items()]
+        for kind, name, start, duration, tid, args in events:
+            event = {"name": name, "cat": name.partition(".")[0], "ph": kind, "pid": pid, "tid": tid,
+                     "ts": (start - origin) / 1e3, "args": args}
+            if kind == "X":
+                event["dur"] = duration / 1e3
+            trace.append(event)
+        return trace
+
+    def write_trace(self, path):
+        """Write a Chrome trace-event file that chrome://tracing or Perfetto can open."""
+        _write_json(path, {"traceEvents": self.trace_events(), "displayTimeUnit": "ms",
+                           "otherData": self.summary()})
+        return path
+
+    def write_summary(self, path):
+        """Write the span and counter summary as JSON."""
+        _write_json(path, self.summary())
+        return path
+
+
+def _write_json(path, payload):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(payload, file, default=str)
+
+
+PROFILER = Profiler().enable(bool(os.environ.get("SPOTIFY_PROFILE")))
@@ -0,0 +1,244 @@
+import threading
+import numpy as np
+from collections import OrderedDict
+from downsample import finite_pairs
+from stats import dataset_version, register_cache
+
+
+# Bits per axis of the finest grid.  Points are kept in the Morton order of their finest
+# cell, so every cell at every level is one contiguous run of points.
+DEPTH = 16
+# A tile is 2**TILE_BITS cells on a side, each cell TILE_BITS levels finer than the tile.
+TILE_BITS = 8
+TILE_SIZE = 1 << TILE_BITS
+MAX_LEVEL = DEPTH - TILE_BITS
+# Once at most this many points are in view they are drawn as markers instead of counts.
+RAW_POINTS = 20_000
+# Non-negative attributes whose largest value is this many powers of ten above the smallest
+# are binned on log10(1 + value), so the dense low range is not squeezed into a few cells.
+LOG_DECADES = 4
+MAX_TILES = 128
+
+
+def _spread(values):
+    """Interleave zero bits between the low 16 bits of each value."""
+    values = values.astype(np.uint32)
+    values = (values | (values << 8)) & 0x00FF00FF
+    values = (values | (values << 4)) & 0x0F0F0F0F
+    values = (values | (values << 2)) & 0x33333333
+    return (values | (values << 1)) & 0x55555555
+
+
+def _compact(codes):
+    """Inverse of _spread: the even bits of each code, packed into the low 16 bits."""
+    codes = codes.astype(np.uint32) & 0x55555555
+    codes = (codes | (codes >> 1)) & 0x33333333
+    codes = (codes | (codes >> 2)) & 0x0F0F0F0F
+    codes = (codes | (codes >> 4)) & 0x00FF00FF
+    return (codes | (codes >> 8)) & 0x0000FFFF
+
+
+def morton(x, y):
+    """Morton (Z-order) codes of integer cell coordinates of up to 16 bits each."""
+    return _spread(x) | (_spread(y) << 1)
+
+
+def _radix_order(codes):
+    """Stable argsort of uint32 codes as two 16-bit radix passes."""
+    # numpy radix-sorts keys of 16 bits or less and falls back to timsort for wider ones.
+    order = np.argsort((codes & 0xFFFF).astype(np.uint16), kind="stable")
+    return order[np.argsort((codes[order] >> 16).astype(np.uint16), kind="stable")]
+
+
+# Position in a tile's Morton-ordered cells of each cell of the row-major tile image.
+_cells = np.arange(TILE_SIZE * TILE_SIZE, dtype=np.uint32)
+_TILE_ORDER = np.empty(TILE_SIZE * TILE_SIZE, dtype=np.intp)
+_TILE_ORDER[_compact(_cells >> 1).astype(np.intp) * TILE_SIZE + _compact(_cells)] = np.arange(len(_cells))
+del _cells
+
+
+class Axis:
+    """Maps an attribute to grid units in [0, 1], on log10(1 + value) when it spans many decades."""
+
+    def __init__(self, values):
+        """Axis constructor."""
+        low, high = (values.min(), values.max()) if len(values) else (0.0, 1.0)
+        self.log = bool(low >= 0 and high + 1 >= 10 ** LOG_DECADES * (low + 1))
+        low, high = self.transform(np.array([low, high]))
+        if high <= low:
+            low, high = low - 0.5, high + 0.5
+        self.low, self.high = float(low), float(high)
+
+    def transform(self, values):
+        """Plot coordinates of attribute values."""
+        return np.log10(1 + values) if self.log else values
+
+    def inverse(self, coordinates):
+        """Attribute values of plot coordinates."""
+        return 10 ** coordinates - 1 if self.log else coordinates
+
+    def unit(self, coordinates):
+        """Grid units of plot coordinates, clipped to [0, 1]."""
+        return np.clip((np.asarray(coordinates, dtype="float64") - self.low) / (self.high - self.low), 0.0, 1.0)
+
+    def coordinate(self, units):
+        """Plot coordinates of grid units."""
+        return self.low + np.asarray(units, dtype="float64") * (self.high - self.low)
+
+
+class DensityPyramid:
+    """Binned counts of an x/y attribute pair at every zoom level, computed tile by tile.
+
+    Level L splits the plot into 2**L tiles a side, each TILE_SIZE cells a side, so a view
+    drawn at the level whose cells are about a screen pixel reads a handful of tiles however
+    many rows there are.  A tile is one searchsorted over the run of Morton codes it covers,
+    and tiles are kept in a small LRU, so panning computes only the tiles that scroll in.
+    """
+
+    def __init__(self, x, y, max_tiles=MAX_TILES):
+        """Density pyramid constructor."""
+        x, y = finite_pairs(x, y)
+        self.x_axis, self.y_axis = Axis(x), Axis(y)
+        x, y = self.x_axis.transform(x), self.y_axis.transform(y)
+        finest = (1 << DEPTH) - 1
+        cells_x = np.minimum(self.x_axis.unit(x) * (1 << DEPTH), finest).astype(np.uint32)
+        cells_y = np.minimum(self.y_axis.unit(y) * (1 << DEPTH), finest).astype(np.uint32)
+        codes = morton(cells_x, cells_y)
+        order = _radix_order(codes)
+        self.codes = codes[order]
+        # Plot coordinates in Morton order, for the points of a view zoomed in far enough.
+        self.x = x[order].astype(np.float32)
+        self.y = y[order].astype(np.float32)
+        self.max_tiles = max_tiles
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def extent(self):
+        """(left, right, bottom, top) of the whole plot in plot coordinates."""
+        return self.x_axis.low, self.x_axis.high, self.y_axis.low, self.y_axis.high
+
+    def _span(self, level, tx, ty):
+        """First code of a level's tile and the number of codes it covers."""
+        shift = 2 * (DEPTH - level)
+        return int(morton(np.array([tx]), np.array([ty]))[0]) << shift, 1 << shift
+
+    def _run(self, start, size):
+        """Positions of the first point at or past start and past start + size."""
+        end = start + size
+        # uint32 keys, as a Python int key would make searchsorted copy the codes to a wider type.
+        lo = int(np.searchsorted(self.codes, np.uint32(start)))
+        hi = len(self.codes) if end > 0xFFFFFFFF else int(np.searchsorted(self.codes, np.uint32(end)))
+        return lo, hi
+
+    def tile(self, level, tx, ty):
+        """Point counts of one tile as a TILE_SIZE x TILE_SIZE image, rows going up in y."""
+        key = (level, tx, ty)
+        with self._lock:
+            image = self._tiles.get(key)
+            if image is not None:
+                self._tiles.move_to_end(key)
+                return image
+        start, size = self._span(level, tx, ty)
+        lo, hi = self._run(start, size)
+        step = size // (TILE_SIZE * TILE_SIZE)
+        edges = start + step * np.arange(TILE_SIZE * TILE_SIZE + 1, dtype=np.uint64)
+        # Codes are uint32, and the end of the last tile of a level is 2**32 itself.
+        positions = np.searchsorted(self.codes[lo:hi], np.minimum(edges, 0xFFFFFFFF).astype(np.uint32))
+        positions[edges > 0xFFFFFFFF] = hi - lo
+        image = np.diff(positions).astype(np.uint32)[_TILE_ORDER].reshape(TILE_SIZE, TILE_SIZE)
+        with self._lock:
+            self._tiles[key] = image
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+        return image
+
+    def view(self, x0, x1, y0, y1, width=800, height=600, raw_points=RAW_POINTS):
+        """What to draw for a plot-coordinate range on a width x height pixel area.
+
+        Returns ("points", x, y) when at most raw_points points are in view, else
+        ("counts", image, extent) with about a cell per pixel.
+        """
+        u0, u1 = self.x_axis.unit([x0, x1])
+        v0, v1 = self.y_axis.unit([y0, y1])
+        if u1 <= u0 or v1 <= v0 or not len(self):
+            return "points", self.x[:0], self.y[:0]
+        level = int(np.floor(np.log2(min(width / (u1 - u0), height / (v1 - v0))))) - TILE_BITS
+        level = min(max(level, 0), MAX_LEVEL)
+        tiles = 1 << level
+        cells = tiles * TILE_SIZE
+        # Cell range in view at this level, and the tiles holding it.
+        cx0, cx1 = int(u0 * cells), min(max(int(np.ceil(u1 * cells)), int(u0 * cells) + 1), cells)
+        cy0, cy1 = int(v0 * cells), min(max(int(np.ceil(v1 * cells)), int(v0 * cells) + 1), cells)
+        tx0, tx1 = cx0 // TILE_SIZE, (cx1 - 1) // TILE_SIZE + 1
+        ty0, ty1 = cy0 // TILE_SIZE, (cy1 - 1) // TILE_SIZE + 1
+        image = np.empty(((ty1 - ty0) * TILE_SIZE, (tx1 - tx0) * TILE_SIZE), dtype=np.uint32)
+        for ty in range(ty0, ty1):
+            for tx in range(tx0, tx1):
+                image[(ty - ty0) * TILE_SIZE:(ty - ty0 + 1) * TILE_SIZE,
+                      (tx - tx0) * TILE_SIZE:(tx - tx0 + 1) * TILE_SIZE] = self.tile(level, tx, ty)
+        image = image[cy0 - ty0 * TILE_SIZE:cy1 - ty0 * TILE_SIZE, cx0 - tx0 * TILE_SIZE:cx1 - tx0 * TILE_SIZE]
+        if image.sum() <= raw_points:
+            return ("points", *self.points(x0, x1, y0, y1, level, (tx0, tx1), (ty0, ty1)))
+        extent = (*self.x_axis.coordinate([cx0 / cells, cx1 / cells]), *self.y_axis.coordinate([cy0 / cells, cy1 / cells]))
+        return "counts", image, extent
+
+    def overview(self, width=800, height=600):
+        """Counts of the whole plot at about a cell per pixel, as (image, extent)."""
+        if not len(self):
+            return np.zeros((1, 1), dtype=np.uint32), self.extent
+        return self.view(*self.extent, width=width, height=height, raw_points=-1)[1:]
+
+    def points(self, x0, x1, y0, y1, level, tiles_x, tiles_y):
+        """Plot coordinates of the points inside a range, read from the runs of the tiles covering it."""
+        parts_x, parts_y = [], []
+        for ty in range(*tiles_y):
+            for tx in range(*tiles_x):
+                lo, hi = self._run(*self._span(level, tx, ty))
+                x, y = self.x[lo:hi], self.y[lo:hi]
+                inside = (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+                parts_x.append(x[inside])
+                parts_y.append(y[inside])
+        return np.concatenate(parts_x), np.concatenate(parts_y)
+
+
+class PyramidEngine:
+    """LRU cache of density pyramids keyed by (dataset version, x attribute, y attribute)."""
+
+    # Room for the four storytelling panels and the scatter page's pair.
+    def __init__(self, max_entries=6):
+        """Pyramid engine constructor."""
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def pyramid(self, data, x, y):
+        """Density pyramid of an attribute pair of the frame, built on first use."""
+        key = (dataset_version(data), x, y)
+        with self._lock:
+            pyramid = self._entries.get(key)
+            if pyramid is not None:
+                self._entries.move_to_end(key)
+                return pyramid
+        pyramid = DensityPyramid(data[x].to_numpy(dtype="float64", na_value=np.nan),
+                                 data[y].to_numpy(dtype="float64", na_value=np.nan))
+        with self._lock:
+            pyramid = self._entries.setdefault(key, pyramid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return pyramid
+
+    def invalidate(self, version=None):
+        """Drop the pyramids of one dataset version, or all of them."""
+        with self._lock:
+            if version is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == version]:
+                del self._entries[key]
+
+
+PYRAMIDS = register_cache(PyramidEngine())
@@ -0,0 +1,220 @@
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from stats import dataset_version, register_cache
+from profiling import PROFILER
+from artists import ARTISTS
+
+
+# Low cardinality columns get one bitmap per value; every other column gets a sorted index.
+BITMAP_COLUMNS = ("key", "mode", "releasedmonth", "artistcount")
+# Comma-joined credit columns, filtered by the individual artists they credit.
+CREDIT_COLUMNS = ("artistsname",)
+
+
+def _values(series):
+    """Column as float64, with categories replaced by their integer codes."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy().astype("float64")
+        codes[codes < 0] = np.nan
+        return codes
+    return series.to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _bitmap(positions, rows):
+    """Packed bitmap with the bits of the given row positions set."""
+    mask = np.zeros(rows, dtype=bool)
+    mask[positions] = True
+    return np.packbits(mask)
+
+
+class SortedIndex:
+    """Row positions of a column ordered by value, for range and equality lookups."""
+
+    def __init__(self, series):
+        """Sorted index constructor."""
+        self.rows = len(series)
+        self.categories = series.cat.categories if isinstance(series.dtype, pd.CategoricalDtype) else None
+        values = _values(series)
+        # Missing values sort last and are never inside a range.
+        self.order = np.argsort(values, kind="stable")
+        self.sorted = values[self.order]
+
+    def between(self, low=None, high=None):
+        """Bitmap of the rows with low <= value <= high; None leaves that side open."""
+        start = 0 if low is None else np.searchsorted(self.sorted, low, side="left")
+        stop = np.searchsorted(self.sorted, np.inf if high is None else high, side="right")
+        return _bitmap(self.order[start:stop], self.rows)
+
+    def isin(self, values):
+        """Bitmap of the rows holding any of the values."""
+        bits = np.zeros((self.rows + 7) // 8, dtype=np.uint8)
+        for value in values:
+            if self.categories is not None:
+                if value not in self.categories:
+                    continue
+                value = self.categories.get_loc(value)
+            bits |= self.between(value, value)
+        return bits
+
+
+class BitmapIndex:
+    """One packed bitmap per distinct value of a low cardinality column."""
+
+    def __init__(self, series):
+        """Bitmap index constructor."""
+        self.rows = len(series)
+        codes, uniques = pd.factorize(series)
+        self.bitmaps = {value: np.packbits(codes == code) for code, value in enumerate(uniques)}
+
+    def between(self, low=None, high=None):
+        """Bitmap of the rows with low <= value <= high; None leaves that side open."""
+        return self.isin([value for value in self.bitmaps
+                          if (low is None or value >= low) and (high is None or value <= high)])
+
+    def isin(self, values):
+        """Bitmap of the rows holding any of the values."""
+        bits = np.zeros((self.rows + 7) // 8, dtype=np.uint8)
+        for value in values:
+            bitmap = self.bitmaps.get(value)
+            if bitmap is None and not isinstance(value, str):
+                # Values typed in the UI arrive as floats; integer columns index them as ints.
+                bitmap = self.bitmaps.get(int(value)) if float(value).is_integer() else None
+            if bitmap is not None:
+                bits |= bitmap
+        return bits
+
+
+class CreditIndex:
+    """Rows of each artist of a credit column, read off the artist index's row lists."""
+
+    def __init__(self, artists, rows):
+        """Credit index constructor."""
+        self.artists = artists
+        self.rows = rows
+
+    def between(self, low=None, high=None):
+        """Artist names have no order to take a range of."""
+        raise ValueError("a credit column is filtered by artist names, not by a range")
+
+    def isin(self, values):
+        """Bitmap of the rows crediting any of the artists."""
+        mask = np.zeros(self.rows, dtype=bool)
+        for value in values:
+            mask[self.artists.tracks_of(value)] = True
+        return np.packbits(mask)
+
+
+def normalize(conditions):
+    """Hashable form of a {column: (low, high) or list of values} filter.
+
+    A tuple is an inclusive range whose open ends are None; a list or set keeps rows holding
+    any of its values.  Conditions that do not restrict anything are dropped.
+    """
+    clauses = []
+    for column, condition in (conditions or {}).items():
+        if isinstance(condition, tuple):
+            low, high = condition
+            if low is not None or high is not None:
+                clauses.append((column, "range", (low, high)))
+        elif condition:
+            clauses.append((column, "in", tuple(sorted(set(condition), key=str))))
+    return tuple(sorted(clauses, key=str))
+
+
+class QueryEngine:
+    """Column indexes and an LRU of filtered frames, keyed by dataset version.
+
+    Indexes are built on first use.  Every clause resolves to a packed bitmap that is cached
+    on its own, so a compound filter that differs in one clause only looks that clause up.
+    Filtered frames keep their identity while cached, so the statistics, distribution and
+    aggregation caches also hit for a filter that was drawn before.
+    """
+
+    def __init__(self, max_entries=128, bitmap_columns=BITMAP_COLUMNS, credit_columns=CREDIT_COLUMNS):
+        """Query engine constructor."""
+        self.max_entries = max_entries
+        self.bitmap_columns = bitmap_columns
+        self.credit_columns = credit_columns
+        self._indexes = {}
+        self._clauses = OrderedDict()
+        self._frames = OrderedDict()
+        self._lock = threading.RLock()
+
+    def index(self, data, column):
+        """Index of one column of the frame, built on first use."""
+        key = (dataset_version(data), column)
+        with self._lock:
+            index = self._indexes.get(key)
+        if index is None:
+            if column in self.credit_columns:
+                index = CreditIndex(ARTISTS.index(data), len(data))
+            else:
+                kind = BitmapIndex if column in self.bitmap_columns else SortedIndex
+                index = kind(data[column])
+            with self._lock:
+                index = self._indexes.setdefault(key, index)
+        return index
+
+    def bitmap(self, data, conditions):
+        """Packed bitmap of the rows that satisfy every condition."""
+        version = dataset_version(data)
+        bits = np.full((len(data) + 7) // 8, 0xFF, dtype=np.uint8)
+        for clause in normalize(conditions):
+            key = (version, clause)
+            clause_bits = self._get(self._clauses, key)
+            if clause_bits is None:
+                column, kind, argument = clause
+                index = self.index(data, column)
+                clause_bits = index.between(*argument) if kind == "range" else index.isin(argument)
+                self._put(self._clauses, key, clause_bits)
+            bits &= clause_bits
+        return bits
+
+    def mask(self, data, conditions):
+        """Boolean row mask of the rows that satisfy every condition."""
+        return np.unpackbits(self.bitmap(data, conditions), count=len(data)).view(bool)
+
+    def filter(self, data, conditions):
+        """Rows of the frame that satisfy every condition, as a frame the strategies can draw."""
+        clauses = normalize(conditions)
+        if not clauses:
+            return data
+        key = (dataset_version(data), clauses)
+        frame = self._get(self._frames, key)
+        if frame is not None:
+            PROFILER.count("query.hit")
+            return frame
+        PROFILER.count("query.miss")
+        with PROFILER.span("aggregate.filter", clauses=len(clauses)):
+            frame = data[self.mask(data, conditions)]
+        self._put(self._frames, key, frame)
+        return frame
+
+    def invalidate(self, version=None):
+        """Drop the indexes and filtered frames of one dataset version, or all of them."""
+        with self._lock:
+            for entries in (self._indexes, self._clauses, self._frames):
+                if version is None:
+                    entries.clear()
+                    continue
+                for key in [key for key in entries if key[0] == version]:
+                    del entries[key]
+
+    def _get(self, entries, key):
+        with self._lock:
+            value = entries.get(key)
+            if value is not None:
+                entries.move_to_end(key)
+            return value
+
+    def _put(self, entries, key, value):
+        with self._lock:
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+
+QUERIES = register_cache(QueryEngine())
@@ -0,0 +1,220 @@
+import sys
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from stats import dataset_version, register_cache
+
+
+PLATFORM_METRICS = ["streams", "inspotifyplaylists", "inspotifycharts", "inappleplaylists", "inapplecharts",
+                    "indeezerplaylists", "indeezercharts", "inshazamcharts"]
+DEFAULT_WEIGHTS = {metric: 1.0 for metric in PLATFORM_METRICS}
+TOP_COLUMNS = ["trackname", "artistsname"]
+
+
+def normalize_weights(weights=None):
+    """Weights of every platform metric, with unnamed metrics at zero, as a hashable tuple."""
+    weights = DEFAULT_WEIGHTS if weights is None else weights
+    unknown = set(weights) - set(PLATFORM_METRICS)
+    if unknown:
+        raise ValueError(f"unknown metrics: {', '.join(sorted(unknown))}")
+    return tuple((metric, float(weights.get(metric, 0.0))) for metric in PLATFORM_METRICS)
+
+
+def top_positions(scores, n):
+    """Positions of the n highest scores, best first, by partial selection instead of a full sort."""
+    n = min(n, len(scores))
+    if n <= 0:
+        return np.empty(0, dtype=np.intp)
+    candidates = np.argpartition(-scores, n - 1)[:n] if n < len(scores) else np.arange(len(scores))
+    # Ties keep the earlier row first, so results do not depend on the partition order.
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+
+class Leaderboard:
+    """Weighted composite reach score of every row, with cached top-N selections.
+
+    A metric contributes weight * value / scale, where scale is the metric's largest value.
+    Appended rows are scored on their own and folded into the top N, unless they bring a new
+    largest value: that changes the scale, so every row is scored again and the top N reselected.
+    """
+
+    def __init__(self, data, weights=None):
+        """Leaderboard constructor."""
+        self.weights = dict(normalize_weights(weights))
+        self.largest = {metric: 0.0 for metric, weight in self.weights.items() if weight}
+        self.scales = {metric: 1.0 for metric in self.largest}
+        self._scores = np.empty(0)
+        self._size = 0
+        self._parts = []
+        self._offsets = [0]
+        self._top = np.empty(0, dtype=np.intp)
+        self._lock = threading.Lock()
+        self.extend(data)
+
+    def score(self, rows):
+        """Composite scores of a frame of rows; missing metrics count as zero."""
+        scores = np.zeros(len(rows))
+        buffer = np.empty(len(rows))
+        for metric, scale in self.scales.items():
+            values = rows[metric].to_numpy(dtype="float64", na_value=np.nan)
+            # fmax maps NaN to zero in the same pass; reach counts are never negative.
+            np.fmax(values, 0.0, out=buffer)
+            buffer *= self.weights[metric] / scale
+            scores += buffer
+        return scores
+
+    @property
+    def scores(self):
+        """Scores of every row, in row order."""
+        return self._scores[:self._size]
+
+    def extend(self, rows):
+        """Score appended rows and fold them into the cached top positions."""
+        with self._lock:
+            rescaled = False
+            for metric in self.largest:
+                largest = np.nanmax(rows[metric].to_numpy(dtype="float64", na_value=np.nan), initial=0.0)
+                if largest > self.largest[metric]:
+                    self.largest[metric] = self.scales[metric] = largest
+                    rescaled = True
+            scores = self.score(rows)
+            size = self._size + len(scores)
+            if size > len(self._scores):
+                # Grow geometrically so repeated appends stay amortized O(new rows).
+                grown = np.empty(max(size, 2 * len(self._scores)))
+                grown[:self._size] = self._scores[:self._size]
+                self._scores = grown
+            self._scores[self._size:size] = scores
+            if rescaled and self._size:
+                for part, start in zip(self._parts, self._offsets):
+                    self._scores[start:start + len(part)] = self.score(part)
+                self._top = top_positions(self._scores[:size], len(self._top))
+            elif len(self._top):
+                new = np.arange(self._size, size)
+                candidates = np.concatenate([self._top, new[top_positions(scores, len(self._top))]])
+                self._top = candidates[top_positions(self._scores[candidates], len(self._top))]
+            self._size = size
+            self._parts.append(rows)
+            self._offsets.append(size)
+        return self
+
+    def __len__(self):
+        return self._size
+
+    def top_positions(self, n=100):
+        """Row positions of the n best scores, best first."""
+        with self._lock:
+            if n > len(self._top):
+                self._top = top_positions(self.scores, n)
+            return self._top[:n]
+
+    def top(self, n=100):
+        """The n best rows with their rank, score and platform metrics."""
+        positions = self.top_positions(n)
+        with self._lock:
+            parts = list(self._parts)
+            offsets = np.asarray(self._offsets)
+            scores = self.scores[positions]
+        part_of = np.searchsorted(offsets, positions, side="right") - 1
+        pieces = []
+        for part in np.unique(part_of):
+            chosen = np.flatnonzero(part_of == part)
+            piece = parts[part][TOP_COLUMNS + PLATFORM_METRICS].iloc[positions[chosen] - offsets[part]]
+            pieces.append(piece.set_axis(chosen))
+        if pieces:
+            table = pd.concat(pieces).sort_index()
+        else:
+            table = pd.DataFrame(columns=TOP_COLUMNS + PLATFORM_METRICS)
+        table.insert(0, "rank", np.arange(1, len(table) + 1))
+        table.insert(3, "score", scores)
+        return table
+
+
+class RankingEngine:
+    """LRU cache of leaderboards keyed by (dataset version, weights)."""
+
+    def __init__(self, max_entries=16):
+        """Ranking engine constructor."""
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def leaderboard(self, data, weights=None):
+        """Leaderboard of the frame under the given weights, built on first use."""
+        key = (dataset_version(data), normalize_weights(weights))
+        with self._lock:
+            board = self._entries.get(key)
+            if board is not None:
+                self._entries.move_to_end(key)
+                return board
+        board = Leaderboard(data, weights)
+        with self._lock:
+            board = self._entries.setdefault(key, board)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return board
+
+    def top(self, data, n=100, weights=None):
+        """The n best rows of the frame under the given weights."""
+        return self.leaderboard(data, weights).top(n)
+
+    def extend(self, data, rows):
+        """Fold appended rows into every leaderboard already built for the frame."""
+        version = dataset_version(data)
+        with self._lock:
+            boards = [board for key, board in self._entries.items() if key[0] == version]
+        for board in boards:
+            board.extend(rows)
+
+    def rekey(self, version, new_version):
+        """Move the leaderboards of one dataset version to another."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == version]:
+                self._entries[(new_version, *key[1:])] = self._entries.pop(key)
+
+    def invalidate(self, version=None):
+        """Drop the leaderboards of one dataset version, or all of them."""
+        with self._lock:
+            if version is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == version]:
+                del self._entries[key]
+
+
+RANKINGS = register_cache(RankingEngine())
+
+
+def parse_weights(text):
+    """Weights from "metric=weight,..." text; metrics left out weigh zero."""
+    weights = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        metric, _, weight = item.partition("=")
+        weights[metric.strip()] = float(weight) if weight else 1.0
+    return weights
+
+
+def main(argv=None):
+    """Command line entry point for the headless leaderboard."""
+    from dataset import load_dataset, DATA_FILE
+    parser = argparse.ArgumentParser(prog="main.py rank", description="Rank tracks by weighted platform reach.")
+    parser.add_argument("--data", default=DATA_FILE, help="CSV file to rank")
+    parser.add_argument("--top", type=int, default=100, help="number of tracks to list")
+    parser.add_argument("--weights", default=None,
+                        help="comma separated metric=weight pairs (default: every metric weighs 1)")
+    parser.add_argument("--out", default=None, help="write the table to this CSV file instead of printing it")
+    args = parser.parse_args(argv)
+    try:
+        weights = None if args.weights is None else parse_weights(args.weights)
+        normalize_weights(weights)
+    except ValueError as error:
+        parser.error(str(error))
+    table = RANKINGS.top(load_dataset(args.data), args.top, weights)
+    if args.out:
+        table.to_csv(args.out, index=False)
+    else:
+        table.to_string(sys.stdout, index=False, columns=["rank", "trackname", "artistsname", "score", "streams"])
+        print()
+    return 0
@@ -0,0 +1,158 @@
+import io
+import base64
+import threading
+import tkinter as tk
+from tkinter import ttk
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from profiling import PROFILER
+
+
+class RenderCancelled(Exception):
+    """Raised inside a worker when a newer request superseded the render."""
+
+
+class FigurePool:
+    """One reusable Agg figure per slot, cleared and redrawn in place for every render."""
+
+    def __init__(self):
+        """Figure pool constructor."""
+        self._figures = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def figure(self, slot, figsize):
+        """Borrow the slot's figure, resized and cleared; only one render uses it at a time."""
+        with self._lock:
+            entry = self._figures.get(slot)
+            if entry is None:
+                fig = Figure(figsize=figsize)
+                FigureCanvasAgg(fig)
+                entry = self._figures[slot] = (threading.Lock(), fig)
+        lock, fig = entry
+        with lock:
+            fig.clear()
+            fig.set_size_inches(figsize)
+            try:
+                yield fig
+            finally:
+                # Drop the artists so the figure does not keep the plotted data alive.
+                fig.clear()
+
+    def close(self, slot):
+        """Release the slot's figure."""
+        with self._lock:
+            entry = self._figures.pop(slot, None)
+        if entry is not None:
+            entry[1].clear()
+
+    def close_all(self):
+        """Release every pooled figure."""
+        for slot in list(self._figures):
+            self.close(slot)
+
+    def __len__(self):
+        return len(self._figures)
+
+
+def render_image(strategy, data, attribute1, attribute2=None, fig=None, fmt="png", dpi=100,
+                 is_stale=lambda: False):
+    """Draw a strategy on an Agg figure and return the encoded image bytes."""
+    if fig is None:
+        fig = strategy.make_figure()
+        FigureCanvasAgg(fig)
+    with PROFILER.span("draw", chart=type(strategy).__name__, rows=len(data)):
+        strategy.draw(data, fig, attribute1, attribute2)
+    if is_stale():
+        raise RenderCancelled()
+    buffer = io.BytesIO()
+    with PROFILER.span("rasterize", format=fmt) as span:
+        fig.savefig(buffer, format=fmt, dpi=dpi)
+        span.note(bytes=buffer.tell())
+    return buffer.getvalue()
+
+
+def render_png(strategy, data, attribute1, attribute2=None, fig=None, dpi=100, is_stale=lambda: False):
+    """Draw a strategy on an Agg figure and return the PNG encoded as base64."""
+    return base64.b64encode(render_image(strategy, data, attribute1, attribute2, fig=fig, dpi=dpi,
+                                         is_stale=is_stale))
+
+
+class RenderScheduler:
+    """Run graph strategies on worker threads and hand the finished images back to Tk."""
+
+    def __init__(self, root, workers=2, poll_interval=50):
+        """Render scheduler constructor."""
+        self.root = root
+        self.poll_interval = poll_interval
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render")
+        self.pool = FigurePool()
+        self.tickets = {}
+        self.futures = {}
+        self.images = {}
+
+    def submit(self, strategy, data, master, attribute1, attribute2=None, slot="plot"):
+        """Queue a render for master, superseding any request still in flight for the slot."""
+        ticket = self.tickets.get(slot, 0) + 1
+        self.tickets[slot] = ticket
+        previous = self.futures.pop(slot, None)
+        if previous is not None:
+            previous.cancel()
+            PROFILER.count("render.superseded")
+        PROFILER.count("render.requests")
+        progress = ttk.Progressbar(master, mode="indeterminate", length=300)
+        progress.pack(pady=20)
+        progress.start(10)
+        future = self.executor.submit(self._render, slot, strategy, data, attribute1, attribute2,
+                                      lambda: self.tickets.get(slot) != ticket)
+        self.futures[slot] = future
+        self.root.after(self.poll_interval, self._poll, slot, ticket, future, master, progress)
+        return future
+
+    def cancel(self, slot="plot"):
+        """Drop the pending render and the image shown for the slot."""
+        self.tickets[slot] = self.tickets.get(slot, 0) + 1
+        self.images.pop(slot, None)
+        future = self.futures.pop(slot, None)
+        if future is not None:
+            future.cancel()
+
+    def _render(self, slot, strategy, data, attribute1, attribute2, is_stale):
+        if is_stale():
+            raise RenderCancelled()
+        with self.pool.figure(slot, strategy.figsize) as fig:
+            return render_png(strategy, data, attribute1, attribute2, fig=fig, is_stale=is_stale)
+
+    def _poll(self, slot, ticket, future, master, progress):
+        if self.tickets.get(slot) != ticket or not master.winfo_exists():
+            future.cancel()
+            # Destroying a widget whose master is gone already does nothing.
+            progress.destroy()
+            return
+        if not future.done():
+            self.root.after(self.poll_interval, self._poll, slot, ticket, future, master, progress)
+            return
+        self.futures.pop(slot, None)
+        progress.destroy()
+        with PROFILER.span("blit", slot=slot):
+            try:
+                image = tk.PhotoImage(master=master, data=future.result())
+            except (CancelledError, RenderCancelled):
+                PROFILER.count("render.cancelled")
+                return
+            except Exception as error:
+                tk.Label(master, text=f"Could not draw the plot: {error}", bg="white", fg="red").pack(pady=20)
+                return
+            # Replacing the slot's image frees the previous one inside Tk as well.
+            self.images[slot] = image
+            tk.Label(master, image=image, bg="white").pack(fill="both", expand=True)
+
+    def shutdown(self):
+        """Stop accepting work and drop everything that has not started."""
+        for slot in list(self.futures):
+            self.cancel(slot)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.pool.close_all()
+        self.images.clear()
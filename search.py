@@ -0,0 +1,286 @@
+import functools
+import math
+import threading
+import numpy as np
+from artists import ARTISTS, _group_order
+from stats import dataset_version, register_cache
+
+
+# Documents indexed together; appended rows start new segments, merged as they accumulate.
+SEGMENT_DOCS = 1 << 20
+# Most postings a query reads from its rarest lists, shared out over the segments, before it
+# ranks only the first rows that match.
+MAX_CANDIDATES = 10_000
+# Most candidates scored against every trigram of a fuzzy query, shared out the same way.
+MAX_FUZZY = 2_000
+# Share of the query's trigrams a fuzzy match has to contain.
+MIN_SHARED = 0.6
+RESULTS = 20
+# Code points are packed three to a trigram key; word starts and ends are padded with a space.
+CODE_BITS = 21
+SPACE = ord(" ")
+
+
+@functools.lru_cache(maxsize=None)
+def _word_characters():
+    """Whether each code point of the basic multilingual plane is part of a word."""
+    return np.array([chr(code).isalnum() for code in range(0x10000)])
+
+
+def _pack(first, second, third):
+    return (np.int64(first) << 2 * CODE_BITS) | (np.int64(second) << CODE_BITS) | np.int64(third)
+
+
+def query_terms(text):
+    """Key ranges of the trigrams of a typed query, as (low, high) pairs.
+
+    Matching is case-insensitive and treats anything but letters and digits as a word break.
+    The last word is taken as still being typed, so it is not padded at its end unless the
+    query ends in a break; a single letter matches every trigram of a word starting with it.
+    """
+    words = _word_characters()
+    cleaned = "".join(char if ord(char) < 0x10000 and words[ord(char)] else " " for char in text.casefold())
+    if not cleaned.strip():
+        return []
+    padded = " " + " ".join(cleaned.split()) + (" " if cleaned.endswith(" ") else "")
+    codes = [ord(char) for char in padded]
+    if len(codes) < 3:
+        low = _pack(codes[0], codes[1], 0)
+        return [(low, low + (1 << CODE_BITS))]
+    keys = sorted({_pack(*codes[position:position + 3]) for position in range(len(codes) - 2)})
+    return [(key, key + 1) for key in keys]
+
+
+def _members(candidates, postings):
+    """Which of the sorted candidates appear in a sorted posting list."""
+    if not len(postings):
+        return np.zeros(len(candidates), dtype=bool)
+    positions = np.minimum(postings.searchsorted(candidates), len(postings) - 1)
+    return postings[positions] == candidates
+
+
+class Segment:
+    """Trigram postings of a contiguous run of documents.
+
+    keys holds the segment's distinct trigrams in ascending order, three code points packed
+    into an int64, and the documents holding keys[k] are postings[offsets[k]:offsets[k + 1]],
+    ascending and counted from start.
+    """
+
+    def __init__(self, texts, start):
+        """Segment constructor."""
+        self.start = start
+        self.size = len(texts)
+        # Documents are joined by NUL boundaries, which pad their ends like a space.
+        joined = "\x00" + "\x00".join(text if isinstance(text, str) else "" for text in texts) + "\x00"
+        codes = np.frombuffer(joined.casefold().encode("utf-32-le"), dtype=np.uint32)
+        boundary = codes == 0
+        inside = ~boundary & _word_characters()[np.minimum(codes, 0xFFFF)] & (codes < 0x10000)
+        codes = np.where(inside, codes, np.where(boundary, 0, SPACE)).astype(np.uint32)
+        # A run of breaks becomes one space, and breaks next to a boundary go.
+        codes = codes[inside | boundary | np.r_[False, inside[:-1]]]
+        codes = codes[(codes != SPACE) | (np.r_[codes[1:], 0] != 0)]
+        # A trigram belongs to a document when its middle character is not a boundary.
+        valid = codes[1:-1] != 0
+        docs = (np.cumsum(codes == 0) - 1)[:-2][valid]
+        padded = np.where(codes == 0, SPACE, codes)
+        alphabet = np.flatnonzero(np.bincount(padded, minlength=SPACE + 1))
+        letters = np.zeros(0x10000, dtype=np.int64)
+        letters[alphabet] = np.arange(len(alphabet))
+        local = letters[padded]
+        width = len(alphabet)
+        ids = ((local[:-2] * width + local[1:-1]) * width + local[2:])[valid]
+        # Dense ids over the segment's own alphabet usually fit two 16-bit radix passes.
+        order = _group_order(ids.astype(np.int32)) if width ** 3 < 1 << 31 else np.argsort(ids, kind="stable")
+        ids, docs = ids[order], docs[order]
+        # A trigram repeated within a document is posted once.
+        fresh = np.r_[True, (ids[1:] != ids[:-1]) | (docs[1:] != docs[:-1])]
+        ids, docs = ids[fresh], docs[fresh]
+        firsts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]]) if len(ids) else np.empty(0, dtype=np.intp)
+        distinct = ids[firsts]
+        self.keys = ((alphabet[distinct // (width * width)].astype(np.int64) << 2 * CODE_BITS)
+                     | (alphabet[distinct // width % width].astype(np.int64) << CODE_BITS)
+                     | alphabet[distinct % width].astype(np.int64))
+        self.offsets = np.r_[firsts, len(ids)]
+        self.postings = docs.astype(np.int32)
+        # Distinct trigrams of each document, to prefer the closer of two equally good matches.
+        self.lengths = np.bincount(docs, minlength=self.size).astype(np.int32)
+
+    def postings_of(self, terms):
+        """Documents holding any trigram with a key in each [low, high) range, ascending."""
+        bounds = self.keys.searchsorted(np.ravel(terms))
+        lists = []
+        for first, last in zip(bounds[::2], bounds[1::2]):
+            if last - first == 1:
+                lists.append(self.postings[self.offsets[first]:self.offsets[last]])
+                continue
+            heads = [self.postings[self.offsets[key]:self.offsets[key + 1]][:MAX_CANDIDATES]
+                     for key in range(first, last)]
+            lists.append(np.unique(np.concatenate(heads))[:MAX_CANDIDATES] if heads else self.postings[:0])
+        return lists
+
+    def search(self, terms, limit, previous=None, candidates=MAX_CANDIDATES, fuzzy=MAX_FUZZY):
+        """Documents matching the terms, with how many terms each holds, best candidates only.
+
+        Documents holding every term come from intersecting the posting lists rarest first,
+        or from narrowing the exact matches of a query these terms extend.  When there are
+        fewer than limit of those, documents holding at least MIN_SHARED of the terms are
+        found from the lists any such document must appear in.
+        """
+        lists = sorted(self.postings_of(terms), key=len)
+        # A trigram every document holds rules nothing out, so its list is never searched.
+        everywhere = sum(len(postings) == self.size for postings in lists)
+        selective = lists[:len(lists) - everywhere]
+        if previous is not None:
+            exact = previous
+        else:
+            exact = selective[0][:candidates] if selective else np.arange(min(self.size, candidates), dtype=np.int32)
+        complete = previous is not None or (len(selective[0]) if selective else self.size) <= candidates
+        for postings in selective[0 if previous is not None else 1:]:
+            if not len(exact):
+                break
+            exact = exact[_members(exact, postings)]
+        docs, shared = exact, np.full(len(exact), len(lists))
+        if len(exact) < limit and len(lists) > 1:
+            needed = max(1, math.ceil(MIN_SHARED * len(lists)))
+            # A document holding `needed` of the terms appears in at least one of any
+            # len(lists) - needed + 1 of the lists, so the rarest ones are enough to find it.
+            pool = np.unique(np.concatenate([postings[:fuzzy] for postings in lists[:len(lists) - needed + 1]]))
+            pool = pool[~_members(pool, exact)][:fuzzy]
+            counts = sum((_members(pool, postings).astype(np.int64) for postings in selective), everywhere)
+            near = counts >= needed
+            docs, shared = np.r_[docs, pool[near]], np.r_[shared, counts[near]]
+        return docs, shared, exact if complete else None
+
+
+class TrigramIndex:
+    """Trigram inverted index over a growing sequence of texts, in segments of sorted postings."""
+
+    def __init__(self, texts):
+        """Trigram index constructor."""
+        self.segments = []
+        self.size = 0
+        self._last = None
+        self._lock = threading.Lock()
+        self.update(texts)
+
+    def __len__(self):
+        return self.size
+
+    def update(self, texts):
+        """Index the texts past the ones already indexed; texts holds every text, old and new."""
+        segments = list(self.segments)
+        for start in range(self.size, len(texts), SEGMENT_DOCS):
+            segments.append(Segment(texts[start:start + SEGMENT_DOCS], start))
+            # Small segments from appends merge once they are no smaller than the one before.
+            while (len(segments) > 1 and segments[-2].size <= segments[-1].size
+                   and segments[-2].size + segments[-1].size <= SEGMENT_DOCS):
+                merged = segments[-2].start
+                segments[-2:] = [Segment(texts[merged:segments[-1].start + segments[-1].size], merged)]
+        with self._lock:
+            self.segments = segments
+            self.size = len(texts)
+            self._last = None
+
+    def search(self, text, limit=RESULTS):
+        """Best matching documents for a query as (documents, scores), best first.
+
+        The score is the share of the query's trigrams a document holds; ties go to the
+        document with fewer trigrams of its own, then to the earlier one.  A query extending
+        the previous one narrows that query's exact matches instead of starting over.
+        """
+        terms = query_terms(text)
+        with self._lock:
+            segments, last = self.segments, self._last
+        if not terms or not segments:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        extends = last is not None and set(last[0]) <= set(terms)
+        parts, exact = [], []
+        candidates = max(limit, MAX_CANDIDATES // len(segments))
+        fuzzy = max(limit, MAX_FUZZY // len(segments))
+        for position, segment in enumerate(segments):
+            previous = last[1][position] if extends and last[1][position] is not None else None
+            docs, shared, matched = segment.search(terms, limit, previous, candidates, fuzzy)
+            parts.append((docs + segment.start, shared, segment.lengths[docs]))
+            exact.append(matched)
+        with self._lock:
+            if self.segments is segments:
+                self._last = (terms, exact)
+        docs, shared, lengths = (np.concatenate(column) for column in zip(*parts))
+        best = np.lexsort((docs, lengths, -shared))[:limit]
+        return docs[best], shared[best] / len(terms)
+
+
+class SearchEngine:
+    """Per dataset version trigram indexes over track names and artist names."""
+
+    def __init__(self):
+        """Search engine constructor."""
+        self._indexes = {}
+        self._lock = threading.RLock()
+
+    def _index(self, data, field, texts):
+        key = (dataset_version(data), field)
+        with self._lock:
+            index = self._indexes.get(key)
+        if index is None:
+            index = TrigramIndex(texts())
+            with self._lock:
+                index = self._indexes.setdefault(key, index)
+        return index
+
+    def tracks(self, data):
+        """Trigram index of the frame's track names, by row position."""
+        return self._index(data, "tracks", lambda: data["trackname"].to_numpy())
+
+    def artists(self, data):
+        """Trigram index of the frame's artist names, by artist id."""
+        return self._index(data, "artists", lambda: ARTISTS.index(data).names)
+
+    def search(self, data, text, limit=RESULTS):
+        """Artists and tracks best matching a typed query, best first.
+
+        Each match is a dict with its kind ("artist" or "track"), name, score and the row
+        labels of its tracks.
+        """
+        artists = ARTISTS.index(data)
+        ids, artist_scores = self.artists(data).search(text, limit)
+        rows, track_scores = self.tracks(data).search(text, limit)
+        matches = [{"kind": "artist", "name": artists.names[artist], "score": float(score),
+                    "rows": data.index[artists.tracks_of(artists.names[artist])]}
+                   for artist, score in zip(ids, artist_scores)]
+        names = data["trackname"].iloc[rows].tolist()
+        credits = data["artistsname"].iloc[rows].tolist()
+        matches += [{"kind": "track", "name": f"{name} - {credit}", "score": float(score), "rows": data.index[[row]]}
+                    for row, name, credit, score in zip(rows, names, credits, track_scores)]
+        # Artists go first among equal scores; sorted is stable.
+        return sorted(matches, key=lambda match: -match["score"])[:limit]
+
+    def extend(self, data, rows):
+        """Index the appended rows in every index already built for the frame."""
+        version = dataset_version(data)
+        with self._lock:
+            indexes = {key[1]: index for key, index in self._indexes.items() if key[0] == version}
+        if "tracks" in indexes:
+            indexes["tracks"].update(data["trackname"].to_numpy())
+        if "artists" in indexes:
+            # Artist ids stay put as rows are appended, and new artists get the next ones.
+            indexes["artists"].update(ARTISTS.index(data).names)
+
+    def rekey(self, version, new_version):
+        """Move the indexes of one dataset version to another."""
+        with self._lock:
+            for key in [key for key in self._indexes if key[0] == version]:
+                self._indexes[(new_version, *key[1:])] = self._indexes.pop(key)
+
+    def invalidate(self, version=None):
+        """Drop the indexes of one dataset version, or all of them."""
+        with self._lock:
+            if version is None:
+                self._indexes.clear()
+                return
+            for key in [key for key in self._indexes if key[0] == version]:
+                del self._indexes[key]
+
+
+SEARCH = register_cache(SearchEngine())
@@ -0,0 +1,316 @@
+import os
+import json
+import hashlib
+import argparse
+import threading
+import matplotlib
+
+matplotlib.use("Agg")
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl
+from dataset import load_dataset, fingerprint, DATA_FILE, NUMERICAL_VALUES, SCHEMA, CACHE_DIR
+from graph import CHARTS
+from query import QUERIES, normalize
+from render import FigurePool, render_image
+
+
+CONTENT_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+CHART_CACHE_DIR = os.path.join(CACHE_DIR, "charts")
+RENDER_TIMEOUT = 120
+
+
+class ServiceError(Exception):
+    """A request that cannot be served, with the HTTP status to answer it with."""
+
+    def __init__(self, status, message):
+        """Service error constructor."""
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class ImageCache:
+    """Rendered images in a size-bounded in-memory LRU, backed by a content-addressed directory."""
+
+    def __init__(self, directory=CHART_CACHE_DIR, max_bytes=64 * 1024 ** 2):
+        """Image cache constructor."""
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def path(self, key, fmt):
+        """File of an image on disk, fanned out by the first two characters of its key."""
+        return os.path.join(self.directory, key[:2], f"{key}.{fmt}")
+
+    def get(self, key, fmt):
+        """Image bytes from memory or disk, or None; disk hits are promoted to memory."""
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                return body
+        try:
+            with open(self.path(key, fmt), "rb") as file:
+                body = file.read()
+        except OSError:
+            return None
+        self._remember(key, body)
+        return body
+
+    def put(self, key, fmt, body):
+        """Store an image in memory and on disk."""
+        self._remember(key, body)
+        path = self.path(key, fmt)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename, so a reader never sees half an image.
+            temporary = f"{path}.{threading.get_ident()}.tmp"
+            with open(temporary, "wb") as file:
+                file.write(body)
+            os.replace(temporary, path)
+        except OSError:
+            pass
+
+    def _remember(self, key, body):
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def parse_filters(params):
+    """Query conditions from range.<column>=low..high and in.<column>=value parameters."""
+    conditions = {}
+    for name, value in params:
+        kind, _, column = name.partition(".")
+        if kind not in ("range", "in"):
+            continue
+        if column not in SCHEMA:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, f"unknown filter column '{column}'")
+        if kind == "in":
+            conditions.setdefault(column, []).append(value)
+            continue
+        low, separator, high = value.partition("..")
+        try:
+            if not separator:
+                raise ValueError
+            conditions[column] = (float(low) if low else None, float(high) if high else None)
+        except ValueError:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, f"range.{column} must look like low..high") from None
+    return conditions
+
+
+class ChartService:
+    """Render charts of a preloaded dataset on a bounded worker pool, through an image cache."""
+
+    def __init__(self, data_path=DATA_FILE, cache_dir=CHART_CACHE_DIR, workers=None, backlog=64,
+                 memory_bytes=64 * 1024 ** 2):
+        """Chart service constructor."""
+        self.data = load_dataset(data_path)
+        self.version = fingerprint(data_path)
+        self.cache = ImageCache(cache_dir, memory_bytes)
+        self.figures = FigurePool()
+        workers = workers or os.cpu_count() or 1
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chart")
+        # Renders waiting or running; beyond this requests are turned away instead of queued.
+        self.slots = threading.BoundedSemaphore(workers + backlog)
+        self.pending = {}
+        self.counters = {"memory_or_disk_hits": 0, "renders": 0, "coalesced": 0, "rejected": 0}
+        self._lock = threading.Lock()
+
+    def parse(self, path, query):
+        """(chart, format, attribute1, attribute2, conditions) of a /chart/<type>.<format> request."""
+        name, _, fmt = path[len("/chart/"):].rpartition(".")
+        if name not in CHARTS:
+            raise ServiceError(HTTPStatus.NOT_FOUND, f"unknown chart type '{name}'")
+        if fmt not in CONTENT_TYPES:
+            raise ServiceError(HTTPStatus.NOT_FOUND, f"unknown format '{fmt}', expected png or svg")
+        params = parse_qsl(query, keep_blank_values=True)
+        values = dict(params)
+        strategy = CHARTS[name]
+        allowed = strategy.attributes or NUMERICAL_VALUES
+        attribute1 = values.get("attribute1", allowed[0] if strategy.attributes else None)
+        attribute2 = values.get("attribute2") if strategy.pairwise else None
+        if name == "artists":
+            # The artist comparison takes any number of artist=<name> parameters.
+            attribute2 = tuple(value for key, value in params if key == "artist") or None
+        if name == "similar" and values.get("track"):
+            # Similar songs take the index label of the track to compare as track=<label>.
+            try:
+                attribute2 = int(values["track"])
+            except ValueError:
+                raise ServiceError(HTTPStatus.BAD_REQUEST, "track must be the index label of a row") from None
+        for attribute in (attribute1, attribute2) if strategy.pairwise else (attribute1,):
+            if attribute not in allowed:
+                raise ServiceError(HTTPStatus.BAD_REQUEST,
+                                   f"{name} needs attribute1{' and attribute2' if strategy.pairwise else ''} "
+                                   f"from: {', '.join(allowed)}")
+        return name, fmt, attribute1, attribute2, parse_filters(params)
+
+    def key(self, chart, fmt, attribute1, attribute2, conditions):
+        """Content address of a chart: a hash of the request and the dataset version."""
+        request = [self.version, chart, fmt, attribute1, attribute2, normalize(conditions)]
+        return hashlib.sha256(json.dumps(request).encode()).hexdigest()
+
+    def image(self, chart, fmt, attribute1, attribute2=None, conditions=None):
+        """(key, image bytes) of a chart, rendering it at most once across concurrent requests."""
+        key = self.key(chart, fmt, attribute1, attribute2, conditions)
+        body = self.cache.get(key, fmt)
+        if body is not None:
+            self._count("memory_or_disk_hits")
+            return key, body
+        with self._lock:
+            future = self.pending.get(key)
+            if future is not None:
+                self.counters["coalesced"] += 1
+            elif not self.slots.acquire(blocking=False):
+                self.counters["rejected"] += 1
+                raise ServiceError(HTTPStatus.SERVICE_UNAVAILABLE, "render queue is full, retry shortly")
+            else:
+                future = self.pending[key] = self.executor.submit(self._render, key, chart, fmt, attribute1,
+                                                                  attribute2, conditions)
+        try:
+            return key, future.result(timeout=RENDER_TIMEOUT)
+        except TimeoutError:
+            raise ServiceError(HTTPStatus.GATEWAY_TIMEOUT, "rendering took too long") from None
+        except (KeyError, TypeError, ValueError) as error:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, f"could not draw the chart: {error}") from None
+
+    def _render(self, key, chart, fmt, attribute1, attribute2, conditions):
+        try:
+            strategy = CHARTS[chart]()
+            data = QUERIES.filter(self.data, conditions)
+            with self.figures.figure(threading.current_thread().name, strategy.figsize) as fig:
+                body = render_image(strategy, data, attribute1, attribute2, fig=fig, fmt=fmt)
+            self.cache.put(key, fmt, body)
+            self._count("renders")
+            return body
+        finally:
+            with self._lock:
+                self.pending.pop(key, None)
+            self.slots.release()
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def status(self):
+        """Service counters for the /health endpoint."""
+        with self._lock:
+            counters = dict(self.counters)
+        return dict(counters, rows=len(self.data), dataset_version=self.version, cached_images=len(self.cache),
+                    cached_bytes=self.cache.size, rendering=len(self.pending))
+
+    def shutdown(self):
+        """Stop the worker pool and release the pooled figures."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.figures.close_all()
+
+
+class ChartRequestHandler(BaseHTTPRequestHandler):
+    """HTTP front end of a ChartService, which the server carries as its 'service' attribute."""
+
+    protocol_version = "HTTP/1.1"
+    quiet = True
+
+    def do_GET(self):
+        """Serve /chart/<type>.<format>, /charts and /health."""
+        url = urlsplit(self.path)
+        service = self.server.service
+        try:
+            if url.path == "/health":
+                self.send_json(HTTPStatus.OK, service.status())
+            elif url.path == "/charts":
+                self.send_json(HTTPStatus.OK, {name: {"pairwise": strategy.pairwise,
+                                                      "attributes": list(strategy.attributes or NUMERICAL_VALUES)}
+                                               for name, strategy in CHARTS.items()})
+            elif url.path.startswith("/chart/"):
+                chart, fmt, attribute1, attribute2, conditions = service.parse(url.path, url.query)
+                key, body = service.image(chart, fmt, attribute1, attribute2, conditions)
+                self.send_image(key, fmt, body)
+            else:
+                raise ServiceError(HTTPStatus.NOT_FOUND, "expected /chart/<type>.<png|svg>, /charts or /health")
+        except ServiceError as error:
+            self.send_json(error.status, {"error": error.message})
+
+    def send_image(self, key, fmt, body):
+        """Answer with an image, or 304 when the client already holds this version of it."""
+        etag = f'"{key}"'
+        matches = [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]
+        if etag in matches or "*" in matches:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", CONTENT_TYPES[fmt])
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        # The URL stays the same when the data changes, so clients revalidate with the ETag.
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status, payload):
+        """Answer with a JSON document."""
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == HTTPStatus.SERVICE_UNAVAILABLE:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Log requests only when the server runs verbose."""
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(service, host="127.0.0.1", port=8000, verbose=False):
+    """HTTP server answering chart requests from the service, one thread per connection."""
+    handler = type("Handler", (ChartRequestHandler,), {"quiet": not verbose})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def main(argv=None):
+    """Command line entry point for the chart service."""
+    parser = argparse.ArgumentParser(prog="main.py serve", description="Serve charts over local HTTP.")
+    parser.add_argument("--data", default=DATA_FILE, help="CSV file to plot")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None, help="render threads (default: CPU count)")
+    parser.add_argument("--backlog", type=int, default=64, help="renders allowed to wait before answering 503")
+    parser.add_argument("--cache-dir", default=CHART_CACHE_DIR, help="directory of rendered images")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+    service = ChartService(args.data, args.cache_dir, args.workers, args.backlog)
+    server = make_server(service, args.host, args.port, args.verbose)
+    print(f"Serving {len(service.data)} rows on http://{args.host}:{server.server_address[1]}/ "
+          f"(try /charts or /chart/histogram.png?attribute1=bpm)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+    return 0
@@ -0,0 +1,337 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from artists import ARTIST_FEATURES, _group_order
+from stats import dataset_version, register_cache
+
+
+# Most tracks per leaf of the tree.  A batch job finds the neighbours of a leaf's tracks
+# together, and small leaves keep the region their neighbours can lie in small.
+LEAF_SIZE = 32
+# Leaves of the subtree holding a query compared first, to bound how far its neighbours can be;
+# a power of two.  A batch job's bounds must hold for every track of a leaf, so it compares more.
+SEED_LEAVES = 64
+BATCH_SEED_LEAVES = 128
+# Most tracks compared with a leaf in one matrix product, which bounds a batch job's memory.
+BATCH_TRACKS = 16_384
+# Levels with more nodes than this are split with one sort rather than node by node.
+SPLIT_NODES = 1024
+# Searches start from the level with about this many nodes, bounding them all in one step, as
+# walking the levels above it costs more in numpy calls than it saves.
+TOP_NODES = 1024
+# Below this many tracks a query compares every track instead of walking the tree.
+BRUTE_FORCE_BELOW = 4096
+NEIGHBOURS = 10
+# Leaves handed to a worker at a time in a batch job.
+BATCH_LEAVES = 256
+
+
+def feature_matrix(data, features=ARTIST_FEATURES):
+    """Standardized audio features of every track as a C-contiguous float32 matrix.
+
+    Each feature is centred on its mean and scaled by its standard deviation, so bpm does not
+    outweigh the percentages; a missing value is taken as the mean.
+    """
+    matrix = np.empty((len(data), len(features)), dtype=np.float32)
+    for column, feature in enumerate(features):
+        values = data[feature].to_numpy(dtype="float64", na_value=np.nan)
+        present = values[~np.isnan(values)]
+        mean, std = (present.mean(), present.std()) if len(present) else (0.0, 0.0)
+        matrix[:, column] = np.nan_to_num((values - mean) / (std or 1.0))
+    return matrix
+
+
+def _smallest(distances, positions, k):
+    """The k smallest distances of each row and their positions, nearest first."""
+    if distances.shape[1] > k:
+        keep = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        distances = np.take_along_axis(distances, keep, axis=1)
+        positions = np.take_along_axis(positions, keep, axis=1)
+    order = np.argsort(distances, axis=1, kind="stable")
+    return np.take_along_axis(distances, order, axis=1), np.take_along_axis(positions, order, axis=1)
+
+
+def _bounds(low, high, other_low, other_high):
+    """Smallest squared distance between a box and each of some boxes; a point is a box of its own."""
+    gaps = np.maximum(other_low - high, 0) + np.maximum(low - other_high, 0)
+    return np.einsum("ij,ij->i", gaps, gaps)
+
+
+def _split_nodes(matrix, order, starts, features):
+    """Split each node delimited by starts at the median of a feature, reordering order in place.
+
+    Returns the feature value the split falls at in each node.
+    """
+    values = np.empty(len(features), dtype=matrix.dtype)
+    for node, (start, end) in enumerate(zip(starts[:-1], starts[1:])):
+        keys = matrix[order[start:end], features[node]]
+        middle = (end - start) // 2
+        part = np.argpartition(keys, middle)
+        order[start:end] = order[start:end][part]
+        values[node] = keys[part[middle]]
+    return values
+
+
+def _split_level(matrix, order, starts, features, low, high):
+    """_split_nodes for many small nodes at once, through radix sorts of the whole level.
+
+    Tracks are sorted on their place in their node's range of the feature, to 16 bits, and
+    then stably on their node; a split off the exact median only makes the boxes overlap.
+    """
+    nodes = np.repeat(np.arange(len(features)), np.diff(starts))
+    lows, highs = low[np.arange(len(features)), features], high[np.arange(len(features)), features]
+    spans = np.where(highs > lows, highs - lows, 1)
+    keys = matrix[order, features[nodes]]
+    places = np.clip((keys - lows[nodes]) / spans[nodes], 0, 1)
+    part = np.argsort((places * 0xFFFF).astype(np.uint16), kind="stable")
+    part = part[_group_order(nodes[part].astype(np.int32))]
+    order[:] = order[part]
+    return keys[part][starts[:-1] + np.diff(starts) // 2]
+
+
+class FeatureTree:
+    """KD-tree over the rows of a feature matrix, answering k-nearest-neighbour queries.
+
+    The tree splits every node at the median of the widest side of its box until leaves hold at most
+    LEAF_SIZE tracks, and keeps the matrix reordered so each node is a contiguous block of
+    tracks.  Node n of a level covers leaves n * 2**h to (n + 1) * 2**h, h levels above the
+    leaves, and every level keeps the bounding boxes of its nodes, so searches walk the tree a
+    whole level at a time.  A query compares the tracks of the subtree it falls in, which
+    bounds its k-th distance, and then those of every other leaf within that bound in one step.
+    """
+
+    def __init__(self, matrix, leaf_size=LEAF_SIZE):
+        """Feature tree constructor."""
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        order = np.arange(len(matrix), dtype=np.int64)
+        starts = np.array([0, len(matrix)], dtype=np.int64)
+        # Only the order moves while the tree is built.  A node splits on the widest feature of
+        # its box, narrowed from its parent's at each split, and the matrix is gathered once.
+        low = matrix.min(axis=0, keepdims=True) if len(matrix) else np.zeros((1, matrix.shape[1]), np.float32)
+        high = matrix.max(axis=0, keepdims=True) if len(matrix) else low
+        # Halving keeps the nodes of a level within one track of each other in size, so every
+        # leaf is at the same depth.
+        while starts[1] > leaf_size:
+            features = np.argmax(high - low, axis=1)
+            if len(features) > SPLIT_NODES:
+                values = _split_level(matrix, order, starts, features, low, high)
+            else:
+                values = _split_nodes(matrix, order, starts, features)
+            nodes = np.arange(len(features))
+            left_high, right_low = high.copy(), low.copy()
+            left_high[nodes, features] = right_low[nodes, features] = values
+            low = np.stack([low, right_low], axis=1).reshape(-1, low.shape[1])
+            high = np.stack([left_high, high], axis=1).reshape(-1, high.shape[1])
+            starts = np.sort(np.r_[starts, starts[:-1] + np.diff(starts) // 2])
+        points = matrix[order]
+        self.points = points
+        # Row position of each track of the reordered matrix, and the reverse.
+        self.order = order
+        self.positions = np.empty_like(order)
+        self.positions[order] = np.arange(len(order))
+        self.norms = np.einsum("ij,ij->i", points, points)
+        self.starts = starts
+        if len(points):
+            low, high = np.minimum.reduceat(points, self.starts[:-1]), np.maximum.reduceat(points, self.starts[:-1])
+        else:
+            low = high = np.zeros((1, points.shape[1]), dtype=np.float32)
+        # Boxes of the nodes of every level, root first.
+        self.levels = [(low, high)]
+        while len(low) > 1:
+            low, high = np.minimum(low[0::2], low[1::2]), np.maximum(high[0::2], high[1::2])
+            self.levels.insert(0, (low, high))
+
+    def __len__(self):
+        return len(self.points)
+
+    @property
+    def leaves(self):
+        return len(self.starts) - 1
+
+    def vector(self, row):
+        """Standardized features of the track at a row position."""
+        return self.points[self.positions[row]]
+
+    def members(self, leaves):
+        """Positions in the reordered matrix of the tracks of some leaves."""
+        sizes = self.starts[leaves + 1] - self.starts[leaves]
+        return np.repeat(self.starts[leaves] - np.cumsum(sizes) + sizes, sizes) + np.arange(sizes.sum())
+
+    def leaf_of(self, vector):
+        """Leaf whose box a vector is in or nearest, following the nearest child down the tree."""
+        return int(self.descend(vector, vector, lambda bounds: [np.argmin(bounds)])[0])
+
+    def leaf_holding(self, row):
+        """Leaf holding the track at a row position."""
+        return int(np.searchsorted(self.starts, self.positions[row], side="right")) - 1
+
+    def subtree(self, leaf, leaves):
+        """First and last leaf, exclusive, of the subtree of a number of leaves holding a leaf."""
+        first = leaf - leaf % leaves
+        return first, min(first + leaves, self.leaves)
+
+    def descend(self, low, high, keep):
+        """Leaves reached from the root by expanding, a level at a time, the nodes keep chooses.
+
+        keep takes the smallest squared distances between the box low-high and the children
+        of the nodes kept so far, and returns which of them to keep.  The walk starts from
+        every node of the level with about TOP_NODES nodes.
+        """
+        top = min(len(self.levels) - 1, max(TOP_NODES.bit_length() - 1, 0))
+        level_low, level_high = self.levels[top]
+        nodes = np.arange(len(level_low))
+        nodes = nodes[keep(_bounds(low, high, level_low, level_high))]
+        for level_low, level_high in self.levels[top + 1:]:
+            nodes = (nodes[:, None] * 2 + np.arange(2)).ravel()
+            nodes = nodes[keep(_bounds(low, high, level_low[nodes], level_high[nodes]))]
+        return nodes
+
+    def query(self, vector, k=NEIGHBOURS, leaf=None):
+        """Row positions of the k tracks nearest a feature vector and their distances, nearest first.
+
+        leaf, when known, is the leaf the vector falls in, which spares finding it.
+        """
+        vector = np.asarray(vector, dtype=np.float32)
+        k = min(k, len(self))
+        if len(self) < BRUTE_FORCE_BELOW:
+            return self.brute_force(vector, k)
+        first, last = self.subtree(self.leaf_of(vector) if leaf is None else leaf, SEED_LEAVES)
+        seed = self._squared(vector, self.points[self.starts[first]:self.starts[last]])
+        limit = np.partition(seed, k - 1)[k - 1]
+        rest = self.descend(vector, vector, lambda bounds: bounds <= limit)
+        members = np.r_[np.arange(self.starts[first], self.starts[last]),
+                        self.members(rest[(rest < first) | (rest >= last)])]
+        distances = np.r_[seed, self._squared(vector, self.points[members[len(seed):]])]
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+        return self.order[members[nearest]], np.sqrt(distances[nearest])
+
+    @staticmethod
+    def _squared(vector, points):
+        """Squared distances from a vector to some points."""
+        differences = points - vector
+        return np.einsum("ij,ij->i", differences, differences)
+
+    def brute_force(self, vector, k=NEIGHBOURS):
+        """query, comparing the vector with every track."""
+        distances = self._squared(np.asarray(vector, dtype=np.float32), self.points)
+        k = min(k, len(self))
+        nearest = np.argpartition(distances, k - 1)[:k] if len(self) > k else np.arange(len(self))
+        nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+        return self.order[nearest], np.sqrt(distances[nearest])
+
+    def leaf_neighbours(self, leaf, k=NEIGHBOURS):
+        """Nearest k other tracks of every track of a leaf, as (rows, neighbour rows, distances).
+
+        The leaf is compared with the subtree of BATCH_SEED_LEAVES leaves holding it, which
+        bounds each track's k-th distance.  The other leaves within some track's bound
+        are then compared through matrix products, keeping only the distances under each
+        track's bound.
+        """
+        start, end = self.starts[leaf], self.starts[leaf + 1]
+        leaf_low, leaf_high = self.levels[-1]
+        first, last = self.subtree(leaf, BATCH_SEED_LEAVES)
+        members = np.arange(self.starts[first], self.starts[last])
+        distances = self._distances(start, end, members)
+        # A track is not its own neighbour.
+        distances[np.arange(end - start), start - members[0] + np.arange(end - start)] = np.inf
+        best, found = _smallest(distances, np.broadcast_to(members, distances.shape), k)
+        limits = best[:, -1:]
+        rest = self.descend(leaf_low[leaf], leaf_high[leaf], lambda bounds: bounds <= limits.max())
+        rest = rest[(rest < first) | (rest >= last)]
+        queries = self.points[start:end, None]
+        gaps = np.maximum(leaf_low[rest] - queries, 0) + np.maximum(queries - leaf_high[rest], 0)
+        rest = rest[(np.einsum("ijk,ijk->ij", gaps, gaps) <= limits).any(axis=0)]
+        queries, distances, neighbours = [np.repeat(np.arange(end - start), k)], [best.ravel()], [found.ravel()]
+        step = max(1, BATCH_TRACKS // max(int(np.diff(self.starts).max()), 1))
+        for first in range(0, len(rest), step):
+            members = self.members(rest[first:first + step])
+            block = self._distances(start, end, members)
+            rows, columns = np.nonzero(block < limits)
+            queries.append(rows)
+            distances.append(block[rows, columns])
+            neighbours.append(members[columns])
+        queries, distances, neighbours = (np.concatenate(column) for column in (queries, distances, neighbours))
+        # The k nearest of each track: sort by track then distance, and keep the first k of each.
+        order = np.lexsort((distances, queries))
+        queries, distances, neighbours = queries[order], distances[order], neighbours[order]
+        firsts = np.searchsorted(queries, np.arange(end - start))
+        keep = np.arange(len(queries)) - firsts[queries] < k
+        shape = (end - start, k)
+        return (self.order[start:end], self.order[neighbours[keep]].reshape(shape),
+                np.sqrt(distances[keep]).reshape(shape))
+
+    def _distances(self, start, end, members):
+        """Squared distances from the tracks start:end to some tracks, as one matrix product."""
+        distances = self.points[start:end] @ self.points[members].T
+        distances *= -2
+        distances += self.norms[members]
+        distances += self.norms[start:end, None]
+        # Rounding can leave tiny negative distances.
+        return np.maximum(distances, 0, out=distances)
+
+
+class SimilarityEngine:
+    """Per dataset version feature trees, for the tracks most similar to a track."""
+
+    def __init__(self, features=ARTIST_FEATURES):
+        """Similarity engine constructor."""
+        self.features = list(features)
+        self._trees = {}
+        self._lock = threading.RLock()
+
+    def tree(self, data):
+        """Feature tree of the frame, built on first use."""
+        version = dataset_version(data)
+        with self._lock:
+            tree = self._trees.get(version)
+        if tree is None:
+            tree = FeatureTree(feature_matrix(data, self.features))
+            with self._lock:
+                tree = self._trees.setdefault(version, tree)
+        return tree
+
+    def neighbours(self, data, row, k=NEIGHBOURS):
+        """Row positions of the k tracks most similar to the track at a row position, and their distances."""
+        tree = self.tree(data)
+        rows, distances = tree.query(tree.vector(row), k + 1, tree.leaf_holding(row))
+        # The track itself comes first unless it shares its features with others.
+        other = rows != row
+        return rows[other][:k], distances[other][:k]
+
+    def batch(self, data, k=NEIGHBOURS, workers=None, chunk_leaves=BATCH_LEAVES):
+        """Neighbours of every track, as chunks of (rows, neighbour rows, distances).
+
+        Chunks of leaves run on a pool of threads, which the matrix products keep busy outside
+        the GIL, and at most two chunks per worker are held at a time.
+        """
+        tree = self.tree(data)
+        workers = workers or os.cpu_count() or 1
+        k = min(k, len(tree) - 1)
+        if k < 1:
+            return
+
+        def chunk(first):
+            parts = [tree.leaf_neighbours(leaf, k) for leaf in range(first, min(first + chunk_leaves, tree.leaves))]
+            return tuple(np.concatenate(column) for column in zip(*parts))
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="neighbours") as executor:
+            pending = []
+            for first in range(0, tree.leaves, chunk_leaves):
+                pending.append(executor.submit(chunk, first))
+                if len(pending) >= 2 * workers:
+                    yield pending.pop(0).result()
+            for future in pending:
+                yield future.result()
+
+    def invalidate(self, version=None):
+        """Drop the feature trees of one dataset version, or all of them."""
+        with self._lock:
+            if version is None:
+                self._trees.clear()
+            else:
+                self._trees.pop(version, None)
+
+
+SIMILAR = register_cache(SimilarityEngine())
@@ -0,0 +1,275 @@
+import weakref
+import threading
+import itertools
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from profiling import PROFILER
+
+
+STATISTICS = ["count", "mean", "std", "min", "25%", "50%", "75%", "max"]
+
+_tokens = itertools.count(1)
+_versions = {}
+_caches = []
+
+
+def register_cache(cache):
+    """Have cache.invalidate(version) called whenever a dataset version goes away.
+
+    Dropping an entry can free the last reference to a frame it holds, which invalidates
+    that frame's version right away on the same thread, so caches guard their entries with
+    reentrant locks.
+    """
+    _caches.append(cache)
+    return cache
+
+
+def dataset_version(data):
+    """Version token of a frame, unique for the lifetime of the frame object."""
+    key = id(data)
+    version = _versions.get(key)
+    if version is None:
+        version = _versions[key] = next(_tokens)
+        weakref.finalize(data, _forget, key)
+    return version
+
+
+def bump_version(data):
+    """Give a frame that was modified in place a new version and drop its cached results."""
+    old = dataset_version(data)
+    _versions[id(data)] = next(_tokens)
+    _invalidate(old)
+    return _versions[id(data)]
+
+
+def extend_version(data, extended):
+    """Hand the cached results of a frame to the frame it grew into by appending rows.
+
+    extended holds every row of data followed by the appended ones.  Caches with an extend
+    method move their entries to the new version and fold the appended rows in; the others
+    drop the old version's entries and rebuild them on next use.
+    """
+    old, new = dataset_version(data), dataset_version(extended)
+    rows = extended.iloc[len(data):]
+    for cache in _caches:
+        if hasattr(cache, "extend"):
+            # Moving first means a reader of the old frame never gets an entry with the new rows.
+            cache.rekey(old, new)
+            cache.extend(extended, rows)
+        else:
+            cache.invalidate(old)
+    return new
+
+
+def _forget(key):
+    _invalidate(_versions.pop(key, None))
+
+
+def _invalidate(version):
+    if version is not None:
+        for cache in _caches:
+            cache.invalidate(version)
+
+
+# Integer-valued columns spanning at most this many values keep exact value counts, which
+# give exact quantiles and take appended rows in O(appended rows).
+MAX_COUNTED_SPAN = 1 << 20
+
+
+class ColumnSummary:
+    """Count, moments, extremes and quartiles of one numeric column, extendable by appended rows.
+
+    Integer-valued columns of modest span keep a count per value, so quartiles are read off
+    the cumulative counts.  Other columns keep their parts and recompute quartiles over them
+    the next time they are read.
+    """
+
+    def __init__(self):
+        """Column summary constructor."""
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+        self.low = None
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.parts = []
+        self._quartiles = None
+        self._row = None
+
+    def update(self, column):
+        """Fold a batch of column values in; missing values are ignored."""
+        self.parts.append(column)
+        self._quartiles = None
+        self._row = None
+        values = column.astype("float64", copy=False)
+        if column.dtype.kind == "f":
+            values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        low, high = values.min(), values.max()
+        mean = values.mean()
+        total = self.count + len(values)
+        delta = mean - self.mean
+        self.m2 += np.square(values - mean).sum() + delta ** 2 * self.count * len(values) / total
+        self.mean += delta * len(values) / total
+        self.count = total
+        self.minimum = min(self.minimum, low)
+        self.maximum = max(self.maximum, high)
+        if self.counts is not None:
+            self._count(column, values)
+        return self
+
+    def _count(self, column, values):
+        if column.dtype.kind == "f" and not (np.isfinite(self.minimum) and np.isfinite(self.maximum)
+                                             and np.array_equal(values, np.floor(values))):
+            self.counts = None
+            return
+        start, stop = int(self.minimum), int(self.maximum) + 1
+        if stop - start > MAX_COUNTED_SPAN:
+            self.counts = None
+            return
+        if self.low != start or len(self.counts) != stop - start:
+            counts = np.zeros(stop - start, dtype=np.int64)
+            if self.low is not None:
+                counts[self.low - start:self.low - start + len(self.counts)] = self.counts
+            self.low, self.counts = start, counts
+        self.counts += np.bincount((values - start).astype(np.intp), minlength=len(self.counts))
+
+    def quartiles(self):
+        """25%, 50% and 75% quantiles with linear interpolation, as pandas describes them."""
+        if not self.count:
+            return np.full(3, np.nan)
+        if self.counts is not None:
+            positions = (self.count - 1) * np.array([0.25, 0.5, 0.75])
+            below = np.floor(positions)
+            cumulative = np.cumsum(self.counts)
+            lower = np.searchsorted(cumulative, below, side="right")
+            upper = np.searchsorted(cumulative, np.minimum(below + 1, self.count - 1), side="right")
+            return self.low + lower + (positions - below) * (upper - lower)
+        if self._quartiles is None:
+            values = np.concatenate([part.astype("float64", copy=False) for part in self.parts])
+            self._quartiles = np.percentile(values[~np.isnan(values)], [25, 50, 75])
+        return self._quartiles
+
+    def describe(self):
+        """Row of the describe table for this column."""
+        if self._row is None:
+            if not self.count:
+                self._row = [0, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan]
+            else:
+                std = np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan
+                self._row = [self.count, self.mean, std, self.minimum, *self.quartiles(), self.maximum]
+        return self._row
+
+
+class NumericSummary:
+    """Summaries of every numeric column of a frame, extended in place as rows are appended."""
+
+    def __init__(self, data):
+        """Numeric summary constructor."""
+        self.columns = data.select_dtypes("number").columns
+        self.summaries = {column: ColumnSummary() for column in self.columns}
+        self._lock = threading.Lock()
+        self.extend(data)
+
+    def extend(self, rows):
+        """Fold appended rows into every column summary."""
+        with self._lock:
+            for column, summary in self.summaries.items():
+                summary.update(rows[column].to_numpy())
+
+    def __contains__(self, column):
+        return column in self.summaries
+
+    def table(self, columns=None):
+        """Summary statistics with one row per column, every numeric column by default.
+
+        Only the columns asked for are described, so one that must rescan its values after
+        an append does not hold up the others.
+        """
+        columns = self.columns if columns is None else pd.Index(columns)
+        with self._lock:
+            rows = [self.summaries[column].describe() for column in columns]
+        return pd.DataFrame(rows, index=columns, columns=STATISTICS, dtype="float64")
+
+
+class StatsEngine:
+    """LRU cache of summary statistics keyed by (dataset version, column tuple)."""
+
+    def __init__(self, max_entries=128):
+        """Stats engine constructor."""
+        self.max_entries = max_entries
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def describe(self, data, columns):
+        """Summary statistics of the columns, as returned by data[columns].describe().T."""
+        columns = (columns,) if isinstance(columns, str) else tuple(columns)
+        if not self.enabled:
+            return data[list(columns)].describe().T
+        version = dataset_version(data)
+        result = self._get((version, columns))
+        if result is not None:
+            self.hits += 1
+            PROFILER.count("stats.hit")
+            return result
+        self.misses += 1
+        PROFILER.count("stats.miss")
+        summary = self._get((version, None))
+        if summary is None:
+            summary = NumericSummary(data)
+            self._put((version, None), summary)
+        if all(column in summary for column in columns):
+            result = summary.table(columns)
+        else:
+            result = data[list(columns)].describe().T
+        self._put((version, columns), result)
+        return result
+
+    def extend(self, data, rows):
+        """Fold appended rows into the column summaries already built for the frame."""
+        version = dataset_version(data)
+        summary = self._get((version, None))
+        if summary is not None:
+            summary.extend(rows)
+        # Column selections are cut from the summary table again on next use.
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == version and key[1] is not None]:
+                del self._entries[key]
+
+    def rekey(self, version, new_version):
+        """Move the cached entries of one dataset version to another."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == version]:
+                self._entries[(new_version, *key[1:])] = self._entries.pop(key)
+
+    def invalidate(self, version=None):
+        """Drop cached entries for one dataset version, or everything."""
+        with self._lock:
+            if version is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == version]:
+                del self._entries[key]
+
+    def _get(self, key):
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+            return result
+
+    def _put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+STATS = register_cache(StatsEngine())
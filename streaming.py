@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+from dataset import iter_chunks, DATA_FILE, NUMERIC_COLUMNS
+from distribution import ColumnDistribution
+from stats import STATISTICS
+from profiling import PROFILER
+
+
+CHUNK_ROWS = 250_000
+SKETCH_SIZE = 512
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch in the style of KLL.
+
+    Level h holds items standing for 2**h values each.  A level that outgrows the capacity
+    is sorted and every other item (from a random offset) is promoted to the next level, so
+    memory stays around capacity * log2(n / capacity) items for n values.
+    """
+
+    def __init__(self, capacity=SKETCH_SIZE, seed=0):
+        """Quantile sketch constructor."""
+        self.capacity = capacity
+        self.levels = [np.empty(0)]
+        self._random = np.random.default_rng(seed)
+
+    def update(self, values):
+        """Add a batch of values; missing values are ignored."""
+        values = np.asarray(values, dtype="float64")
+        self.levels[0] = np.concatenate([self.levels[0], values[np.isfinite(values)]])
+        self._compact()
+        return self
+
+    def merge(self, other):
+        """Fold another sketch into this one."""
+        for height, items in enumerate(other.levels):
+            if height == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[height] = np.concatenate([self.levels[height], items])
+        self._compact()
+        return self
+
+    def _compact(self):
+        height = 0
+        while height < len(self.levels):
+            items = self.levels[height]
+            if len(items) > self.capacity:
+                items = np.sort(items)
+                # An odd leftover stays behind so the total weight is preserved exactly.
+                keep = items[:len(items) % 2]
+                promoted = items[len(keep) + self._random.integers(2)::2]
+                if height + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[height] = keep
+                self.levels[height + 1] = np.concatenate([self.levels[height + 1], promoted])
+            height += 1
+
+    @property
+    def count(self):
+        """Number of values the sketch stands for."""
+        return sum(len(items) << height for height, items in enumerate(self.levels))
+
+    def quantile(self, q):
+        """Approximate quantiles, with linear interpolation between retained items."""
+        items = np.concatenate(self.levels)
+        if not len(items):
+            return np.full(np.shape(q), np.nan)
+        weights = np.concatenate([np.full(len(level), 2.0 ** height) for height, level in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        items = items[order]
+        cumulative = np.cumsum(weights[order])
+        # Item i covers the ranks up to cumulative[i]; map to pandas' (n - 1) * q rank convention.
+        positions = (cumulative - weights[order] / 2) / cumulative[-1]
+        return np.interp(q, positions, items)
+
+
+class OnlineColumn(ColumnDistribution):
+    """Fixed-grid histogram, running moments and a quantile sketch of one column."""
+
+    def __init__(self):
+        """Online column constructor."""
+        super().__init__()
+        self.sketch = QuantileSketch()
+
+    def update(self, values):
+        """Add a batch of values; missing values are ignored."""
+        values = np.asarray(values, dtype="float64")
+        super().update(values)
+        self.sketch.update(values)
+        return self
+
+    def merge(self, other):
+        """Fold the aggregates of another column, e.g. from a parallel reader, into this one."""
+        if other.count:
+            if self.low is None:
+                self.low, self.high = other.low, other.high
+            while other.minimum < self.low or other.maximum >= self.high:
+                self._grow(upward=other.maximum >= self.high)
+            centers = other.low + other.width * (np.arange(other.grid_size) + 0.5)
+            index = np.clip(((centers - self.low) / self.width).astype(np.intp), 0, self.grid_size - 1)
+            self.counts += np.bincount(index, weights=other.counts, minlength=self.grid_size)
+            self._merge_moments(other.count, other.mean, other.m2)
+            self.minimum = min(self.minimum, other.minimum)
+            self.maximum = max(self.maximum, other.maximum)
+        self.sketch.merge(other.sketch)
+        return self
+
+    def describe(self):
+        """count, mean, std, min, quartiles and max, in the order of stats.STATISTICS."""
+        if not self.count:
+            return [0.0] + [np.nan] * 7
+        quartiles = self.sketch.quantile([0.25, 0.5, 0.75])
+        return [float(self.count), self.mean, self.std, self.minimum, *quartiles, self.maximum]
+
+    def box_stats(self, label):
+        """Box and whisker statistics for Axes.bxp, with whiskers at 1.5 IQR inside the range."""
+        q1, median, q3 = self.sketch.quantile([0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        return {"label": label, "med": median, "q1": q1, "q3": q3, "fliers": [],
+                "whislo": max(self.minimum, q1 - 1.5 * iqr), "whishi": min(self.maximum, q3 + 1.5 * iqr)}
+
+
+class StreamingDataset:
+    """Single-pass aggregates of a CSV that is read in bounded chunks and never held whole."""
+
+    def __init__(self, path=DATA_FILE, columns=NUMERIC_COLUMNS, chunk_rows=CHUNK_ROWS):
+        """Streaming dataset constructor."""
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.aggregates = {column: OnlineColumn() for column in columns}
+        self.rows = 0
+
+    def ingest(self, progress=None):
+        """Read the whole file once, folding every chunk into the aggregates."""
+        with PROFILER.span("load", path=self.path, source="stream") as span:
+            for chunk in iter_chunks(self.path, self.chunk_rows, list(self.aggregates)):
+                with PROFILER.span("load.stream_chunk", rows=len(chunk)):
+                    self.extend(chunk)
+                if progress is not None:
+                    progress(self.rows)
+            span.note(rows=self.rows)
+        return self
+
+    def extend(self, chunk):
+        """Fold one frame of rows into the aggregates."""
+        for column, aggregate in self.aggregates.items():
+            aggregate.update(chunk[column].to_numpy(dtype="float64", na_value=np.nan))
+        self.rows += len(chunk)
+
+    def merge(self, other):
+        """Fold another streamed part of the same export into this one."""
+        for column, aggregate in self.aggregates.items():
+            aggregate.merge(other.aggregates[column])
+        self.rows += other.rows
+        return self
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, column):
+        raise TypeError(f"'{column}' needs every row, but a streamed dataset only keeps aggregates; "
+                        "histogram, density, box and summary views are available")
+
+    def distribution(self, column):
+        """Binned distribution of a column."""
+        return self.aggregates[column]
+
+    def describe(self, columns):
+        """Summary statistics in the layout of data[columns].describe().T."""
+        columns = [columns] if isinstance(columns, str) else list(columns)
+        return pd.DataFrame([self.aggregates[column].describe() for column in columns],
+                            index=columns, columns=STATISTICS)
+
+    def box_stats(self, column):
+        """Box statistics of a column for Axes.bxp."""
+        return self.aggregates[column].box_stats(column)
@@ -0,0 +1,14 @@
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+
+@pytest.fixture(scope="session")
+def data():
+    """The bundled chart data, parsed from the CSV."""
+    from dataset import load_dataset
+    return load_dataset(os.path.join(ROOT, "spotify-data.csv"), use_cache=False)
@@ -0,0 +1,28 @@
+import pandas as pd
+import pytest
+from artists import ARTISTS, split_credits
+from query import QUERIES
+
+
+def expected_leaders(frame):
+    """Streams per credited artist of a frame, best first, by a plain groupby."""
+    credits = [(name, streams) for artists, streams in zip(frame["artistsname"].astype(str), frame["streams"])
+               for name in split_credits(artists)]
+    totals = pd.DataFrame(credits, columns=["artist", "streams"]).groupby("artist")["streams"].sum()
+    return totals.sort_values(ascending=False, kind="stable")
+
+
+@pytest.mark.parametrize("conditions", [{}, {"releasedyear": (2023, 2023)}, {"streams": (1e9, None)}])
+def test_leaders_rank_artists_of_the_frame(data, conditions):
+    frame = QUERIES.filter(data, conditions)
+    expected = expected_leaders(frame)
+    leaders = ARTISTS.leaders(frame)
+    assert sorted(leaders) == sorted(expected.index)
+    assert [expected[name] for name in leaders] == sorted(expected, reverse=True)
+
+
+def test_leaders_of_a_filtered_frame_have_tracks_in_it(data):
+    frame = QUERIES.filter(data, {"releasedyear": (2023, 2023)})
+    credited = {name for artists in frame["artistsname"].astype(str) for name in split_credits(artists)}
+    assert set(ARTISTS.leaders(frame, 10)) <= credited
+    assert len(ARTISTS.leaders(frame)) == len(credited)
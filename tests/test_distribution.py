@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from distribution import DISTRIBUTIONS, ExactColumn
+
+
+def finite(data, column):
+    values = data[column].to_numpy(dtype="float64", na_value=np.nan)
+    return values[np.isfinite(values)]
+
+
+def test_histogram_counts_match_numpy(data):
+    for column in data.select_dtypes("number").columns:
+        counts, edges = DISTRIBUTIONS.column(data, column).histogram(bins=10)
+        expected, expected_edges = np.histogram(finite(data, column), bins=10)
+        assert counts.tolist() == expected.tolist(), column
+        np.testing.assert_allclose(edges, expected_edges)
+
+
+@pytest.mark.parametrize("column", ["releasedday", "streams"])
+def test_histogram_over_a_shared_span_counts_outliers_in_the_end_bins(data, column):
+    values = finite(data, column)
+    low, high = np.percentile(values, [10, 90])
+    counts, edges = DISTRIBUTIONS.column(data, column).histogram(bins=7, span=(low, high))
+    expected, _ = np.histogram(np.clip(values, low, high), bins=7, range=(low, high))
+    assert counts.tolist() == expected.tolist()
+
+
+def test_histogram_stays_exact_as_batches_arrive(data):
+    values = finite(data, "bpm")
+    distribution = ExactColumn()
+    for batch in np.array_split(values, 5):
+        distribution.update(batch)
+    # A fractional value switches from per-value counts to kept values without losing any.
+    distribution.update([100.5])
+    values = np.append(values, 100.5)
+    counts, _ = distribution.histogram(bins=12)
+    assert counts.tolist() == np.histogram(values, bins=12)[0].tolist()
@@ -0,0 +1,19 @@
+import numpy as np
+from downsample import minmax_decimate, sort_by_x
+
+
+def test_small_and_decimated_series_are_both_in_x_order():
+    rng = np.random.default_rng(0)
+    x, y = rng.permutation(5000).astype(float), rng.random(5000)
+    small_x, _ = sort_by_x(x[:500], y[:500])
+    large_x, _ = minmax_decimate(x, y, buckets=100)
+    assert np.all(np.diff(small_x) >= 0)
+    assert np.all(np.diff(large_x) >= 0)
+
+
+def test_sort_by_x_keeps_pairs_and_drops_missing_values():
+    x = np.array([3.0, 1.0, np.nan, 2.0, 1.0])
+    y = np.array([30.0, 10.0, 0.0, 20.0, 11.0])
+    sorted_x, sorted_y = sort_by_x(x, y)
+    assert sorted_x.tolist() == [1.0, 1.0, 2.0, 3.0]
+    assert sorted_y.tolist() == [10.0, 11.0, 20.0, 30.0]
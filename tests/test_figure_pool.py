@@ -0,0 +1,47 @@
+import gc
+from benchmark import current_rss_mib
+from graph import BarPlot, BoxplotPlot, HistogramPlot, ScatterPlot
+from render import FigurePool, RenderScheduler
+
+
+class Root:
+    """Stand-in for the Tk root; these renders are collected straight from the worker."""
+
+    def after(self, delay, callback, *args):
+        pass
+
+
+def test_pool_redraws_one_figure_per_slot():
+    pool = FigurePool()
+    with pool.figure("plot", (4, 3)) as first:
+        first.add_subplot()
+    with pool.figure("plot", (6, 4)) as second:
+        assert second is first
+        assert not second.axes
+        assert tuple(second.get_size_inches()) == (6, 4)
+    with pool.figure("other", (4, 3)) as other:
+        assert other is not first
+    assert len(pool) == 2
+    pool.close_all()
+    assert len(pool) == 0
+
+
+def test_back_to_back_renders_keep_memory_flat(data, renders=500, warmup=50, tolerance_mib=2):
+    scheduler = RenderScheduler(Root())
+    plots = [(HistogramPlot(), "bpm", None), (BoxplotPlot(), "energy", None),
+             (ScatterPlot(), "bpm", "streams"), (BarPlot(), "mode", "danceability")]
+    baseline = None
+    try:
+        for index in range(renders):
+            strategy, attribute1, attribute2 = plots[index % len(plots)]
+            future = scheduler.executor.submit(scheduler._render, "plot", strategy, data, attribute1, attribute2,
+                                               lambda: False)
+            assert future.result()
+            if index + 1 == warmup:
+                gc.collect()
+                baseline = current_rss_mib()
+        assert len(scheduler.pool) == 1
+        gc.collect()
+        assert current_rss_mib() - baseline < tolerance_mib
+    finally:
+        scheduler.shutdown()
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+from artists import split_credits
+from query import QUERIES
+
+
+def test_artist_filter_keeps_every_track_crediting_the_artist(data):
+    credits = data["artistsname"].astype(str)
+    # An artist credited both alone and alongside others.
+    name = next(name for name in credits if "," not in name
+                and any(name in split_credits(credit) and credit != name for credit in credits))
+    frame = QUERIES.filter(data, {"artistsname": [name]})
+    expected = [name in split_credits(credit) for credit in credits]
+    assert frame.index.tolist() == data.index[np.array(expected)].tolist()
+    assert frame["artistsname"].nunique() > 1
+
+
+def test_artist_filter_combines_with_other_conditions(data):
+    frame = QUERIES.filter(data, {"artistsname": ["Taylor Swift"], "releasedyear": (2022, 2022)})
+    assert len(frame)
+    assert all("Taylor Swift" in split_credits(credit) for credit in frame["artistsname"].astype(str))
+    assert (frame["releasedyear"] == 2022).all()
+
+
+def test_artist_filter_takes_no_range(data):
+    with pytest.raises(ValueError):
+        QUERIES.filter(data, {"artistsname": ("A", "B")})
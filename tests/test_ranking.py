@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+from ranking import Leaderboard
+
+
+def test_appended_rows_rank_as_a_fresh_build(data):
+    # Rows in increasing order of streams, so appends keep bringing a new largest value.
+    rows = data.iloc[np.argsort(data["streams"].to_numpy(dtype="float64", na_value=0.0), kind="stable")]
+    board = Leaderboard(rows.iloc[:500])
+    board.top(10)
+    for start in range(500, len(rows), 50):
+        board.extend(rows.iloc[start:start + 50])
+    fresh = Leaderboard(rows)
+    np.testing.assert_allclose(board.scores, fresh.scores)
+    pd.testing.assert_frame_equal(board.top(10), fresh.top(10))
+
+
+def test_appended_rows_below_the_scales_keep_them(data):
+    board = Leaderboard(data)
+    scales = dict(board.scales)
+    board.extend(data.iloc[:50])
+    assert board.scales == scales
+    np.testing.assert_allclose(board.scores, Leaderboard(pd.concat([data, data.iloc[:50]])).scores)
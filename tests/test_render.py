@@ -0,0 +1,56 @@
+from concurrent.futures import Future
+from render import RenderScheduler
+
+
+class Widget:
+    """Stand-in for a Tk widget, recording whether it was destroyed."""
+
+    def __init__(self, exists=True):
+        self.exists = exists
+        self.destroyed = False
+
+    def winfo_exists(self):
+        return self.exists
+
+    def destroy(self):
+        self.destroyed = True
+
+
+class Root:
+    """Stand-in for the Tk root, recording the callbacks scheduled with after()."""
+
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, delay, callback, *args):
+        self.scheduled.append((callback, args))
+
+
+def test_superseded_render_removes_its_progress_bar():
+    scheduler = RenderScheduler(Root())
+    future, progress = Future(), Widget()
+    scheduler.tickets["plot"] = 2
+    scheduler._poll("plot", 1, future, Widget(), progress)
+    assert progress.destroyed
+    assert future.cancelled()
+    scheduler.shutdown()
+
+
+def test_render_for_a_destroyed_frame_removes_its_progress_bar():
+    scheduler = RenderScheduler(Root())
+    future, progress = Future(), Widget()
+    scheduler.tickets["plot"] = 1
+    scheduler._poll("plot", 1, future, Widget(exists=False), progress)
+    assert progress.destroyed
+    scheduler.shutdown()
+
+
+def test_pending_render_keeps_polling():
+    root = Root()
+    scheduler = RenderScheduler(root)
+    future, progress = Future(), Widget()
+    scheduler.tickets["plot"] = 1
+    scheduler._poll("plot", 1, future, Widget(), progress)
+    assert not progress.destroyed
+    assert len(root.scheduled) == 1
+    scheduler.shutdown()
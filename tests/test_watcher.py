@@ -0,0 +1,55 @@
+import os
+import numpy as np
+import pandas as pd
+from conftest import ROOT
+from dataset import load_dataset
+from watcher import LiveDataset
+
+
+SOURCE = os.path.join(ROOT, "spotify-data.csv")
+
+
+def split_file(source, path, rows):
+    """Write the header and first rows of a CSV to path; returns the remaining lines."""
+    with open(source, "rb") as file:
+        lines = file.readlines()
+    path.write_bytes(b"".join(lines[:rows + 1]))
+    return lines[rows + 1:]
+
+
+def mapped(array):
+    """Whether an array is a view of a memory map."""
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = getattr(array, "base", None)
+    return False
+
+
+def test_columns_stay_mapped_until_rows_arrive(tmp_path):
+    path = tmp_path / "chart.csv"
+    rest = split_file(SOURCE, path, 500)
+    # The first load writes the binary cache, which the live dataset then maps.
+    load_dataset(str(path))
+    live = LiveDataset(str(path))
+    assert mapped(live.columns["streams"].array)
+    assert mapped(live.columns["artistsname"].codes.array)
+    with open(path, "ab") as file:
+        file.write(b"".join(rest[:10]))
+    live.poll()
+    assert not mapped(live.columns["streams"].array)
+    assert len(live.frame) == 510
+
+
+def test_appended_rows_match_a_fresh_load(tmp_path):
+    path = tmp_path / "chart.csv"
+    rest = split_file(SOURCE, path, 500)
+    live = LiveDataset(str(path))
+    for start in range(0, len(rest), 150):
+        with open(path, "ab") as file:
+            file.write(b"".join(rest[start:start + 150]))
+        live.poll()
+    # The last line has no newline, so it is taken once the file holds still for a check.
+    live.poll()
+    expected = load_dataset(str(path), use_cache=False)
+    pd.testing.assert_frame_equal(live.frame, expected, check_dtype=False, check_categorical=False)
@@ -0,0 +1,225 @@
+import threading
+import numpy as np
+from stats import dataset_version, register_cache
+
+
+DATE_FIELDS = ("releasedyear", "releasedmonth", "releasedday")
+FREQUENCIES = ("day", "week", "month", "year")
+# Finest rollup worth drawing for each date field chosen as the x axis.
+FINEST = {"releasedday": "day", "releasedmonth": "month", "releasedyear": "year"}
+STATISTICS = ("mean", "sum", "count")
+# A line with more periods than this is drawn from the next coarser rollup instead.
+MAX_PERIODS = 1000
+
+
+def release_dates(data):
+    """Release date of every row as datetime64[D]; rows missing a date part are NaT."""
+    parts = [data[field].to_numpy() for field in DATE_FIELDS]
+    missing = np.zeros(len(data), dtype=bool)
+    for part in parts:
+        if part.dtype.kind == "f":
+            missing |= np.isnan(part)
+    year, month, day = (np.where(missing, 1, part).astype(np.int32) if part.dtype.kind == "f" else part
+                        for part in parts)
+    present = year[~missing]
+    first, last = (int(present.min()), int(present.max())) if len(present) else (1970, 1970)
+    # First day and length of every month from the earliest to the latest release year, so a
+    # row's date is two table lookups instead of calendar arithmetic.
+    months = np.arange((first - 1970) * 12, (last - 1969) * 12).astype("datetime64[M]")
+    starts = months.astype("datetime64[D]").astype(np.int64)
+    lengths = (months + 1).astype("datetime64[D]").astype(np.int64) - starts
+    slot = (year.astype(np.int32) - first) * 12 + np.clip(month, 1, 12).astype(np.int32) - 1
+    slot[missing] = 0
+    # A day past the end of its month (a 31st of April) falls back to the month's last day.
+    days = starts[slot] + np.minimum(np.maximum(day, 1), lengths[slot]) - 1
+    dates = days.astype("datetime64[D]")
+    dates[missing] = np.datetime64("NaT")
+    return dates
+
+
+def period_starts(dates, frequency):
+    """First day of the period each date falls in; weeks start on Monday."""
+    if frequency == "day":
+        return dates
+    if frequency == "week":
+        # 1970-01-01 was a Thursday, three days after a Monday.
+        return dates - (dates.astype(np.int64) + 3) % 7
+    unit = "datetime64[M]" if frequency == "month" else "datetime64[Y]"
+    return dates.astype(unit).astype("datetime64[D]")
+
+
+def _boundaries(starts):
+    """Positions where a sorted run of period starts changes value, beginning with 0."""
+    if not len(starts):
+        return np.empty(0, dtype=np.intp)
+    return np.concatenate([[0], np.flatnonzero(starts[1:] != starts[:-1]) + 1])
+
+
+class Rollup:
+    """Per-period sum and count of one metric, ordered by period start."""
+
+    def __init__(self, periods, sums, counts):
+        """Rollup constructor."""
+        self.periods = periods
+        self.sums = sums
+        self.counts = counts
+
+    def coarsen(self, frequency):
+        """The same totals rolled up to a coarser frequency, from these periods alone."""
+        starts = period_starts(self.periods, frequency)
+        bounds = _boundaries(starts)
+        if not len(bounds):
+            return Rollup(starts, self.sums, self.counts)
+        return Rollup(starts[bounds], np.add.reduceat(self.sums, bounds), np.add.reduceat(self.counts, bounds))
+
+    def merge(self, other):
+        """Rollup of the rows of both rollups, at the same frequency."""
+        periods = np.union1d(self.periods, other.periods)
+        sums = np.zeros(len(periods))
+        counts = np.zeros(len(periods), dtype=np.int64)
+        for rollup in (self, other):
+            # Periods are unique within a rollup, so the fancy-indexed adds never collide.
+            positions = np.searchsorted(periods, rollup.periods)
+            sums[positions] += rollup.sums
+            counts[positions] += rollup.counts
+        return Rollup(periods, sums, counts)
+
+    def values(self, statistic="mean"):
+        """Per-period mean, sum or count of the present values."""
+        if statistic == "sum":
+            return self.sums
+        if statistic == "count":
+            return self.counts
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.counts > 0, self.sums / self.counts, np.nan)
+
+    def window(self, start=None, end=None):
+        """The periods that start within [start, end] as a slice; None leaves that side open."""
+        first = 0 if start is None else np.searchsorted(self.periods, np.datetime64(start, "D"), side="left")
+        last = len(self.periods) if end is None else np.searchsorted(self.periods, np.datetime64(end, "D"),
+                                                                     side="right")
+        return slice(first, last)
+
+
+class TimeIndex:
+    """Row positions ordered by release date, so a daily rollup is one pass of segment sums."""
+
+    def __init__(self, data):
+        """Time index constructor."""
+        dates = release_dates(data)
+        missing = np.isnat(dates)
+        self.size = len(dates) - int(missing.sum())
+        days = dates.astype(np.int64)
+        low = days[~missing].min() if self.size else 0
+        span = days[~missing].max() - low if self.size else 0
+        if span < 0xFFFF:
+            # Release dates span decades, not centuries, so offset days fit the 16-bit radix sort.
+            keys = np.where(missing, 0xFFFF, days - low).astype(np.uint16)
+            self.order = np.argsort(keys, kind="stable")
+        else:
+            self.order = np.argsort(dates, kind="stable")
+        # Missing dates sort last and are left out of every rollup.
+        self.order = self.order[:self.size]
+        self.dates = dates[self.order]
+        self.bounds = _boundaries(self.dates)
+
+    def daily(self, values):
+        """Daily rollup of a metric given in row order."""
+        values = values[self.order]
+        present = ~np.isnan(values)
+        if not len(self.bounds):
+            return Rollup(self.dates[:0], np.empty(0), np.empty(0, dtype=np.int64))
+        sums = np.add.reduceat(np.where(present, values, 0.0), self.bounds)
+        counts = np.add.reduceat(present.astype(np.int64), self.bounds)
+        return Rollup(self.dates[self.bounds], sums, counts)
+
+
+class TimeSeriesEngine:
+    """Per dataset version release-date index and daily, weekly, monthly and yearly rollups.
+
+    The daily rollup of a metric costs one pass over the rows; coarser rollups are built from
+    the daily one, so their cost, like drawing them, depends on the number of periods.
+    Appended rows are rolled up on their own and merged into the daily rollups.
+    """
+
+    def __init__(self):
+        """Time series engine constructor."""
+        self._indexes = {}
+        self._rollups = {}
+        self._lock = threading.RLock()
+
+    def index(self, data):
+        """Release-date index of the frame, built on first use."""
+        version = dataset_version(data)
+        with self._lock:
+            index = self._indexes.get(version)
+        if index is None:
+            index = TimeIndex(data)
+            with self._lock:
+                index = self._indexes.setdefault(version, index)
+        return index
+
+    def rollup(self, data, metric, frequency="day"):
+        """Per-period sums and counts of a metric at one frequency."""
+        if frequency not in FREQUENCIES:
+            raise ValueError(f"unknown frequency '{frequency}', expected one of {', '.join(FREQUENCIES)}")
+        key = (dataset_version(data), metric, frequency)
+        with self._lock:
+            rollup = self._rollups.get(key)
+        if rollup is None:
+            if frequency == "day":
+                rollup = self.index(data).daily(data[metric].to_numpy(dtype="float64", na_value=np.nan))
+            else:
+                rollup = self.rollup(data, metric, "day").coarsen(frequency)
+            with self._lock:
+                rollup = self._rollups.setdefault(key, rollup)
+        return rollup
+
+    def series(self, data, metric, statistic="mean", start=None, end=None, finest="day", max_periods=MAX_PERIODS):
+        """(frequency, period starts, values) from the finest rollup with at most max_periods in range."""
+        if statistic not in STATISTICS:
+            raise ValueError(f"unknown statistic '{statistic}', expected one of {', '.join(STATISTICS)}")
+        for frequency in FREQUENCIES[FREQUENCIES.index(finest):]:
+            rollup = self.rollup(data, metric, frequency)
+            window = rollup.window(start, end)
+            if window.stop - window.start <= max_periods or frequency == FREQUENCIES[-1]:
+                return frequency, rollup.periods[window], rollup.values(statistic)[window]
+
+    def extend(self, data, rows):
+        """Merge appended rows into the daily rollups already built for the frame."""
+        version = dataset_version(data)
+        with self._lock:
+            # The row order of the whole frame is rebuilt only if a new metric asks for it.
+            self._indexes.pop(version, None)
+            daily = {key[1]: rollup for key, rollup in self._rollups.items() if key[0] == version and key[2] == "day"}
+            for key in [key for key in self._rollups if key[0] == version]:
+                del self._rollups[key]
+        if not daily:
+            return
+        index = TimeIndex(rows)
+        for metric, rollup in daily.items():
+            merged = rollup.merge(index.daily(rows[metric].to_numpy(dtype="float64", na_value=np.nan)))
+            with self._lock:
+                self._rollups.setdefault((version, metric, "day"), merged)
+
+    def rekey(self, version, new_version):
+        """Move the indexes and rollups of one dataset version to another."""
+        with self._lock:
+            if version in self._indexes:
+                self._indexes[new_version] = self._indexes.pop(version)
+            for key in [key for key in self._rollups if key[0] == version]:
+                self._rollups[(new_version, *key[1:])] = self._rollups.pop(key)
+
+    def invalidate(self, version=None):
+        """Drop the indexes and rollups of one dataset version, or all of them."""
+        with self._lock:
+            if version is None:
+                self._indexes.clear()
+                self._rollups.clear()
+                return
+            self._indexes.pop(version, None)
+            for key in [key for key in self._rollups if key[0] == version]:
+                del self._rollups[key]
+
+
+TIMESERIES = register_cache(TimeSeriesEngine())
@@ -1,37 +1,243 @@
+import os
+import time
+import importlib
 import tkinter as tk
-import pandas as pd
 import webbrowser
-import matplotlib.pyplot as plt
 from tkinter import ttk
-from graph import HistogramPlot, DensityPlot, BarPlot, ScatterPlot, LinePlot, BoxplotPlot
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from assets import ImageRegistry
+from profiling import PROFILER
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Filter bar fields as (label, column, role): "low" and "high" bound a range, "choice" picks one value.
+FILTER_FIELDS = [("Year from", "releasedyear", "low"), ("Year to", "releasedyear", "high"),
+                 ("Min streams", "streams", "low"), ("Key", "key", "choice"), ("Mode", "mode", "choice"),
+                 ("Artist", "artistsname", "choice")]
+# Page name -> (plot frame attribute, command drawing it), to redraw plots when rows are appended.
+PLOT_COMMANDS = {"storytelling": ("story_plot_frame", "plot_storytelling"),
+                 "histogram": ("hist_plot_frame", "plot_histogram"),
+                 "density": ("density_plot_frame", "plot_density_plot"), "bar": ("bar_frame", "plot_bar_chart"),
+                 "scatter": ("scatter_plot_frame", "plot_scatter_plot"), "line": ("line_plot_frame", "plot_line_plot"),
+                 "boxplot": ("boxplot_frame", "plot_boxplot"), "heatmap": ("heatmap_frame", "plot_heatmap"),
+                 "ranking": ("ranking_frame", "plot_ranking"), "artists": ("artist_frame", "plot_artists"),
+                 "similar": ("similar_frame", "plot_similar"), "compare": ("compare_frame", "plot_compare")}
+# Milliseconds between checks of the data file for appended rows.
+WATCH_INTERVAL = 2000
+# Pages with a track search, by the name of their filter bar, and the page whose plot they mark.
+SEARCH_PAGES = {"hist": "histogram", "scatter": "scatter", "box": "boxplot"}
+# Milliseconds between looks at whether the search index is ready.
+SEARCH_RETRY = 250
+# Milliseconds between looks at whether a task handed to a worker thread is done.
+TASK_POLL = 50
+# Entry of the snapshot list standing for the dataset the app loaded, rather than a catalog snapshot.
+LOADED_SNAPSHOT = "spotify-data (loaded)"
 
 
 class AppUI(tk.Tk):
     """UI for graphical analysis."""
 
-    def __init__(self):
+    def __init__(self, streaming=None, trace_path=None):
         """UI constructor."""
         super().__init__()
-        self.data = pd.read_csv("spotify-data.csv")
+        self.assets = ImageRegistry(self)
+        # F12 toggles profiling and its overlay, Shift+F12 saves a Chrome trace of the session.
+        self.trace_path = trace_path
+        self.overlay = None
+        self.bind("<F12>", self.toggle_profiling)
+        self.bind("<Shift-F12>", self.save_trace)
+        if trace_path is not None:
+            PROFILER.enable()
+        self._renderer = None
+        # pandas, matplotlib and the dataset load off the Tk thread while the home page shows.
+        self.loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        self.data_future = self.loader.submit(self.prefetch, None, streaming)
+        self.protocol("WM_DELETE_WINDOW", lambda: self.on_destroy_window(None))
+        self.pages = {}
+        self.current_page = None
+        self.filters = {}
+        # Search box, match list and matches shown of each page with a track search.
+        self.searches = {}
+        # Index labels of the rows picked in a search, marked on the histogram, scatter and box plots.
+        self.highlighted = []
+        # The search index is built after the load, on the same worker, so it never delays the first plot.
+        self.search_future = self.loader.submit(self.index_search, self.data_future)
+        # Index label of the track the Similar Songs page compares, and the track matches it lists.
+        self.similar_track = None
+        self.similar_matches = []
+        self.loader.submit(self.index_similar, self.data_future)
+        # Latest artist ranking asked for by the artist search; older ones are dropped when they finish.
+        self.artist_future = None
+        # Snapshots given on the command line load after the dataset, for the Compare Snapshots page.
+        from catalog import CATALOG
+        for name in CATALOG.names():
+            self.loader.submit(CATALOG.frame, name)
+        # Pages whose plot was drawn before rows were appended, redrawn when next shown.
+        self.stale_pages = set()
+        self.watch_future = None
+        self.after(WATCH_INTERVAL, self.watch_data)
         self.welcome_page()
-        self.numerical_values = ["artistcount", "releasedyear", "releasedmonth"
-            , "releasedday", "inspotifyplaylists", "inspotifycharts"
-            , "streams", "inappleplaylists", "inapplecharts"
-            , "indeezercharts", "bpm", "danceability"
-            , "valence", "energy", "acousticness"
-            , "instrumentalness", "liveness", "speechiness"]
+        self.assets.preload([("histogram_logo.png", 2), ("density_logo.png", 2), ("scatter_logo.png", 2),
+                             ("bar_logo.png", 2), ("box_logo.png", 2)])
         self.visual_option_one = None
         self.visual_option_two = None
         self.visual_option_three = None
         self.visual_option_four = None
         self.visual_option_five = None
+        self.visual_option_six = None
+        self.visual_option_seven = None
+        self.visual_option_eight = None
+        self.visual_option_nine = None
+        self.visual_option_ten = None
+        self.visual_option_eleven = None
+        if PROFILER.enabled:
+            self.show_overlay()
+
+    @staticmethod
+    def prefetch(path=None, streaming=None):
+        """Load the dataset, dataset.DATA_FILE by default, and warm the plotting modules in the background.
+
+        dataset, and with it pandas, is imported here rather than by the caller, so the home
+        window shows first.  Files too large to hold in memory (or any file when streaming is True) are read in
+        chunks into online aggregates, which serve the histogram, density and box views.
+        Others are loaded live, so rows appended to the file later join the loaded ones.
+        """
+        from dataset import DATA_FILE, STREAM_ABOVE_BYTES
+        path = path or DATA_FILE
+        if streaming is None:
+            streaming = os.path.getsize(path) > STREAM_ABOVE_BYTES
+        if streaming:
+            from streaming import StreamingDataset
+            data = StreamingDataset(path).ingest()
+        else:
+            from watcher import LiveDataset
+            from artists import ARTISTS
+            from timeseries import TIMESERIES
+            data = LiveDataset(path)
+            ARTISTS.index(data.frame)
+            TIMESERIES.index(data.frame)
+        for module in ("graph", "render"):
+            importlib.import_module(module)
+        return data
+
+    @staticmethod
+    def index_search(data_future):
+        """Build the track and artist search indexes of a loaded in-memory dataset."""
+        from search import SEARCH
+        from watcher import LiveDataset
+        data = data_future.result()
+        if isinstance(data, LiveDataset):
+            SEARCH.tracks(data.frame)
+            SEARCH.artists(data.frame)
+
+    @staticmethod
+    def index_similar(data_future):
+        """Build the audio feature tree of a loaded in-memory dataset, for the Similar Songs page."""
+        from similar import SIMILAR
+        from watcher import LiveDataset
+        data = data_future.result()
+        if isinstance(data, LiveDataset):
+            SIMILAR.tree(data.frame)
+
+    @staticmethod
+    def follow(dataset):
+        """Fold rows appended to the file into a live dataset; returns how many rows changed.
+
+        The artist index is rebuilt here too, since the artist search reads it on the Tk thread.
+        """
+        from artists import ARTISTS
+        changed = dataset.poll()
+        if changed:
+            ARTISTS.index(dataset.frame)
+        return changed
+
+    @property
+    def data(self):
+        """The dataset, waiting for the background load if it is still running."""
+        data = self.data_future.result()
+        from watcher import LiveDataset
+        return data.frame if isinstance(data, LiveDataset) else data
+
+    @property
+    def numerical_values(self):
+        """Numeric attributes offered in the attribute comboboxes."""
+        from dataset import NUMERICAL_VALUES
+        return list(NUMERICAL_VALUES)
+
+    @property
+    def renderer(self):
+        """Render scheduler, created when the first plot is requested."""
+        if self._renderer is None:
+            from render import RenderScheduler
+            self._renderer = RenderScheduler(self)
+        return self._renderer
+
+    def show_page(self, name, title, build):
+        """Show the named page, building it on the first visit.
+
+        Pages are hidden rather than destroyed, so they keep their selections and last plot.
+        """
+        page = self.pages.get(name)
+        if self.current_page is not None and self.current_page is not page:
+            self.current_page.pack_forget()
+        if page is None:
+            page = self.pages[name] = tk.Frame(self, bg="black")
+            page.pack(fill="both", expand=True)
+            build(page)
+        elif page is not self.current_page:
+            page.pack(fill="both", expand=True)
+        self.current_page = page
+        self.title(title)
+        if name in self.stale_pages:
+            self.stale_pages.discard(name)
+            self.redraw(name)
+
+    def watch_data(self):
+        """Check the data file for appended rows in the background, and redraw plots when there are some."""
+        if self.data_future.done() and self.data_future.exception() is None:
+            from watcher import LiveDataset
+            dataset = self.data_future.result()
+        else:
+            dataset = None
+        if isinstance(dataset, LiveDataset):
+            if self.watch_future is not None and self.watch_future.done():
+                try:
+                    changed = self.watch_future.result()
+                except (OSError, ValueError):
+                    # A tail that does not parse yet is read again on the next check.
+                    changed = 0
+                self.watch_future = None
+                if changed:
+                    self.data_changed()
+            if self.watch_future is None:
+                self.watch_future = self.loader.submit(self.follow, dataset)
+        self.after(WATCH_INTERVAL, self.watch_data)
+
+    def data_changed(self):
+        """Redraw the plots of the shown page; plots on hidden pages are redrawn when next shown."""
+        self.stale_pages = {name for name, (frame, command) in PLOT_COMMANDS.items()
+                            if name in self.pages and hasattr(self, frame) and getattr(self, frame).winfo_exists()}
+        for name, page in self.pages.items():
+            if page is self.current_page and name in self.stale_pages:
+                self.stale_pages.discard(name)
+                self.redraw(name)
+        if hasattr(self, "artist_listbox"):
+            self.search_artists()
+        for name in self.searches:
+            self.search_tracks(name)
+
+    def redraw(self, name):
+        """Draw the plot of a page again from the current data and selections."""
+        frame, command = PLOT_COMMANDS[name]
+        if hasattr(self, frame) and getattr(self, frame).winfo_exists():
+            getattr(self, command)()
 
     def welcome_page(self):
         """Homepage for the UI."""
-        self.destroy_widgets()
-        self.title("Spotify Hot Hits")
-        self.frame = tk.Frame(self, width=1000, height=1000)
+        self.show_page("welcome", "Spotify Hot Hits", self.build_welcome_page)
+
+    def build_welcome_page(self, page):
+        """Build the homepage."""
+        self.frame = tk.Frame(page, width=1000, height=1000)
         self.frame.pack(fill="both", expand=True)
         self.frame.configure(background="black")
         for row in range(2):
@@ -40,12 +246,11 @@ class AppUI(tk.Tk):
             self.frame.columnconfigure(column, weight=1)
         self.canvas = tk.Canvas(self.frame, width=1000, height=200, bg="black", highlightbackground="black")
         self.canvas.grid(row=0, column=0)
-        self.logo = tk.PhotoImage(file="images/Hot_Hits.png")
-        self.repo_logo = tk.PhotoImage(file="images/repo_logo.png").subsample(2)
-        self.visual_logo = tk.PhotoImage(file="images/data_viz.png").subsample(2)
-        self.exit_logo = tk.PhotoImage(file="images/exit_logo.png").subsample(2)
-        self.statistic_logo = tk.PhotoImage(file="images/statistic_logo.png").subsample(2)
-        self.storytelling_logo = tk.PhotoImage(file="images/storytelling_logo.png").subsample(2)
+        self.logo = self.assets.get("Hot_Hits.png")
+        self.repo_logo = self.assets.get("repo_logo.png", 2)
+        self.visual_logo = self.assets.get("data_viz.png", 2)
+        self.exit_logo = self.assets.get("exit_logo.png", 2)
+        self.storytelling_logo = self.assets.get("storytelling_logo.png", 2)
         self.canvas.update_idletasks()
         self.canvas_width = self.canvas.winfo_width()
         self.canvas_height = self.canvas.winfo_height()
@@ -87,10 +292,12 @@ class AppUI(tk.Tk):
 
     def storytelling_page(self, event):
         """Storytelling page."""
-        self.destroy_widgets()
-        self.navigation_buttons(self.welcome_page)
-        self.title("Data Storytelling")
-        self.storytelling_frame = tk.Frame(self)
+        self.show_page("storytelling", "Data Storytelling", self.build_storytelling_page)
+
+    def build_storytelling_page(self, page):
+        """Build the storytelling page and render its plot once."""
+        self.navigation_buttons(page, self.welcome_page)
+        self.storytelling_frame = tk.Frame(page)
         self.storytelling_frame.pack(fill="both", expand=True)
         self.storytelling_frame.configure(background="black")
         for row in range(3):
@@ -103,40 +310,44 @@ class AppUI(tk.Tk):
         self.story1_label = tk.Label(self.storytelling_canvas, text="How can released year, beat per minute, valence, "+"\n"+"and energy of the song have effect on user streaming?"
                                      , bg="black", font=("Chalkduster", 24))
         self.story1_label.pack()
-        fig, axs = plt.subplots(2, 2, figsize=(12, 10))
+        from graph import StorytellingPlot
+        explore_frame = tk.Frame(self.storytelling_frame, bg="black")
+        explore_frame.grid(row=2, column=0, columnspan=2)
+        for variable in StorytellingPlot.variables:
+            explore_button = tk.Button(explore_frame, text="Explore " + variable.capitalize(), font="Chalkduster",
+                                       command=lambda variable=variable: self.navigate("storytelling", variable,
+                                                                                     'streams'))
+            explore_button.pack(side="left", padx=5, pady=5)
+        self.plot_storytelling()
 
-        axs = axs.flatten()
-
-        variables = ['releasedyear', 'bpm', 'valence', 'energy']
-
-        for i, variable in enumerate(variables):
-            axs[i].scatter(self.data[variable], self.data['streams'], alpha=0.5)
-            axs[i].set_xlabel(variable.capitalize())
-            axs[i].set_ylabel('Streams')
-            axs[i].set_title('Streams vs ' + variable.capitalize())
-
-        canvas_scatter = FigureCanvasTkAgg(fig, master=self.storytelling_frame)
-        canvas_scatter.draw()
-        canvas_scatter.get_tk_widget().grid(row=1, column=0, columnspan=2)
+    def plot_storytelling(self):
+        """Storytelling plot command."""
+        from graph import StorytellingPlot
+        self.destroy_plot_frame("story_plot_frame")
+        self.story_plot_frame = tk.Frame(self.storytelling_frame, bg="black")
+        self.story_plot_frame.grid(row=1, column=0, columnspan=2)
+        self.renderer.submit(StorytellingPlot(), self.data, self.story_plot_frame, 'streams',
+                             slot="story_plot_frame")
 
     def visualization_option_page(self, event):
         """Option page for distribution visualization."""
-        self.destroy_widgets()
-        self.title("Visualization Option")
-        self.navigation_buttons(self.welcome_page)
-        self.visualization_option_frame = tk.Frame(self, width=1500, height=1000)
+        self.show_page("options", "Visualization Option", self.build_visualization_option_page)
+
+    def build_visualization_option_page(self, page):
+        """Build the visualization option page."""
+        self.navigation_buttons(page, self.welcome_page)
+        self.visualization_option_frame = tk.Frame(page, width=1500, height=1000)
         self.visualization_option_frame.pack(fill="both", expand=True)
         self.visualization_option_frame.configure(background="black")
-        for row in range(3):
+        for row in range(6):
             self.visualization_option_frame.rowconfigure(row, weight=1)
         for column in range(2):
             self.visualization_option_frame.columnconfigure(column, weight=1)
-        self.return_logo = tk.PhotoImage(file="images/return.png").subsample(2)
-        self.histogram_logo = tk.PhotoImage(file="images/histogram_logo.png").subsample(2)
-        self.density_logo = tk.PhotoImage(file="images/density_logo.png").subsample(2)
-        self.scatter_logo = tk.PhotoImage(file="images/scatter_logo.png").subsample(2)
-        self.bar_logo = tk.PhotoImage(file="images/bar_logo.png").subsample(2)
-        self.box_logo = tk.PhotoImage(file="images/box_logo.png").subsample(2)
+        self.histogram_logo = self.assets.get("histogram_logo.png", 2)
+        self.density_logo = self.assets.get("density_logo.png", 2)
+        self.scatter_logo = self.assets.get("scatter_logo.png", 2)
+        self.bar_logo = self.assets.get("bar_logo.png", 2)
+        self.box_logo = self.assets.get("box_logo.png", 2)
         self.visual_option_one = tk.Canvas(self.visualization_option_frame, width=450, height=100, bg='#FF3C00',
                                            highlightbackground="black")
         self.visual_option_one.grid(row=0, column=0, padx=5, pady=5)
@@ -172,230 +383,771 @@ class AppUI(tk.Tk):
         self.visual_option_five.bind("<Button-1>", self.bar_chart_page)
         self.visual_option_five.bind("<Enter>", self.on_enter)
         self.visual_option_five.bind("<Leave>", self.on_leave)
-
-
+        self.visual_option_six = tk.Canvas(self.visualization_option_frame, width=450, height=100, bg='#9800FF',
+                                           highlightbackground="black")
+        self.visual_option_six.grid(row=2, column=1, padx=5, pady=5)
+        self.visual_option_six.create_text(225, 50, text="Top Tracks", fill="white", font=("Chalkduster", 28))
+        self.visual_option_six.bind("<Button-1>", self.ranking_page)
+        self.visual_option_six.bind("<Enter>", self.on_enter)
+        self.visual_option_six.bind("<Leave>", self.on_leave)
+        self.visual_option_seven = tk.Canvas(self.visualization_option_frame, width=450, height=100, bg='#FF3C00',
+                                             highlightbackground="black")
+        self.visual_option_seven.grid(row=3, column=0, padx=5, pady=5)
+        self.visual_option_seven.create_text(225, 50, text="Correlations", fill="white", font=("Chalkduster", 28))
+        self.visual_option_seven.bind("<Button-1>", self.heatmap_page)
+        self.visual_option_seven.bind("<Enter>", self.on_enter)
+        self.visual_option_seven.bind("<Leave>", self.on_leave)
+        self.visual_option_eight = tk.Canvas(self.visualization_option_frame, width=450, height=100, bg='#9800FF',
+                                             highlightbackground="black")
+        self.visual_option_eight.grid(row=3, column=1, padx=5, pady=5)
+        self.visual_option_eight.create_text(225, 50, text="Artists", fill="white", font=("Chalkduster", 28))
+        self.visual_option_eight.bind("<Button-1>", self.artist_page)
+        self.visual_option_eight.bind("<Enter>", self.on_enter)
+        self.visual_option_eight.bind("<Leave>", self.on_leave)
+        self.visual_option_nine = tk.Canvas(self.visualization_option_frame, width=450, height=100, bg='#FF3C00',
+                                            highlightbackground="black")
+        self.visual_option_nine.grid(row=4, column=0, padx=5, pady=5)
+        self.visual_option_nine.create_text(225, 50, text="Line Plot", fill="white", font=("Chalkduster", 28))
+        self.visual_option_nine.bind("<Button-1>", self.line_plot_page)
+        self.visual_option_nine.bind("<Enter>", self.on_enter)
+        self.visual_option_nine.bind("<Leave>", self.on_leave)
+        self.visual_option_ten = tk.Canvas(self.visualization_option_frame, width=450, height=100, bg='#9800FF',
+                                           highlightbackground="black")
+        self.visual_option_ten.grid(row=4, column=1, padx=5, pady=5)
+        self.visual_option_ten.create_text(225, 50, text="Similar Songs", fill="white", font=("Chalkduster", 28))
+        self.visual_option_ten.bind("<Button-1>", self.similar_page)
+        self.visual_option_ten.bind("<Enter>", self.on_enter)
+        self.visual_option_ten.bind("<Leave>", self.on_leave)
+        self.visual_option_eleven = tk.Canvas(self.visualization_option_frame, width=450, height=100, bg='#FF3C00',
+                                              highlightbackground="black")
+        self.visual_option_eleven.grid(row=5, column=0, padx=5, pady=5)
+        self.visual_option_eleven.create_text(225, 50, text="Compare Snapshots", fill="white",
+                                              font=("Chalkduster", 28))
+        self.visual_option_eleven.bind("<Button-1>", self.compare_page)
+        self.visual_option_eleven.bind("<Enter>", self.on_enter)
+        self.visual_option_eleven.bind("<Leave>", self.on_leave)
 
     def histogram_page(self, event):
         """Histogram visualization page."""
-        self.destroy_widgets()
-        self.title("Histogram Visualization")
-        self.navigation_buttons(lambda: self.visualization_option_page(None))
-        self.visualization_hist = tk.Frame(self, bg="blue", width=1500, height=1000)
+        self.show_page("histogram", "Histogram Visualization", self.build_histogram_page)
+
+    def build_histogram_page(self, page):
+        """Build the histogram page."""
+        self.navigation_buttons(page, lambda: self.visualization_option_page(None))
+        self.visualization_hist = tk.Frame(page, bg="blue", width=1500, height=1000)
         self.visualization_hist.pack(fill="both", expand=True)
         self.attribute_label = tk.Label(self.visualization_hist, text="Select Attribute:", font="Chalkduster")
         self.attribute_label.pack(pady=10)
-        self.attribute_combobox = ttk.Combobox(self.visualization_hist, values=self.numerical_values, state="readonly")
-        self.attribute_combobox.pack(pady=5)
+        self.hist_attribute_combobox = ttk.Combobox(self.visualization_hist, values=self.numerical_values,
+                                                    state="readonly")
+        self.hist_attribute_combobox.pack(pady=5)
+        self.filter_controls(self.visualization_hist, "hist")
+        self.search_controls(self.visualization_hist, "hist")
         plot_button = tk.Button(self.visualization_hist, text="Plot", font="Chalkduster", command=self.plot_histogram)
         plot_button.pack(pady=5)
         clear_button = tk.Button(self.visualization_hist, text="Clear Selection", font="Chalkduster",
-                                 command=lambda: self.attribute_combobox.set(""))
+                                 command=lambda: self.hist_attribute_combobox.set(""))
         clear_button.pack(pady=5)
         delete_button = tk.Button(self.visualization_hist, text="Delete Plot", font="Chalkduster",
-                                  command=self.destroy_plot_frame)
+                                  command=lambda: self.destroy_plot_frame("hist_plot_frame"))
         delete_button.pack(pady=5)
 
     def plot_histogram(self):
         """Histogram plot command."""
-        self.destroy_plot_frame()
-        selected_attribute = self.attribute_combobox.get()
+        from graph import HistogramPlot
+        self.destroy_plot_frame("hist_plot_frame")
+        selected_attribute = self.hist_attribute_combobox.get()
         if selected_attribute:
-            histogram_strategy = HistogramPlot()
+            histogram_strategy = HistogramPlot(highlight=self.highlighted)
             self.hist_plot_frame = tk.Frame(self.visualization_hist, bg="white")
             self.hist_plot_frame.pack(fill="both", expand=True)
-            histogram_strategy.visualize(self.data, self.hist_plot_frame, selected_attribute)
+            data = self.plot_data("hist", self.hist_plot_frame)
+            if data is not None:
+                self.renderer.submit(histogram_strategy, data, self.hist_plot_frame, selected_attribute,
+                                     slot="hist_plot_frame")
 
     def density_plot_page(self, event):
         """Density plot visualization."""
-        self.destroy_widgets()
-        self.title("Density Plot Visualization")
-        self.navigation_buttons(lambda: self.visualization_option_page(None))
-        self.visualization_density = tk.Frame(self, bg="blue", width=1500, height=1000)
+        self.show_page("density", "Density Plot Visualization", self.build_density_plot_page)
+
+    def build_density_plot_page(self, page):
+        """Build the density plot page."""
+        self.navigation_buttons(page, lambda: self.visualization_option_page(None))
+        self.visualization_density = tk.Frame(page, bg="blue", width=1500, height=1000)
         self.visualization_density.pack(fill="both", expand=True)
         self.attribute_label = tk.Label(self.visualization_density, text="Select Attribute:", font="Chalkduster")
         self.attribute_label.pack(pady=10)
-        self.attribute_combobox = ttk.Combobox(self.visualization_density, values=self.numerical_values,
-                                               state="readonly")
-        self.attribute_combobox.pack(pady=5)
+        self.density_attribute_combobox = ttk.Combobox(self.visualization_density, values=self.numerical_values,
+                                                       state="readonly")
+        self.density_attribute_combobox.pack(pady=5)
+        self.filter_controls(self.visualization_density, "density")
         plot_button = tk.Button(self.visualization_density, text="Plot", font="Chalkduster",
                                 command=self.plot_density_plot)
         plot_button.pack(pady=5)
         clear_button = tk.Button(self.visualization_density, text="Clear Selection", font="Chalkduster",
-                                 command=lambda: self.attribute_combobox.set(""))
+                                 command=lambda: self.density_attribute_combobox.set(""))
         clear_button.pack(pady=5)
         delete_button = tk.Button(self.visualization_density, text="Delete Plot", font="Chalkduster",
-                                  command=self.destroy_plot_frame)
+                                  command=lambda: self.destroy_plot_frame("density_plot_frame"))
         delete_button.pack(pady=5)
 
     def plot_density_plot(self):
         """Density plot command."""
-        self.destroy_plot_frame()
-        selected_attribute = self.attribute_combobox.get()
+        from graph import DensityPlot
+        self.destroy_plot_frame("density_plot_frame")
+        selected_attribute = self.density_attribute_combobox.get()
         if selected_attribute:
             density_plot_strategy = DensityPlot()
             self.density_plot_frame = tk.Frame(self.visualization_density, bg="white")
             self.density_plot_frame.pack(fill="both", expand=True)
-            density_plot_strategy.visualize(self.data, self.density_plot_frame, selected_attribute)
+            data = self.plot_data("density", self.density_plot_frame)
+            if data is not None:
+                self.renderer.submit(density_plot_strategy, data, self.density_plot_frame, selected_attribute,
+                                     slot="density_plot_frame")
 
     def bar_chart_page(self, event):
         """Bar chart visualization page."""
-        self.destroy_widgets()
-        self.title("Bar Chart Visualization")
-        self.navigation_buttons(lambda: self.visualization_option_page(None))
-        self.visualization_bar = tk.Frame(self, bg="blue", width=1500, height=1000)
+        self.show_page("bar", "Bar Chart Visualization", self.build_bar_chart_page)
+
+    def build_bar_chart_page(self, page):
+        """Build the bar chart page."""
+        self.navigation_buttons(page, lambda: self.visualization_option_page(None))
+        self.visualization_bar = tk.Frame(page, bg="blue", width=1500, height=1000)
         self.visualization_bar.pack(fill="both", expand=True)
         self.attribute_label = tk.Label(self.visualization_bar, text="Select Attribute:", font="Chalkduster")
         self.attribute_label.pack(pady=10)
-        self.x_attribute_combobox = ttk.Combobox(self.visualization_bar, values=self.numerical_values,
-                                                 state="readonly")
-        self.x_attribute_combobox.pack(pady=5)
-        self.y_attribute_combobox = ttk.Combobox(self.visualization_bar, values=self.numerical_values,
-                                                 state="readonly")
-        self.y_attribute_combobox.pack(pady=5)
+        self.bar_x_attribute_combobox = ttk.Combobox(self.visualization_bar, values=self.numerical_values,
+                                                     state="readonly")
+        self.bar_x_attribute_combobox.pack(pady=5)
+        self.bar_y_attribute_combobox = ttk.Combobox(self.visualization_bar, values=self.numerical_values,
+                                                     state="readonly")
+        self.bar_y_attribute_combobox.pack(pady=5)
+        self.filter_controls(self.visualization_bar, "bar")
         plot_button = tk.Button(self.visualization_bar, text="Plot", font="Chalkduster",
                                 command=self.plot_bar_chart)
         plot_button.pack(pady=5)
         clear_button = tk.Button(self.visualization_bar, text="Clear Selection", font="Chalkduster",
-                                 command=lambda: self.clear_attribute_comboboxes(self.x_attribute_combobox,
-                                                                              self.y_attribute_combobox))
+                                 command=lambda: self.clear_attribute_comboboxes(self.bar_x_attribute_combobox,
+                                                                                 self.bar_y_attribute_combobox))
         clear_button.pack(pady=5)
         delete_button = tk.Button(self.visualization_bar, text="Delete Plot", font="Chalkduster",
-                                  command=self.destroy_plot_frame)
+                                  command=lambda: self.destroy_plot_frame("bar_frame"))
         delete_button.pack(pady=5)
 
     def plot_bar_chart(self):
         """Bar chart plot command."""
-        self.destroy_plot_frame()
-        x_selected_attribute = self.x_attribute_combobox.get()
-        y_selected_attribute = self.y_attribute_combobox.get()
+        from graph import BarPlot
+        self.destroy_plot_frame("bar_frame")
+        x_selected_attribute = self.bar_x_attribute_combobox.get()
+        y_selected_attribute = self.bar_y_attribute_combobox.get()
         if x_selected_attribute and y_selected_attribute:
             bar_plot_strategy = BarPlot()
             self.bar_frame = tk.Frame(self.visualization_bar, bg="white")
             self.bar_frame.pack(fill="both", expand=True)
-            bar_plot_strategy.visualize(self.data, self.bar_frame, x_selected_attribute, y_selected_attribute)
+            data = self.plot_data("bar", self.bar_frame)
+            if data is not None:
+                self.renderer.submit(bar_plot_strategy, data, self.bar_frame, x_selected_attribute,
+                                      y_selected_attribute, slot="bar_frame")
 
     def scatter_plot_page(self, event):
         """Scatter plot visualization page."""
-        self.destroy_widgets()
-        self.title("Scatter Plot Visualization")
-        self.navigation_buttons(lambda: self.visualization_option_page(None))
-        self.visualization_scatter_plot = tk.Frame(self, bg="blue", width=1500, height=1000)
+        self.show_page("scatter", "Scatter Plot Visualization", self.build_scatter_plot_page)
+
+    def build_scatter_plot_page(self, page):
+        """Build the scatter plot page."""
+        self.navigation_buttons(page, lambda: self.visualization_option_page(None))
+        self.visualization_scatter_plot = tk.Frame(page, bg="blue", width=1500, height=1000)
         self.visualization_scatter_plot.pack(fill="both", expand=True)
         self.x_attribute_label = tk.Label(self.visualization_scatter_plot, text="Select X Attribute:",
                                           font="Chalkduster")
         self.x_attribute_label.pack(pady=10)
-        self.x_attribute_combobox = ttk.Combobox(self.visualization_scatter_plot, values=self.numerical_values,
-                                                 state="readonly")
-        self.x_attribute_combobox.pack(pady=5)
+        self.scatter_x_attribute_combobox = ttk.Combobox(self.visualization_scatter_plot, values=self.numerical_values,
+                                                         state="readonly")
+        self.scatter_x_attribute_combobox.pack(pady=5)
         self.y_attribute_label = tk.Label(self.visualization_scatter_plot, text="Select Y Attribute:",
                                           font="Chalkduster")
         self.y_attribute_label.pack(pady=10)
-        self.y_attribute_combobox = ttk.Combobox(self.visualization_scatter_plot, values=self.numerical_values,
-                                                 state="readonly")
-        self.y_attribute_combobox.pack(pady=5)
+        self.scatter_y_attribute_combobox = ttk.Combobox(self.visualization_scatter_plot, values=self.numerical_values,
+                                                         state="readonly")
+        self.scatter_y_attribute_combobox.pack(pady=5)
+        self.filter_controls(self.visualization_scatter_plot, "scatter")
+        self.search_controls(self.visualization_scatter_plot, "scatter")
         plot_button = tk.Button(self.visualization_scatter_plot, text="Plot", font="Chalkduster",
                                 command=self.plot_scatter_plot)
         plot_button.pack(pady=5)
+        navigate_button = tk.Button(self.visualization_scatter_plot, text="Zoom and Pan", font="Chalkduster",
+                                    command=self.navigate_scatter_plot)
+        navigate_button.pack(pady=5)
         clear_button = tk.Button(self.visualization_scatter_plot, text="Clear Selection", font="Chalkduster",
-                                 command=lambda: self.clear_attribute_comboboxes(self.x_attribute_combobox,
-                                                                                  self.y_attribute_combobox))
+                                 command=lambda: self.clear_attribute_comboboxes(self.scatter_x_attribute_combobox,
+                                                                                 self.scatter_y_attribute_combobox))
         clear_button.pack(pady=5)
         delete_button = tk.Button(self.visualization_scatter_plot, text="Delete Plot", font="Chalkduster",
-                                  command=self.destroy_plot_frame)
+                                  command=lambda: self.destroy_plot_frame("scatter_plot_frame"))
         delete_button.pack(pady=5)
 
     def plot_scatter_plot(self):
         """Scatter plot command."""
-        self.destroy_plot_frame()
-        x_selected_attribute = self.x_attribute_combobox.get()
-        y_selected_attribute = self.y_attribute_combobox.get()
+        from graph import ScatterPlot
+        self.destroy_plot_frame("scatter_plot_frame")
+        x_selected_attribute = self.scatter_x_attribute_combobox.get()
+        y_selected_attribute = self.scatter_y_attribute_combobox.get()
         if x_selected_attribute and y_selected_attribute:
-            scatter_plot_strategy = ScatterPlot()
+            scatter_plot_strategy = ScatterPlot(highlight=self.highlighted)
             self.scatter_plot_frame = tk.Frame(self.visualization_scatter_plot, bg="white")
             self.scatter_plot_frame.pack(fill="both", expand=True)
-            scatter_plot_strategy.visualize(self.data, self.scatter_plot_frame, x_selected_attribute,
-                                            y_selected_attribute)
+            data = self.plot_data("scatter", self.scatter_plot_frame)
+            if data is not None:
+                self.renderer.submit(scatter_plot_strategy, data, self.scatter_plot_frame, x_selected_attribute,
+                                     y_selected_attribute, slot="scatter_plot_frame")
+
+    def navigate_scatter_plot(self):
+        """Zoom and pan command of the scatter page."""
+        x_selected_attribute = self.scatter_x_attribute_combobox.get()
+        y_selected_attribute = self.scatter_y_attribute_combobox.get()
+        if x_selected_attribute and y_selected_attribute:
+            self.navigate("scatter", x_selected_attribute, y_selected_attribute)
+
+    def navigate(self, name, x_attribute, y_attribute):
+        """Open a window that zooms and pans over an attribute pair of the page's data."""
+        from navigator import ScatterNavigator
+        window = ScatterNavigator(self, x_attribute, y_attribute)
+        data = self.plot_data(name, window) if name in self.filters else self.data
+        if data is not None:
+            window.index(self.renderer.executor, data)
+        return window
 
     def line_plot_page(self, event):
         """Line plot visualization page."""
-        self.destroy_widgets()
-        self.title("Line Plot Visualization")
-        self.navigation_buttons(lambda: self.visualization_option_page(None))
-        self.visualization_line_plot = tk.Frame(self, bg="blue", width=1500, height=1000)
+        self.show_page("line", "Line Plot Visualization", self.build_line_plot_page)
+
+    def build_line_plot_page(self, page):
+        """Build the line plot page."""
+        self.navigation_buttons(page, lambda: self.visualization_option_page(None))
+        self.visualization_line_plot = tk.Frame(page, bg="blue", width=1500, height=1000)
         self.visualization_line_plot.pack(fill="both", expand=True)
         self.x_attribute_label = tk.Label(self.visualization_line_plot, text="Select X Attribute:",
                                           font="Chalkduster")
         self.x_attribute_label.pack(pady=10)
-        self.x_attribute_combobox = ttk.Combobox(self.visualization_line_plot, values=self.numerical_values,
-                                                 state="readonly")
-        self.x_attribute_combobox.pack(pady=5)
+        self.line_x_attribute_combobox = ttk.Combobox(self.visualization_line_plot, values=self.numerical_values,
+                                                      state="readonly")
+        self.line_x_attribute_combobox.pack(pady=5)
         self.y_attribute_label = tk.Label(self.visualization_line_plot, text="Select Y Attribute:",
                                           font="Chalkduster")
         self.y_attribute_label.pack(pady=10)
-        self.y_attribute_combobox = ttk.Combobox(self.visualization_line_plot, values=self.numerical_values,
-                                                 state="readonly")
-        self.y_attribute_combobox.pack(pady=5)
+        self.line_y_attribute_combobox = ttk.Combobox(self.visualization_line_plot, values=self.numerical_values,
+                                                      state="readonly")
+        self.line_y_attribute_combobox.pack(pady=5)
+        # Applies when X is a release date field: the statistic per release period and the visible dates.
+        from timeseries import STATISTICS
+        timeline = tk.Frame(self.visualization_line_plot, bg="blue")
+        timeline.pack(pady=5)
+        tk.Label(timeline, text="Statistic", bg="blue", fg="white").grid(row=0, column=0, padx=3)
+        self.line_statistic_combobox = ttk.Combobox(timeline, values=list(STATISTICS), state="readonly", width=8)
+        self.line_statistic_combobox.set("mean")
+        self.line_statistic_combobox.grid(row=1, column=0, padx=3)
+        self.line_date_entries = []
+        for column, label in enumerate(("From (YYYY-MM-DD)", "To (YYYY-MM-DD)"), start=1):
+            tk.Label(timeline, text=label, bg="blue", fg="white").grid(row=0, column=column, padx=3)
+            entry = tk.Entry(timeline, width=12)
+            entry.grid(row=1, column=column, padx=3)
+            self.line_date_entries.append(entry)
+        self.filter_controls(self.visualization_line_plot, "line")
         plot_button = tk.Button(self.visualization_line_plot, text="Plot", font="Chalkduster",
                                 command=self.plot_line_plot)
         plot_button.pack(pady=5)
         clear_button = tk.Button(self.visualization_line_plot, text="Clear Selection", font="Chalkduster",
-                                 command=lambda: self.clear_attribute_comboboxes(self.x_attribute_combobox,
-                                                                                  self.y_attribute_combobox))
+                                 command=self.clear_line_plot_selection)
         clear_button.pack(pady=5)
         delete_button = tk.Button(self.visualization_line_plot, text="Delete Plot", font="Chalkduster",
-                                  command=self.destroy_plot_frame)
+                                  command=lambda: self.destroy_plot_frame("line_plot_frame"))
         delete_button.pack(pady=5)
 
     def plot_line_plot(self):
         """Line plot command."""
-        self.destroy_plot_frame()
-        x_selected_attribute = self.x_attribute_combobox.get()
-        y_selected_attribute = self.y_attribute_combobox.get()
+        from graph import LinePlot
+        self.destroy_plot_frame("line_plot_frame")
+        x_selected_attribute = self.line_x_attribute_combobox.get()
+        y_selected_attribute = self.line_y_attribute_combobox.get()
         if x_selected_attribute and y_selected_attribute:
-            line_plot_strategy = LinePlot()
             self.line_plot_frame = tk.Frame(self.visualization_line_plot, bg="white")
             self.line_plot_frame.pack(fill="both", expand=True)
-            line_plot_strategy.visualize(self.data, self.line_plot_frame, x_selected_attribute,
-                                         y_selected_attribute)
+            try:
+                start, end = (self.parse_date(entry.get()) for entry in self.line_date_entries)
+            except ValueError as error:
+                tk.Label(self.line_plot_frame, text=f"Could not read the dates: {error}", bg="white",
+                         fg="red").pack(pady=20)
+                return
+            line_plot_strategy = LinePlot(self.line_statistic_combobox.get() or "mean", start, end)
+            data = self.plot_data("line", self.line_plot_frame)
+            if data is not None:
+                self.renderer.submit(line_plot_strategy, data, self.line_plot_frame, x_selected_attribute,
+                                     y_selected_attribute, slot="line_plot_frame")
+
+    def clear_line_plot_selection(self):
+        """Reset the line plot attributes, statistic and dates."""
+        self.clear_attribute_comboboxes(self.line_x_attribute_combobox, self.line_y_attribute_combobox)
+        self.line_statistic_combobox.set("mean")
+        for entry in self.line_date_entries:
+            entry.delete(0, "end")
+
+    @staticmethod
+    def parse_date(text):
+        """Day given as YYYY-MM-DD (or YYYY-MM, YYYY), or None when left blank."""
+        import numpy as np
+        text = text.strip()
+        if not text:
+            return None
+        try:
+            return np.datetime64(text, "D")
+        except ValueError:
+            raise ValueError(f"'{text}' is not a date like 2023-07-14") from None
 
     def boxplot_page(self, event):
         """Boxplot visualization page."""
-        self.destroy_widgets()
-        self.title("Boxplot Visualization")
-        self.navigation_buttons(lambda: self.visualization_option_page(None))
-        self.visualization_box = tk.Frame(self, bg="blue", width=1500, height=1000)
+        self.show_page("boxplot", "Boxplot Visualization", self.build_boxplot_page)
+
+    def build_boxplot_page(self, page):
+        """Build the boxplot page."""
+        self.navigation_buttons(page, lambda: self.visualization_option_page(None))
+        self.visualization_box = tk.Frame(page, bg="blue", width=1500, height=1000)
         self.visualization_box.pack(fill="both", expand=True)
         self.attribute_label = tk.Label(self.visualization_box, text="Select Attribute:", font="Chalkduster")
         self.attribute_label.pack(pady=10)
-        self.attribute_combobox = ttk.Combobox(self.visualization_box, values=self.numerical_values, state="readonly")
-        self.attribute_combobox.pack(pady=5)
+        self.box_attribute_combobox = ttk.Combobox(self.visualization_box, values=self.numerical_values,
+                                                   state="readonly")
+        self.box_attribute_combobox.pack(pady=5)
+        self.filter_controls(self.visualization_box, "box")
+        self.search_controls(self.visualization_box, "box")
         plot_button = tk.Button(self.visualization_box, text="Plot", font="Chalkduster", command=self.plot_boxplot)
         plot_button.pack(pady=5)
         clear_button = tk.Button(self.visualization_box, text="Clear Selection", font="Chalkduster",
-                                 command=lambda: self.attribute_combobox.set(""))
+                                 command=lambda: self.box_attribute_combobox.set(""))
         clear_button.pack(pady=5)
         delete_button = tk.Button(self.visualization_box, text="Delete Plot", font="Chalkduster",
-                                  command=self.destroy_plot_frame)
+                                  command=lambda: self.destroy_plot_frame("boxplot_frame"))
         delete_button.pack(pady=5)
 
     def plot_boxplot(self):
         """Boxplot plot command."""
-        self.destroy_plot_frame()
-        selected_attribute = self.attribute_combobox.get()
+        from graph import BoxplotPlot
+        self.destroy_plot_frame("boxplot_frame")
+        selected_attribute = self.box_attribute_combobox.get()
         if selected_attribute:
-            boxplot_strategy = BoxplotPlot()
+            boxplot_strategy = BoxplotPlot(highlight=self.highlighted)
             self.boxplot_frame = tk.Frame(self.visualization_box, bg="white")
             self.boxplot_frame.pack(fill="both", expand=True)
-            boxplot_strategy.visualize(self.data, self.boxplot_frame, selected_attribute)
+            data = self.plot_data("box", self.boxplot_frame)
+            if data is not None:
+                self.renderer.submit(boxplot_strategy, data, self.boxplot_frame, selected_attribute,
+                                     slot="boxplot_frame")
+
+
+    def heatmap_page(self, event):
+        """Correlation heatmap visualization page."""
+        self.show_page("heatmap", "Correlation Heatmap", self.build_heatmap_page)
+
+    def build_heatmap_page(self, page):
+        """Build the correlation heatmap page."""
+        self.navigation_buttons(page, lambda: self.visualization_option_page(None))
+        self.visualization_heatmap = tk.Frame(page, bg="blue", width=1500, height=1000)
+        self.visualization_heatmap.pack(fill="both", expand=True)
+        self.method_label = tk.Label(self.visualization_heatmap, text="Select Method:", font="Chalkduster")
+        self.method_label.pack(pady=10)
+        self.heatmap_method_combobox = ttk.Combobox(self.visualization_heatmap, values=["pearson", "spearman"],
+                                                    state="readonly")
+        self.heatmap_method_combobox.set("pearson")
+        self.heatmap_method_combobox.pack(pady=5)
+        self.filter_controls(self.visualization_heatmap, "heatmap")
+        plot_button = tk.Button(self.visualization_heatmap, text="Plot", font="Chalkduster", command=self.plot_heatmap)
+        plot_button.pack(pady=5)
+        delete_button = tk.Button(self.visualization_heatmap, text="Delete Plot", font="Chalkduster",
+                                  command=lambda: self.destroy_plot_frame("heatmap_frame"))
+        delete_button.pack(pady=5)
 
+    def plot_heatmap(self):
+        """Correlation heatmap plot command."""
+        from graph import HeatmapPlot
+        self.destroy_plot_frame("heatmap_frame")
+        method = self.heatmap_method_combobox.get()
+        if method:
+            heatmap_strategy = HeatmapPlot()
+            self.heatmap_frame = tk.Frame(self.visualization_heatmap, bg="white")
+            self.heatmap_frame.pack(fill="both", expand=True)
+            data = self.plot_data("heatmap", self.heatmap_frame)
+            if data is not None:
+                self.renderer.submit(heatmap_strategy, data, self.heatmap_frame, method, slot="heatmap_frame")
 
-    def navigation_buttons(self, return_location):
+    def ranking_page(self, event):
+        """Cross-platform top tracks page."""
+        self.show_page("ranking", "Top Tracks", self.build_ranking_page)
+
+    def build_ranking_page(self, page):
+        """Build the top tracks page."""
+        from ranking import PLATFORM_METRICS
+        self.navigation_buttons(page, lambda: self.visualization_option_page(None))
+        self.visualization_ranking = tk.Frame(page, bg="blue", width=1500, height=1000)
+        self.visualization_ranking.pack(fill="both", expand=True)
+        self.weight_label = tk.Label(self.visualization_ranking, text="Platform Weights:", font="Chalkduster")
+        self.weight_label.pack(pady=10)
+        weight_frame = tk.Frame(self.visualization_ranking, bg="blue")
+        weight_frame.pack(pady=5)
+        self.ranking_weights = {}
+        for column, metric in enumerate(PLATFORM_METRICS):
+            tk.Label(weight_frame, text=metric, bg="blue", fg="white").grid(row=0, column=column, padx=3)
+            scale = tk.Scale(weight_frame, from_=0, to=5, resolution=0.5, orient="horizontal", length=110,
+                             bg="blue", fg="white", highlightthickness=0)
+            scale.set(1)
+            scale.grid(row=1, column=column, padx=3)
+            self.ranking_weights[metric] = scale
+        count_frame = tk.Frame(self.visualization_ranking, bg="blue")
+        count_frame.pack(pady=5)
+        tk.Label(count_frame, text="Tracks:", bg="blue", fg="white").pack(side="left", padx=3)
+        self.ranking_count = tk.Spinbox(count_frame, from_=10, to=1000, increment=10, width=6)
+        self.ranking_count.delete(0, "end")
+        self.ranking_count.insert(0, "100")
+        self.ranking_count.pack(side="left", padx=3)
+        self.filter_controls(self.visualization_ranking, "ranking")
+        rank_button = tk.Button(self.visualization_ranking, text="Rank", font="Chalkduster", command=self.plot_ranking)
+        rank_button.pack(pady=5)
+        delete_button = tk.Button(self.visualization_ranking, text="Delete Ranking", font="Chalkduster",
+                                  command=lambda: self.destroy_plot_frame("ranking_frame"))
+        delete_button.pack(pady=5)
+
+    def plot_ranking(self):
+        """Top tracks command."""
+        from ranking import RANKINGS
+        self.destroy_plot_frame("ranking_frame")
+        self.ranking_frame = tk.Frame(self.visualization_ranking, bg="white")
+        self.ranking_frame.pack(fill="both", expand=True)
+        try:
+            count = int(self.ranking_count.get())
+        except ValueError:
+            tk.Label(self.ranking_frame, text=f"Tracks must be a number, not '{self.ranking_count.get()}'",
+                     bg="white", fg="red").pack(pady=20)
+            return
+        data = self.plot_data("ranking", self.ranking_frame)
+        if data is None:
+            return
+        weights = {metric: scale.get() for metric, scale in self.ranking_weights.items()}
+        progress = ttk.Progressbar(self.ranking_frame, mode="indeterminate", length=300)
+        progress.pack(pady=20)
+        progress.start(10)
+        future = self.renderer.executor.submit(RANKINGS.top, data, count, weights)
+        self.when_done(future, self.ranking_frame, lambda future: self.show_ranking(future, progress))
+
+    def show_ranking(self, future, progress):
+        """Fill the ranking frame with the top tracks table a worker ranked."""
+        progress.destroy()
+        try:
+            table = future.result()
+        except (TypeError, ValueError) as error:
+            tk.Label(self.ranking_frame, text=f"Could not rank the tracks: {error}", bg="white",
+                     fg="red").pack(pady=20)
+            return
+        columns = {"rank": 60, "trackname": 320, "artistsname": 240, "score": 90, "streams": 140}
+        tree = ttk.Treeview(self.ranking_frame, columns=list(columns), show="headings", height=20)
+        for column, width in columns.items():
+            tree.heading(column, text=column)
+            tree.column(column, width=width, anchor="w" if column in ("trackname", "artistsname") else "e")
+        for row in table.itertuples(index=False):
+            tree.insert("", "end", values=(row.rank, row.trackname, row.artistsname, f"{row.score:.3f}",
+                                           f"{row.streams:,.0f}"))
+        scrollbar = ttk.Scrollbar(self.ranking_frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        tree.pack(fill="both", expand=True)
+
+    def artist_page(self, event):
+        """Artist comparison page."""
+        self.show_page("artists", "Artist Comparison", self.build_artist_page)
+
+    def build_artist_page(self, page):
+        """Build the artist comparison page."""
+        self.navigation_buttons(page, lambda: self.visualization_option_page(None))
+        self.visualization_artists = tk.Frame(page, bg="blue", width=1500, height=1000)
+        self.visualization_artists.pack(fill="both", expand=True)
+        self.artist_label = tk.Label(self.visualization_artists, text="Select Artists (none for the top 5):",
+                                     font="Chalkduster")
+        self.artist_label.pack(pady=10)
+        self.artist_search = tk.Entry(self.visualization_artists, width=40)
+        self.artist_search.pack(pady=5)
+        self.artist_search.bind("<KeyRelease>", lambda event: self.search_artists())
+        self.artist_listbox = tk.Listbox(self.visualization_artists, selectmode="multiple", width=40, height=8,
+                                         exportselection=False)
+        self.artist_listbox.pack(pady=5)
+        self.artist_metric_combobox = ttk.Combobox(self.visualization_artists, values=["streams", "tracks"],
+                                                   state="readonly")
+        self.artist_metric_combobox.set("streams")
+        self.artist_metric_combobox.pack(pady=5)
+        self.filter_controls(self.visualization_artists, "artists")
+        plot_button = tk.Button(self.visualization_artists, text="Compare", font="Chalkduster",
+                                command=self.plot_artists)
+        plot_button.pack(pady=5)
+        clear_button = tk.Button(self.visualization_artists, text="Clear Selection", font="Chalkduster",
+                                 command=lambda: self.artist_listbox.selection_clear(0, "end"))
+        clear_button.pack(pady=5)
+        delete_button = tk.Button(self.visualization_artists, text="Delete Plot", font="Chalkduster",
+                                  command=lambda: self.destroy_plot_frame("artist_frame"))
+        delete_button.pack(pady=5)
+        self.search_artists()
+
+    def search_artists(self, limit=200):
+        """Rank the artists on a worker thread, then list the leading ones whose name contains the search text."""
+        if not self.data_future.done():
+            self.artist_listbox.delete(0, "end")
+            self.artist_listbox.insert("end", "Loading...")
+            # Disabled, so the placeholder cannot be selected as an artist.
+            self.artist_listbox.configure(state="disabled")
+            self.after(SEARCH_RETRY, lambda: self.artist_listbox.winfo_exists() and self.search_artists(limit))
+            return
+        future = self.artist_future = self.renderer.executor.submit(self.artist_leaders, self.data)
+        self.when_done(future, self.artist_listbox,
+                       lambda future: future is self.artist_future and self.list_artists(future.result(), limit))
+
+    @staticmethod
+    def artist_leaders(data):
+        """Artist names of a frame, most streamed first."""
+        from artists import ARTISTS
+        try:
+            return ARTISTS.leaders(data)
+        except TypeError:
+            # A streamed dataset keeps no rows to index artists by.
+            return []
+
+    def list_artists(self, leaders, limit=200):
+        """Fill the artist list with the leading artists whose name contains the search text.
+
+        Selected artists stay listed, so narrowing the search never drops them.
+        """
+        self.artist_listbox.configure(state="normal")
+        text = self.artist_search.get().strip().casefold()
+        selected = [self.artist_listbox.get(position) for position in self.artist_listbox.curselection()]
+        matches = [name for name in leaders if text in name.casefold() and name not in selected][:limit]
+        self.artist_listbox.delete(0, "end")
+        for name in selected + matches:
+            self.artist_listbox.insert("end", name)
+        if selected:
+            self.artist_listbox.selection_set(0, len(selected) - 1)
+
+    def plot_artists(self):
+        """Artist comparison command."""
+        from graph import ArtistComparisonPlot
+        self.destroy_plot_frame("artist_frame")
+        artists = tuple(self.artist_listbox.get(position) for position in self.artist_listbox.curselection())
+        self.artist_frame = tk.Frame(self.visualization_artists, bg="white")
+        self.artist_frame.pack(fill="both", expand=True)
+        data = self.plot_data("artists", self.artist_frame)
+        if data is not None:
+            self.renderer.submit(ArtistComparisonPlot(), data, self.artist_frame, self.artist_metric_combobox.get(),
+                                 artists or None, slot="artist_frame")
+
+    def similar_page(self, event):
+        """Similar songs page."""
+        self.show_page("similar", "Similar Songs", self.build_similar_page)
+
+    def build_similar_page(self, page):
+        """Build the similar songs page."""
+        self.navigation_buttons(page, lambda: self.visualization_option_page(None))
+        self.visualization_similar = tk.Frame(page, bg="blue", width=1500, height=1000)
+        self.visualization_similar.pack(fill="both", expand=True)
+        self.similar_label = tk.Label(self.visualization_similar, text="Find a Track (none for the most streamed):",
+                                      font="Chalkduster")
+        self.similar_label.pack(pady=10)
+        self.similar_search = tk.Entry(self.visualization_similar, width=40)
+        self.similar_search.pack(pady=5)
+        self.similar_search.bind("<KeyRelease>", lambda event: self.search_similar())
+        self.similar_listbox = tk.Listbox(self.visualization_similar, width=60, height=5, exportselection=False)
+        self.similar_listbox.pack(pady=5)
+        self.similar_listbox.bind("<<ListboxSelect>>", lambda event: self.pick_similar())
+        count_frame = tk.Frame(self.visualization_similar, bg="blue")
+        count_frame.pack(pady=5)
+        tk.Label(count_frame, text="Similar tracks:", bg="blue", fg="white").pack(side="left", padx=3)
+        self.similar_count = tk.Spinbox(count_frame, from_=1, to=50, width=6)
+        self.similar_count.delete(0, "end")
+        self.similar_count.insert(0, "10")
+        self.similar_count.pack(side="left", padx=3)
+        self.filter_controls(self.visualization_similar, "similar")
+        plot_button = tk.Button(self.visualization_similar, text="Find Similar", font="Chalkduster",
+                                command=self.plot_similar)
+        plot_button.pack(pady=5)
+        delete_button = tk.Button(self.visualization_similar, text="Delete Plot", font="Chalkduster",
+                                  command=lambda: self.destroy_plot_frame("similar_frame"))
+        delete_button.pack(pady=5)
+
+    def search_similar(self):
+        """Fill the similar songs match list with the tracks best matching the search text."""
+        from search import SEARCH
+        if not self.search_future.done():
+            self.similar_listbox.delete(0, "end")
+            self.similar_listbox.insert("end", "Indexing...")
+            self.after(SEARCH_RETRY, lambda: self.similar_search.winfo_exists() and self.search_similar())
+            return
+        text = self.similar_search.get()
+        try:
+            found = SEARCH.search(self.data, text) if text.strip() else []
+        except TypeError:
+            # A streamed dataset keeps no rows to search.
+            found = []
+        self.similar_matches = [match for match in found if match["kind"] == "track"]
+        self.similar_listbox.delete(0, "end")
+        for match in self.similar_matches:
+            self.similar_listbox.insert("end", match["name"])
+
+    def pick_similar(self):
+        """Compare the picked track with the tracks most similar to it."""
+        picked = self.similar_listbox.curselection()
+        if picked and picked[0] < len(self.similar_matches):
+            self.similar_track = self.similar_matches[picked[0]]["rows"][0]
+            self.plot_similar()
+
+    def plot_similar(self):
+        """Similar songs command."""
+        from graph import SimilarSongsPlot
+        self.destroy_plot_frame("similar_frame")
+        self.similar_frame = tk.Frame(self.visualization_similar, bg="white")
+        self.similar_frame.pack(fill="both", expand=True)
+        try:
+            count = int(self.similar_count.get())
+        except ValueError:
+            tk.Label(self.similar_frame, text=f"Similar tracks must be a number, not '{self.similar_count.get()}'",
+                     bg="white", fg="red").pack(pady=20)
+            return
+        data = self.plot_data("similar", self.similar_frame)
+        if data is not None:
+            self.renderer.submit(SimilarSongsPlot(count), data, self.similar_frame, "streams", self.similar_track,
+                                 slot="similar_frame")
+
+    def compare_page(self, event):
+        """Snapshot comparison page."""
+        self.show_page("compare", "Compare Snapshots", self.build_compare_page)
+
+    def build_compare_page(self, page):
+        """Build the snapshot comparison page."""
+        from graph import COMPARISONS, LAYOUTS
+        self.navigation_buttons(page, lambda: self.visualization_option_page(None))
+        self.visualization_compare = tk.Frame(page, bg="blue", width=1500, height=1000)
+        self.visualization_compare.pack(fill="both", expand=True)
+        self.snapshot_label = tk.Label(self.visualization_compare, text="Select Snapshots:", font="Chalkduster")
+        self.snapshot_label.pack(pady=10)
+        self.snapshot_listbox = tk.Listbox(self.visualization_compare, selectmode="multiple", width=40, height=5,
+                                           exportselection=False)
+        self.snapshot_listbox.pack(pady=5)
+        add_button = tk.Button(self.visualization_compare, text="Add Snapshot...", font="Chalkduster",
+                               command=self.add_snapshot)
+        add_button.pack(pady=5)
+        self.snapshot_status = tk.Label(self.visualization_compare, text="", bg="blue", fg="white")
+        self.snapshot_status.pack()
+        self.compare_chart_combobox = ttk.Combobox(self.visualization_compare, values=list(COMPARISONS),
+                                                   state="readonly")
+        self.compare_chart_combobox.set("histogram")
+        self.compare_chart_combobox.pack(pady=5)
+        self.compare_layout_combobox = ttk.Combobox(self.visualization_compare, values=list(LAYOUTS),
+                                                    state="readonly")
+        self.compare_layout_combobox.set("overlay")
+        self.compare_layout_combobox.pack(pady=5)
+        self.compare_attribute_combobox = ttk.Combobox(self.visualization_compare, values=self.numerical_values,
+                                                       state="readonly")
+        self.compare_attribute_combobox.pack(pady=5)
+        self.filter_controls(self.visualization_compare, "compare")
+        plot_button = tk.Button(self.visualization_compare, text="Compare", font="Chalkduster",
+                                command=self.plot_compare)
+        plot_button.pack(pady=5)
+        delete_button = tk.Button(self.visualization_compare, text="Delete Plot", font="Chalkduster",
+                                  command=lambda: self.destroy_plot_frame("compare_frame"))
+        delete_button.pack(pady=5)
+        self.list_snapshots()
+
+    def list_snapshots(self, select=()):
+        """Fill the snapshot list with the loaded dataset and the catalog's snapshots, keeping the selection."""
+        from catalog import CATALOG
+        selected = {self.snapshot_listbox.get(position) for position in self.snapshot_listbox.curselection()}
+        selected = selected | set(select) or {LOADED_SNAPSHOT}
+        self.snapshot_listbox.delete(0, "end")
+        for position, name in enumerate([LOADED_SNAPSHOT] + CATALOG.names()):
+            self.snapshot_listbox.insert("end", name)
+            if name in selected:
+                self.snapshot_listbox.selection_set(position)
+
+    def add_snapshot(self):
+        """Add a chart snapshot CSV to the catalog and load it in the background."""
+        from tkinter import filedialog
+        from catalog import CATALOG
+        path = filedialog.askopenfilename(parent=self, title="Add a chart snapshot",
+                                          filetypes=[("CSV files", "*.csv"), ("All files", "*")])
+        if not path:
+            return
+        try:
+            name = CATALOG.add(path)
+        except OSError as error:
+            self.snapshot_status.configure(text=f"Could not add the snapshot: {error}", fg="red")
+            return
+        self.snapshot_status.configure(text=f"Added {name}", fg="white")
+        self.loader.submit(CATALOG.frame, name)
+        self.list_snapshots(select=[name])
+
+    def plot_compare(self):
+        """Snapshot comparison command."""
+        from graph import COMPARISONS
+        self.destroy_plot_frame("compare_frame")
+        attribute = self.compare_attribute_combobox.get()
+        if not attribute:
+            return
+        self.compare_frame = tk.Frame(self.visualization_compare, bg="white")
+        self.compare_frame.pack(fill="both", expand=True)
+        names = [self.snapshot_listbox.get(position) for position in self.snapshot_listbox.curselection()]
+        try:
+            conditions = self.filter_conditions("compare")
+        except ValueError as error:
+            tk.Label(self.compare_frame, text=f"Could not filter the data: {error}", bg="white",
+                     fg="red").pack(pady=20)
+            return
+        strategy = COMPARISONS[self.compare_chart_combobox.get()](self.compare_layout_combobox.get())
+        progress = ttk.Progressbar(self.compare_frame, mode="indeterminate", length=300)
+        progress.pack(pady=20)
+        progress.start(10)
+        # A snapshot not loaded yet is parsed from its CSV, so the loads run on a worker as well.
+        future = self.renderer.executor.submit(self.load_snapshots, names or [LOADED_SNAPSHOT], conditions)
+        self.when_done(future, self.compare_frame,
+                       lambda future: self.show_compare(future, progress, strategy, attribute))
+
+    def load_snapshots(self, names, conditions):
+        """Frames of the named snapshots narrowed by the filter conditions, as name -> frame."""
+        from catalog import CATALOG
+        from query import QUERIES
+        snapshots = {}
+        for name in names:
+            data = self.data if name == LOADED_SNAPSHOT else CATALOG.frame(name)
+            snapshots[name] = QUERIES.filter(data, conditions)
+        return snapshots
+
+    def show_compare(self, future, progress, strategy, attribute):
+        """Render the comparison of the snapshots a worker loaded."""
+        progress.destroy()
+        try:
+            snapshots = future.result()
+        except (OSError, KeyError, TypeError, ValueError) as error:
+            tk.Label(self.compare_frame, text=f"Could not load the snapshots: {error}", bg="white",
+                     fg="red").pack(pady=20)
+            return
+        self.renderer.submit(strategy, snapshots, self.compare_frame, attribute, slot="compare_frame")
+
+    def when_done(self, future, widget, callback):
+        """Call back with a worker's future on the Tk thread once it is done, unless the widget is gone by then."""
+        if not widget.winfo_exists():
+            future.cancel()
+        elif not future.done():
+            self.after(TASK_POLL, self.when_done, future, widget, callback)
+        else:
+            callback(future)
+
+    def navigation_buttons(self, page, return_location):
         """Navigation bar for re-directing."""
 
         def return_button_clicked(event):
             return_location()
 
-        button_frame = tk.Frame(self, bg="black", width=1500, height=200)
+        button_frame = tk.Frame(page, bg="black", width=1500, height=200)
         button_frame.pack(side="top", fill="x")
         return_button_canvas = tk.Canvas(button_frame, width=100, height=50, bg="#FCD12A", highlightbackground="black")
         return_button_canvas.pack(side="left", padx=10, pady=10)
@@ -431,6 +1183,18 @@ class AppUI(tk.Tk):
             self.visual_option_four.config(bg="#D400FF", relief="solid")
         if event.widget == self.visual_option_five:
             self.visual_option_five.config(bg="#D400FF", relief="solid")
+        if event.widget == self.visual_option_six:
+            self.visual_option_six.config(bg="#D400FF", relief="solid")
+        if event.widget == self.visual_option_seven:
+            self.visual_option_seven.config(bg="#FF7600", relief="solid")
+        if event.widget == self.visual_option_eight:
+            self.visual_option_eight.config(bg="#D400FF", relief="solid")
+        if event.widget == self.visual_option_nine:
+            self.visual_option_nine.config(bg="#FF7600", relief="solid")
+        if event.widget == self.visual_option_ten:
+            self.visual_option_ten.config(bg="#D400FF", relief="solid")
+        if event.widget == self.visual_option_eleven:
+            self.visual_option_eleven.config(bg="#FF7600", relief="solid")
 
     def on_leave(self, event):
         """Cursor go off the area."""
@@ -452,32 +1216,200 @@ class AppUI(tk.Tk):
             self.visual_option_four.config(bg="#9800FF", relief="flat")
         if event.widget == self.visual_option_five:
             self.visual_option_five.config(bg="#9800FF", relief="flat")
+        if event.widget == self.visual_option_six:
+            self.visual_option_six.config(bg="#9800FF", relief="flat")
+        if event.widget == self.visual_option_seven:
+            self.visual_option_seven.config(bg="#FF3C00", relief="flat")
+        if event.widget == self.visual_option_eight:
+            self.visual_option_eight.config(bg="#9800FF", relief="flat")
+        if event.widget == self.visual_option_nine:
+            self.visual_option_nine.config(bg="#FF3C00", relief="flat")
+        if event.widget == self.visual_option_ten:
+            self.visual_option_ten.config(bg="#9800FF", relief="flat")
+        if event.widget == self.visual_option_eleven:
+            self.visual_option_eleven.config(bg="#FF3C00", relief="flat")
+
+    def filter_controls(self, parent, name):
+        """Filter bar restricting the plot of a page to a subset of the songs."""
+        frame = tk.Frame(parent, bg="blue")
+        frame.pack(pady=5)
+        widgets = []
+        for column, (label, attribute, role) in enumerate(FILTER_FIELDS):
+            tk.Label(frame, text=label, bg="blue", fg="white").grid(row=0, column=column, padx=3)
+            if role == "choice":
+                widget = ttk.Combobox(frame, width=14, state="readonly")
+                widget.configure(postcommand=lambda widget=widget, attribute=attribute:
+                                 widget.configure(values=self.filter_choices(attribute)))
+            else:
+                widget = tk.Entry(frame, width=12)
+            widget.grid(row=1, column=column, padx=3)
+            widgets.append(widget)
+        clear_button = tk.Button(frame, text="Clear Filters", command=lambda: self.clear_filters(name))
+        clear_button.grid(row=1, column=len(FILTER_FIELDS), padx=3)
+        self.filters[name] = widgets
+
+    def search_controls(self, parent, name):
+        """Search bar listing the tracks and artists matching what is typed; picked ones are marked on the plot."""
+        frame = tk.Frame(parent, bg="blue")
+        frame.pack(pady=5)
+        tk.Label(frame, text="Find tracks or artists:", bg="blue", fg="white").grid(row=0, column=0, padx=3)
+        entry = tk.Entry(frame, width=40)
+        entry.grid(row=0, column=1, padx=3)
+        clear_button = tk.Button(frame, text="Clear Highlight", command=lambda: self.set_highlight([], name))
+        clear_button.grid(row=0, column=2, padx=3)
+        listbox = tk.Listbox(frame, selectmode="multiple", width=60, height=4, exportselection=False)
+        listbox.grid(row=1, column=0, columnspan=3, pady=3)
+        entry.bind("<KeyRelease>", lambda event: self.search_tracks(name))
+        listbox.bind("<<ListboxSelect>>", lambda event: self.pick_matches(name))
+        self.searches[name] = (entry, listbox, [])
+
+    def search_tracks(self, name):
+        """Fill a page's match list with the best matches of its search text, typos allowed."""
+        from search import SEARCH
+        entry, listbox, matches = self.searches[name]
+        if not self.search_future.done():
+            listbox.delete(0, "end")
+            listbox.insert("end", "Indexing...")
+            # Retried until the index is built; later retries see the text typed meanwhile.
+            self.after(SEARCH_RETRY, lambda: entry.winfo_exists() and self.search_tracks(name))
+            return
+        text = entry.get()
+        try:
+            found = SEARCH.search(self.data, text) if text.strip() else []
+        except TypeError:
+            # A streamed dataset keeps no rows to search.
+            found = []
+        matches[:] = found
+        listbox.delete(0, "end")
+        for match in found:
+            listbox.insert("end", f"{match['kind'].capitalize()}: {match['name']}")
+
+    def pick_matches(self, name):
+        """Mark the tracks of the picked matches on the page's plot."""
+        entry, listbox, matches = self.searches[name]
+        picked = [matches[position] for position in listbox.curselection() if position < len(matches)]
+        labels = list(dict.fromkeys(label for match in picked for label in match["rows"]))
+        self.set_highlight(labels, name)
 
-    def destroy_widgets(self):
-        """Clear entire widgets."""
-        for widget in self.winfo_children():
-            widget.destroy()
-
-    def destroy_plot_frame(self):
-        """Clear frame."""
-        if hasattr(self, 'hist_plot_frame'):
-            self.hist_plot_frame.destroy()
-        if hasattr(self, 'density_plot_frame'):
-            self.density_plot_frame.destroy()
-        if hasattr(self, 'scatter_plot_frame'):
-            self.scatter_plot_frame.destroy()
-        if hasattr(self, 'bar_frame'):
-            self.bar_frame.destroy()
-        if hasattr(self, 'boxplot_frame'):
-            self.boxplot_frame.destroy()
+    def set_highlight(self, labels, name):
+        """Replace the marked tracks and redraw the page's plot; other pages mark them when next shown."""
+        if not labels:
+            self.searches[name][1].selection_clear(0, "end")
+        self.highlighted = labels
+        self.stale_pages |= {page for search, page in SEARCH_PAGES.items() if search != name}
+        self.redraw(SEARCH_PAGES[name])
+
+    def filter_choices(self, attribute):
+        """Values offered by a filter combobox, led by an empty entry for no restriction.
+
+        Credit columns offer the individual artists they credit rather than the credit strings.
+        """
+        from query import QUERIES
+        from artists import ARTISTS
+        try:
+            if attribute in QUERIES.credit_columns:
+                return [""] + sorted(ARTISTS.index(self.data).ids)
+            return [""] + [str(value) for value in self.data[attribute].cat.categories]
+        except TypeError:
+            # A streamed dataset keeps no rows to filter.
+            return [""]
+
+    def filter_conditions(self, name):
+        """Conditions entered in a page's filter bar, in the form QueryEngine.filter takes."""
+        conditions = {}
+        for (label, attribute, role), widget in zip(FILTER_FIELDS, self.filters[name]):
+            text = widget.get().strip()
+            if not text:
+                continue
+            if role == "choice":
+                conditions[attribute] = [text]
+                continue
+            try:
+                value = float(text.replace(",", ""))
+            except ValueError:
+                raise ValueError(f"{label} must be a number, not '{text}'") from None
+            low, high = conditions.get(attribute, (None, None))
+            conditions[attribute] = (value, high) if role == "low" else (low, value)
+        return conditions
+
+    def clear_filters(self, name):
+        """Clear a page's filter bar."""
+        for widget in self.filters[name]:
+            if isinstance(widget, ttk.Combobox):
+                widget.set("")
+            else:
+                widget.delete(0, "end")
+
+    def plot_data(self, name, frame):
+        """Dataset narrowed by the page's filters, or None after showing why it cannot be."""
+        from query import QUERIES
+        try:
+            return QUERIES.filter(self.data, self.filter_conditions(name))
+        except (TypeError, ValueError) as error:
+            tk.Label(frame, text=f"Could not filter the data: {error}", bg="white", fg="red").pack(pady=20)
+            return None
+
+    def destroy_plot_frame(self, name):
+        """Clear one page's plot frame; the plots of other pages stay as they are."""
+        if self._renderer is not None:
+            self._renderer.cancel(name)
+        if hasattr(self, name):
+            getattr(self, name).destroy()
 
     def clear_attribute_comboboxes(self, *comboboxes):
         """Clear selection in multiple comboboxes."""
         for combobox in comboboxes:
             combobox.set("")
 
+    def toggle_profiling(self, event=None):
+        """Turn span recording and the timing overlay on or off."""
+        PROFILER.enable(not PROFILER.enabled)
+        if PROFILER.enabled:
+            self.show_overlay()
+        elif self.overlay is not None:
+            self.overlay.destroy()
+            self.overlay = None
+
+    def show_overlay(self):
+        """Show the latest phase timings in the top right corner while profiling is on."""
+        if self.overlay is None:
+            self.overlay = tk.Label(self, font=("Courier", 10), justify="left", bg="black", fg="#1DB954")
+            self.overlay.place(relx=1.0, y=0, anchor="ne")
+            self.refresh_overlay(self.overlay)
+
+    def refresh_overlay(self, overlay):
+        """Redraw the overlay every half second until it is hidden."""
+        if overlay is not self.overlay:
+            return
+        overlay.configure(text=PROFILER.overlay_text())
+        # Pages packed after the overlay was placed would otherwise cover it.
+        overlay.lift()
+        self.after(500, self.refresh_overlay, overlay)
+
+    def save_trace(self, event=None):
+        """Write the spans recorded so far as a Chrome trace-event file; returns its path, or None on failure.
+
+        Saving from the key binding reports the path in a message box; a failure is reported either way.
+        """
+        from tkinter import messagebox
+        path = self.trace_path or time.strftime("profile-%Y%m%d-%H%M%S.trace.json")
+        try:
+            PROFILER.write_trace(path)
+        except OSError as error:
+            messagebox.showerror("Profile trace", f"Could not write {path}: {error}", parent=self)
+            return None
+        if event is not None:
+            messagebox.showinfo("Profile trace", f"Wrote {path}", parent=self)
+        return path
+
     def on_destroy_window(self, event):
         """Exit."""
+        if self.trace_path is not None:
+            # A trace that cannot be written is reported by save_trace, and the app still shuts down.
+            self.save_trace()
+        if self._renderer is not None:
+            self._renderer.shutdown()
+        self.loader.shutdown(wait=False, cancel_futures=True)
         self.destroy()
 
     def run(self):
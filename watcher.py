@@ -0,0 +1,178 @@
+import io
+import os
+import numpy as np
+import pandas as pd
+from dataset import DATA_FILE, load_dataset, read_csv
+from profiling import PROFILER
+from stats import extend_version
+
+
+# Bytes at each end of the part of the file already read that are compared on every check; if
+# either changed, the file was rewritten rather than appended to and is read again in full.
+ANCHOR_BYTES = 4096
+# Spare capacity added when a column grows, as a fraction of its rows, so appends amortize to
+# O(appended rows) without doubling the memory of a large dataset.
+GROWTH = 0.25
+MIN_SPARE_ROWS = 1024
+
+
+class GrowableColumn:
+    """One column in an array with spare capacity at the end.
+
+    Frames see views of the filled part.  Appends write past it, so they never touch a row a
+    view can see; growing, or widening the dtype for values that do not fit, copies into a
+    new array and leaves the old views as they were.  The initial values, such as a memory-mapped
+    column of the binary cache, are only read: they have no spare capacity, so the first append
+    copies them.
+    """
+
+    def __init__(self, values):
+        """Growable column constructor."""
+        self.array = values
+        self.size = len(values)
+
+    def view(self):
+        """The filled part of the column."""
+        return self.array[:self.size]
+
+    def append(self, values):
+        """Add values at the end."""
+        size = self.size + len(values)
+        dtype = np.promote_types(self.array.dtype, values.dtype)
+        if size > len(self.array) or dtype != self.array.dtype:
+            capacity = max(size + MIN_SPARE_ROWS, int(size * (1 + GROWTH))) if size > len(self.array) \
+                else len(self.array)
+            grown = np.empty(capacity, dtype=dtype)
+            grown[:self.size] = self.array[:self.size]
+            self.array = grown
+        self.array[self.size:size] = values
+        self.size = size
+
+
+class GrowableCategorical:
+    """Codes of a dictionary encoded column in a growable array, with categories added as they appear.
+
+    New categories go after the existing ones, so codes already written stay valid.  The
+    categorical dtype is rebuilt only when an append brings new categories.
+    """
+
+    def __init__(self, values):
+        """Growable categorical constructor."""
+        self.dtype = values.dtype
+        self.positions = {category: code for code, category in enumerate(values.categories)}
+        self.codes = GrowableColumn(values.codes)
+
+    def view(self):
+        """The filled part of the column as a categorical."""
+        return pd.Categorical.from_codes(self.codes.view(), dtype=self.dtype, validate=False)
+
+    def append(self, values):
+        """Add the values of a categorical at the end."""
+        # The last entry maps the missing code -1 to itself.
+        remap = np.full(len(values.categories) + 1, -1, dtype=np.int64)
+        added = []
+        for position, category in enumerate(values.categories):
+            code = self.positions.get(category)
+            if code is None:
+                code = self.positions[category] = len(self.positions)
+                added.append(category)
+            remap[position] = code
+        if added:
+            categories = self.dtype.categories
+            self.dtype = pd.CategoricalDtype(categories.append(pd.Index(added, dtype=categories.dtype)))
+        codes = remap[values.codes]
+        self.codes.append(codes.astype(np.min_scalar_type(-len(self.positions) - 1), copy=False))
+
+
+def _growable(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return GrowableCategorical(series.array)
+    return GrowableColumn(series.to_numpy())
+
+
+class LiveDataset:
+    """A dataset read into memory that follows rows appended to its CSV.
+
+    A check compares the file's size and modification time with the part already read,
+    parses only the bytes appended since, extends the columns in place and hands the cached
+    results of the previous frame to the new one, so its cost follows the number of appended
+    rows.  A file that shrank or changed inside the part already read is read again in full.
+    """
+
+    def __init__(self, path=DATA_FILE):
+        """Live dataset constructor."""
+        self.path = path
+        self.reload()
+
+    def reload(self):
+        """Read the whole file again, once it holds still for the length of a load."""
+        while True:
+            before = os.stat(self.path)
+            frame = load_dataset(self.path)
+            after = os.stat(self.path)
+            if (before.st_size, before.st_mtime_ns) == (after.st_size, after.st_mtime_ns):
+                break
+        self.names = list(frame.columns)
+        self.columns = {name: _growable(frame[name]) for name in self.names}
+        self.offset = after.st_size
+        self.mtime_ns = after.st_mtime_ns
+        self.anchors = self._anchors()
+        # Size of the file when an unterminated last line was left for the next check.
+        self.pending = None
+        self.frame = self._frame()
+        return self.frame
+
+    def poll(self):
+        """Fold rows appended to the file since the last check into the frame; returns how many rows changed."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return 0
+        if stat.st_size == self.offset and stat.st_mtime_ns == self.mtime_ns:
+            return 0
+        if stat.st_size < self.offset or self._anchors() != self.anchors:
+            return len(self.reload())
+        tail = self._read(self.offset, stat.st_size)
+        end = tail.rfind(b"\n") + 1
+        if end < len(tail) and stat.st_size != self.pending:
+            # The last line may still be being written, so it waits until the size holds for a check.
+            self.pending = stat.st_size
+            tail = tail[:end]
+        if not tail:
+            return 0
+        rows = read_csv(io.BytesIO(tail), header=None, names=self.names) if tail.strip() else None
+        self.offset += len(tail)
+        if self.offset == stat.st_size:
+            self.mtime_ns = stat.st_mtime_ns
+        self.anchors = self._anchors()
+        if rows is None or not len(rows):
+            return 0
+        self.append(rows)
+        return len(rows)
+
+    def append(self, rows):
+        """Extend every column with the rows of a frame and publish the longer frame."""
+        with PROFILER.span("load.append", rows=len(rows)):
+            for name, column in self.columns.items():
+                column.append(rows[name].array if isinstance(column, GrowableCategorical) else rows[name].to_numpy())
+            frame = self._frame()
+            extend_version(self.frame, frame)
+            self.frame = frame
+        PROFILER.count("load.appended_rows", len(rows))
+
+    def _frame(self):
+        columns = {}
+        for name, column in self.columns.items():
+            values = column.view()
+            # Text stays in object arrays rather than being inferred as a string dtype.
+            columns[name] = pd.Series(values, dtype=object, copy=False) if values.dtype == object else values
+        return pd.DataFrame(columns, copy=False)
+
+    def _anchors(self):
+        return (self._read(0, min(self.offset, ANCHOR_BYTES)),
+                self._read(max(0, self.offset - ANCHOR_BYTES), self.offset))
+
+    def _read(self, start, stop):
+        with open(self.path, "rb") as file:
+            file.seek(start)
+            return file.read(stop - start)